@@ -1,15 +1,18 @@
 import ast
+import asyncio
 import fnmatch
 import json
 import logging
 import os
 import pathlib
+import queue
 import random
 import socket
 import sys
 import threading
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -24,15 +27,35 @@ from flask.logging import default_handler
 from flask_cors import CORS
 from word2number import w2n
 
-from cmds.ap_scripts.emitter import event_emitter
+from cmds import db
+from cmds.ap_scripts import http_client, metrics
+from cmds.ap_scripts.checkpoint import (
+    CHECKPOINT_INTERVAL,
+    load_checkpoint,
+    save_checkpoint,
+)
+from cmds.ap_scripts.emitter import EventEmitter
+from cmds.ap_scripts.item_metadata import CLASSIFICATION_CHANNEL
+from cmds.ap_scripts.line_classifier import LineClassifier
+from cmds.ap_scripts.logtail import LogTail
+from cmds.ap_scripts.polling import PollScheduler
+from cmds.ap_scripts.snapshot import SnapshotPublisher
+from cmds.ap_scripts.spheres import SphereIndex
+from cmds.ap_scripts.spoiler import (
+    download_spoiler,
+    load_spoiler_artifact,
+    save_spoiler_artifact,
+    spoiler_lines,
+)
 from cmds.ap_scripts.utils import (
     Game,
-    Item,
     Location,
     Player,
     PlayerSettings,
     handle_item_tracking,
     handle_location_hinting,
+    db_add_locations,
+    epoch_seconds,
     handle_location_tracking,
     hcn_friends_locations,
 )
@@ -45,31 +68,34 @@ if DEBUG in ["1", "true", "yes", "on"]:
 else:
     DEBUG = False
 
+# Run the room as asyncio tasks instead of the blocking loop and helper threads
+ASYNC_RUNTIME = os.getenv("ASYNC_RUNTIME", "").lower() in ["1", "true", "yes", "on"]
+
+# The room's configuration. ap_roomhost.py loads a copy of this module per
+# room, to run several rooms in one process, and sets ROOM_ENV for each;
+# run on its own, the room is configured through the environment.
+HOSTED = "ROOM_ENV" in globals()
+room_env = globals().get("ROOM_ENV", os.environ)
+
 # setup logging
 logger = logging.getLogger("ap_itemlog")
-handler = logging.StreamHandler()
-handler.setFormatter(
-    logging.Formatter("[%(name)s %(process)d][%(levelname)s] %(message)s")
-)
+if not logger.handlers:  # Hosted rooms share the logger
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter("[%(name)s %(process)d][%(levelname)s] %(message)s")
+    )
+    logger.addHandler(handler)
 if DEBUG:
     logger.setLevel(logging.DEBUG)
 else:
     logger.setLevel(logging.INFO)
-logger.addHandler(handler)
 
 
 with open("config.yaml", "r", encoding="UTF-8") as file:
     cfg = yaml.safe_load(file)
 
-sqlcfg = cfg["bot"]["psql"]
 try:
-    sqlcon = psql.connect(
-        dbname=sqlcfg["database"],
-        user=sqlcfg["user"],
-        password=sqlcfg["password"] if "password" in sqlcfg else None,
-        host=sqlcfg["host"],
-        port=sqlcfg["port"],
-    )
+    sqlcon = db.connect()
 except psql.OperationalError:
     logger.warning(
         "Could not connect to the database, some features will be unavailable. Check your configuration and database status."
@@ -80,14 +106,16 @@ except psql.OperationalError:
 # Everything since is my own code. Thank you :-)
 
 # URL of the log file and Discord webhook URL from environment variables
-log_url = os.getenv("LOG_URL")
-webhook_urls = [os.getenv("WEBHOOK_URL")]
-session_cookie = os.getenv("SESSION_COOKIE")
+log_url = room_env.get("LOG_URL")
+webhook_urls = [room_env.get("WEBHOOK_URL")]
+session_cookie = room_env.get("SESSION_COOKIE")
 
 # Extra info for additional features
-seed_url = os.getenv("SPOILER_URL")
-msg_webhooks = [os.getenv("MSGHOOK_URL")]
-meta_webhook = [os.getenv("METAHOOK_URL")]
+seed_url = room_env.get("SPOILER_URL")
+msg_webhooks = [room_env.get("MSGHOOK_URL")]
+meta_webhook = [room_env.get("METAHOOK_URL")]
+# Set by the supervisor, which hands out ports itself
+flask_port = room_env.get("FLASK_PORT")
 
 # Pull extra configuration if this itemlog is stored in config.yaml, by checking the log_url
 if (
@@ -133,6 +161,9 @@ if not os.path.exists("logs"):
     os.makedirs("logs")
 logfile = logging.FileHandler(f"logs/room_{room_id}.log", encoding="UTF-8")
 logfile.setFormatter(logging.Formatter("[%(asctime)s][%(levelname)s] %(message)s"))
+if HOSTED:
+    # Keep the other rooms' lines out of this room's log file
+    logger = logging.getLogger(f"ap_itemlog.{room_id}")
 logger.addHandler(logfile)
 
 # Time interval between checks (in seconds)
@@ -157,8 +188,31 @@ release_buffer = {}
 collect_buffer = {}
 message_buffer = []
 
+# When we last polled the log, for health checks
+last_poll: float = None
+
+# Routes log lines to their parser, caching patterns built from the player list
+line_classifier = LineClassifier()
+
+# Read-only copies of the game state for the webview, published after each batch
+snapshots = SnapshotPublisher()
+
+# Classification changes announced by the bot, waiting for the main loop to apply them
+classification_changes: queue.SimpleQueue = queue.SimpleQueue()
+
+# Changes to the game state from other threads (the webview's) go through run_in_state,
+# so they take turns with the main loop: on the async runtime's state thread, or
+# holding the lock the blocking loop holds while it processes a batch
+state_lock = threading.RLock()
+state_executor: ThreadPoolExecutor = None
+
+# Milestones and sphere completions announced by the game. Every copy of this
+# module gets its own, so co-hosted rooms don't pick up each other's
+event_emitter = EventEmitter()
+
 # Store for players, items, settings
 game = Game()
+game.events = event_emitter
 game.hostname = hostname
 game.room_id = room_id
 game.seed_id = seed_id
@@ -200,14 +254,151 @@ def is_int(s) -> bool:
 # Spoiler Log Processing
 
 
+def push_seed_info():
+    if sqlcon:
+        with sqlcon.cursor() as cursor:
+            game.pushdb(cursor, "pepper.ap_all_rooms", "seed", game.seed)
+            game.pushdb(
+                cursor,
+                "pepper.ap_all_rooms",
+                "version",
+                game.version_generator,
+            )
+            with metrics.db_seconds.time(operation="commit"):
+                sqlcon.commit()
+
+
+def add_spoiler_location(item_location, sender, item, receiver) -> Location | None:
+    """Place an item from the spoiler's Locations section.
+    Returns the location to register in the database, or None for events."""
+    ItemObject = game.get_or_create_item(
+        game.players[sender],
+        game.players[receiver],
+        item,
+        item_location,
+        received_timestamp=start_time,
+    )
+
+    if item_location == item and sender == receiver:
+        return None  # Most likely an event, can be skipped
+    if ItemObject.location.is_checkable is False:
+        # If the item is not checkable, we don't need to store it
+        # But we can't delete it just yet until the checkable database is more complete
+        # TODO uncomment this when this is safer to do
+        # del ItemObject
+        # continue
+        pass
+    else:
+        if game.players[sender].name == sender:
+            game.players[sender].add_spoiler(ItemObject)
+        if game.players[receiver].name == receiver:
+            game.players[receiver].add_spoiler(ItemObject)
+
+    if sender not in game.spoiler_log:
+        game.spoiler_log.update({sender: {}})
+    game.spoiler_log[sender].update({item_location: ItemObject})
+    return ItemObject.location
+
+
+def add_starting_item(item, receiver):
+    """Give a player an item from the spoiler's Starting Items section."""
+    ItemObj = game.get_or_create_item(
+            "Archipelago",
+            game.players[receiver],
+            item,
+            "Starting Items",
+            received_timestamp=start_time,
+    )
+    game.players[receiver].inventory.append(ItemObj)
+    game.add_to_sphere(ItemObj, 0, game.players[receiver])
+
+
+def add_sphere_item(sphere: int, record: tuple) -> bool:
+    """Add an item from the spoiler's Playthrough to its sphere.
+    `record` is (location, sender, item, receiver), or (item, receiver) for starting items."""
+    if len(record) == 4:
+        item_location, sender, item_name, receiver = record
+        s_player = game.get_player(sender)
+        r_player = game.get_player(receiver)
+        item = game.get_or_create_item(s_player,r_player,item_name,item_location,get_only=True)
+        if item is not None:
+            game.add_to_sphere(item, sphere, s_player)
+            return True
+        logger.warning(f"Failed to find item for sphere {sphere}: {item_name} from {sender} to {receiver} at {item_location}")
+    else:
+        item_name, receiver = record
+        r_player = game.get_player(receiver)
+        item = game.get_or_create_item("Archipelago",r_player,item_name,"Starting Items",get_only=True)
+        if item is not None:
+            game.add_to_sphere(item, sphere, r_player)
+            return True
+        logger.warning(f"Failed to find starting item for sphere {sphere}: {item_name} for {receiver}")
+    return False
+
+
+def apply_spoiler_artifact(artifact: dict):
+    """Rebuild the game's spoiler data from a previously parsed spoiler."""
+    game.version_generator = artifact["version_generator"]
+    game.seed = artifact["seed"]
+    game.world_settings.update(artifact["world_settings"])
+    logger.info(f"Loaded seed {game.seed}, generated on Archipelago version {game.version_generator}")
+    push_seed_info()
+
+    for name in artifact["removed_players"]:
+        game.players.pop(name, None)
+    for name in artifact["added_players"]:
+        # SBURBelago connections to players who aren't slots in the room
+        if name not in game.players:
+            game.players[name] = Player(name, "SBURBelago", None, game)
+    for name, player_data in artifact["players"].items():
+        if name not in game.players:
+            logger.warning(f"Player {name} from the parsed spoiler isn't in this room, skipping.")
+            continue
+        if player_data["id"] is not None:
+            game.players[name].id = player_data["id"]
+        game.players[name].settings.update(player_data["settings"])
+
+    # Registered in the database in one batch, rather than a few round trips each
+    db_add_locations(
+        location
+        for record in artifact["locations"]
+        if (location := add_spoiler_location(*record)) is not None
+    )
+    for record in artifact["starting_items"]:
+        add_starting_item(*record)
+    if artifact["spheres"] is not None:
+        game.spheres = SphereIndex()
+        for sphere, records in artifact["spheres"].items():
+            game.spheres.ensure(sphere)
+            for record in records:
+                add_sphere_item(sphere, record)
+    if artifact["sburbelago"] is not None:
+        game["sburbelago"] = artifact["sburbelago"]
+
+
 def process_spoiler_log(seed_url):
     global game
     global start_time
 
-    spoiler_url = f"https://{hostname}/dl_spoiler/{seed_id}"
-
-    spoiler_log = requests.get(spoiler_url, timeout=10)
-    spoiler_text = spoiler_log.text.split("\n")
+    if artifact := load_spoiler_artifact(hostname, seed_id):
+        logger.info("Loading parsed spoiler log from cache.")
+        apply_spoiler_artifact(artifact)
+        logger.info("Done loading the parsed spoiler log")
+        return
+
+    spoiler_path = download_spoiler(hostname, seed_id)
+    if spoiler_path is None:
+        logger.error("Couldn't get the spoiler log, carrying on without it.")
+        game.has_spoiler = False
+        return
+
+    # Everything we place while parsing, so the next start can replay it without re-parsing
+    room_players = set(game.players.keys())
+    parsed_locations = []
+    parsed_starting_items = []
+    parsed_spheres = None
+    # Locations to register in the database once the Locations section is done
+    pending_locations = []
 
     parse_mode = "Seed Info"
     working_player = None
@@ -273,8 +464,8 @@ def process_spoiler_log(seed_url):
         # Otherwise, try to parse as list/dict/etc.
         return parse_to_type(value_str)
 
-    for line in spoiler_text:
-        line = str(line)
+    # Streamed from disk, so the whole spoiler is never held in memory at once
+    for line in spoiler_lines(spoiler_path):
         if len(line) == 0:
             continue
 
@@ -355,11 +546,16 @@ def process_spoiler_log(seed_url):
             logger.info("Parsing SBURBelago layout")
         if line.strip() == "Playthrough:":
             parse_mode = "Spheres"
-            game.spheres = {}
+            game.spheres = SphereIndex()
+            parsed_spheres = {}
         if line.strip() == "Unreachable Progression Items:":
             parse_mode = None  # we don't need to parse this information for item tracking, and it can be complex to do so accurately
             continue
 
+        if pending_locations and parse_mode != "Locations":
+            db_add_locations(pending_locations)
+            pending_locations = []
+
         match parse_mode:
             case "Seed Info":
                 if line.startswith("Celeste (Open World) APWorld"):
@@ -371,16 +567,7 @@ def process_spoiler_log(seed_url):
                     logger.info(
                         f"Generated on Archipelago version {game.version_generator}"
                     )
-                    if sqlcon:
-                        with sqlcon.cursor() as cursor:
-                            game.pushdb(cursor, "pepper.ap_all_rooms", "seed", game.seed)
-                            game.pushdb(
-                                cursor,
-                                "pepper.ap_all_rooms",
-                                "version",
-                                game.version_generator,
-                            )
-                            sqlcon.commit()
+                    push_seed_info()
                 else:
                     try:
                         current_key, value = line.strip().split(":", 1)
@@ -453,46 +640,14 @@ def process_spoiler_log(seed_url):
                 if match := regex_patterns["location"].match(line):
                     item_location, sender, item, receiver = match.groups()
                     item_location = item_location.lstrip()
-                    ItemObject = game.get_or_create_item(
-                        game.players[sender],
-                        game.players[receiver],
-                        item,
-                        item_location,
-                        received_timestamp=start_time,
-                    )
-
-                    if item_location == item and sender == receiver:
-                        continue  # Most likely an event, can be skipped
-                    if ItemObject.location.is_checkable is False:
-                        # If the item is not checkable, we don't need to store it
-                        # But we can't delete it just yet until the checkable database is more complete
-                        # TODO uncomment this when this is safer to do
-                        # del ItemObject
-                        # continue
-                        pass
-                    else:
-                        if game.players[sender].name == sender:
-                            game.players[sender].add_spoiler(ItemObject)
-                        if game.players[receiver].name == receiver:
-                            game.players[receiver].add_spoiler(ItemObject)
-
-                    ItemObject.location.db_add_location()
-
-                    if sender not in game.spoiler_log:
-                        game.spoiler_log.update({sender: {}})
-                    game.spoiler_log[sender].update({item_location: ItemObject})
+                    if location := add_spoiler_location(item_location, sender, item, receiver):
+                        pending_locations.append(location)
+                    parsed_locations.append((item_location, sender, item, receiver))
             case "Starting Items":
                 if match := regex_patterns["starting_item"].match(line):
                     item, receiver = match.groups()
-                    ItemObj = game.get_or_create_item(
-                            "Archipelago",
-                            game.players[receiver],
-                            item,
-                            "Starting Items",
-                            received_timestamp=start_time,
-                    )
-                    game.players[receiver].inventory.append(ItemObj)
-                    game.add_to_sphere(ItemObj, 0, game.players[receiver])
+                    add_starting_item(item, receiver)
+                    parsed_starting_items.append((item, receiver))
             case "Jigsaw Info":
                 try:
                     key, value_str = parse_line(line)
@@ -528,31 +683,23 @@ def process_spoiler_log(seed_url):
                     sphere_item_count: int = 0
                     current_sphere = int(match.group(1))
                     logger.info(f"Parsing sphere {current_sphere}")
-                    game.spheres[current_sphere] = []
+                    game.spheres.ensure(current_sphere)
+                    parsed_spheres[current_sphere] = []
                     continue
                 elif line == "}" or line == "Playthrough:": 
                     continue # end of sphere/junk messages
                 # Sphere 0 is the starting inventory
                 elif match := regex_patterns["location"].match(line):
                     item_location, sender, item, receiver = match.groups()
-                    item_location = item_location.lstrip()
-                    s_player = game.get_player(sender)
-                    r_player = game.get_player(receiver)
-                    item = game.get_or_create_item(s_player,r_player,item,item_location,get_only=True)
-                    if item is not None:
+                    record = (item_location.lstrip(), sender, item, receiver)
+                    parsed_spheres[current_sphere].append(record)
+                    if add_sphere_item(current_sphere, record):
                         sphere_item_count += 1
-                        game.add_to_sphere(item, current_sphere, s_player)
-                    else:
-                        logger.warning(f"Failed to find item for sphere {current_sphere}: {item} from {sender} to {receiver} at {item_location}")
                 elif match := regex_patterns["starting_item"].match(line):
-                    item, receiver = match.groups()
-                    r_player = game.get_player(receiver)
-                    item = game.get_or_create_item("Archipelago",r_player,item,"Starting Items",get_only=True)
-                    if item is not None:
+                    record = match.groups()
+                    parsed_spheres[current_sphere].append(record)
+                    if add_sphere_item(current_sphere, record):
                         sphere_item_count += 1
-                        game.add_to_sphere(item, current_sphere, r_player)
-                    else:
-                        logger.warning(f"Failed to find item for sphere {current_sphere}: {item} from {sender} to {receiver} at {item_location}")
                 else:
                     logger.warning(f"Unrecognized line in sphere {current_sphere}: {line}")
                     continue
@@ -581,9 +728,9 @@ def process_spoiler_log(seed_url):
                     receiver_name = game["sburbelago"]["players"].get(receiver_id)
                     if sender_name and receiver_name:
                         if sender_name not in game.players:
-                            game.players[sender_name] = Player(sender_name, game)
+                            game.players[sender_name] = Player(sender_name, "SBURBelago", None, game)
                         if receiver_name not in game.players:
-                            game.players[receiver_name] = Player(receiver_name, game)
+                            game.players[receiver_name] = Player(receiver_name, "SBURBelago", None, game)
 
                         game.players[sender_name].settings["SBURBelago Connections"].append(
                             receiver_name
@@ -593,6 +740,8 @@ def process_spoiler_log(seed_url):
             case _:
                 continue
 
+    db_add_locations(pending_locations)
+
     # Handle odd settings (cast to bool, etc)
     for player in game.players.values():
         for setting, value in player.settings.items():
@@ -666,6 +815,26 @@ def process_spoiler_log(seed_url):
 
     logger.info("Done parsing the spoiler log")
 
+    save_spoiler_artifact(
+        hostname,
+        seed_id,
+        {
+            "version_generator": game.version_generator,
+            "seed": game.seed,
+            "world_settings": game.world_settings,
+            "players": {
+                name: {"id": player.id, "settings": player.settings}
+                for name, player in game.players.items()
+            },
+            "removed_players": sorted(room_players - set(game.players.keys())),
+            "added_players": sorted(set(game.players.keys()) - room_players),
+            "locations": parsed_locations,
+            "starting_items": parsed_starting_items,
+            "spheres": parsed_spheres,
+            "sburbelago": game.get("sburbelago"),
+        },
+    )
+
 
 def process_new_log_lines(new_lines, skip_msg: bool = False):
     global release_buffer
@@ -673,35 +842,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
     global seed_address
     global start_time
 
-    # Regular expressions for different log message types
-    regex_patterns = {
-        "sent_items": re.compile(
-            r"\[(.*?)]: \(Team #\d\) (\L<players>) sent (.*?(?= to)) to (\L<players>) \((.+)\)$",
-            players=game.players.keys(),
-        ),
-        "item_hints": re.compile(
-            r"\[(.*?)]: Notice \(Team #\d\): \[Hint]: (\L<players>)\'s (.*) is at (.*) in (\L<players>)\'s World(?: at (?P<entrance>(.+)))?\. \((?P<hint_status>(.+))\)$",
-            players=game.players.keys(),
-        ),
-        "goals": re.compile(
-            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has completed their goal\.$"
-        ),
-        "releases": re.compile(
-            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has released all remaining items from their world\.$"
-        ),
-        "collects": re.compile(
-            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has collected their items from other worlds\.$"
-        ),
-        "messages": re.compile(r"\[(.*?)\]: Notice \(all\): (.*?): (.+)$"),
-        "room_shutdown": re.compile(r"\[(.*?)\]: Shutting down due to inactivity.$"),
-        "room_spinup": re.compile(r"\[(.*?)\]: Hosting game at (.+?)$"),
-        "joins": re.compile(
-            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) (playing|viewing|tracking) (.+?) has joined. Client\(([0-9\.]+)\), (?P<tags>.+)\.$"
-        ),
-        "parts": re.compile(
-            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has left the game\. Client\(([0-9\.]+)\), (?P<tags>.+)\.$"
-        ),
-    }
+    line_classifier.update_players(game.players.keys())
 
     def live_classification(item):
         response = item.classification
@@ -773,41 +914,46 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
             if response == "conditional progression":
                 response = "progression"
 
-            item.classification = response
+            if response != item.classification:
+                game.item_instance_cache.reclassify(item, response)
+                item.touch()
         return item
 
     for line in new_lines:
         line_start_time = time.time_ns()  # for performance logging
-        if match := regex_patterns["sent_items"].match(line):
+        kind, match = line_classifier.classify(line)
+        if kind == "sent_items":
             timestamp, sender, item, receiver, item_location = match.groups()
 
             timestamp = parse_to_datetime(timestamp)
 
             # Mark item as collected
             try:
-                Item = game.get_or_create_item(
+                ItemObject = game.get_or_create_item(
                     game.players[sender],
                     game.players[receiver],
                     item,
                     item_location,
                     received_timestamp=timestamp,
                 )
-                if Item.found:
+                if ItemObject in game.tracker_collected:
+                    # Already collected from the tracker, the log has just caught up
+                    game.tracker_collected.discard(ItemObject)
+                    if skip_msg:
+                        continue
+                elif ItemObject.found:
                     continue  # log attempted to reprocess an item already found
-                game.players[sender].collect_item(Item)
-                game.spoiler_log[sender].update({item_location: Item})
-
-                # If it was hinted, update the player's hint table
-                for hintitem in game.players[receiver].hints["receiving"]:
-                    if item_location == hintitem.location:
-                        del hintitem
-                        Item.hinted = True
-                        break
-                for hintitem in game.players[sender].hints["sending"]:
-                    if item_location == hintitem.location:
-                        del hintitem
-                        Item.hinted = True
-                        break
+                else:
+                    game.players[sender].collect_item(ItemObject)
+                    game.spoiler_log[sender].update({item_location: ItemObject})
+
+                # If it was hinted, mark the hint as found
+                if game.players[receiver].hints["receiving"].mark_found(sender, item_location):
+                    ItemObject.hinted = True
+                if game.players[sender].hints["sending"].mark_found(sender, item_location):
+                    ItemObject.hinted = True
+                game.players[sender].touch()
+                game.players[receiver].touch()
 
             except KeyError as e:
                 logger.error(
@@ -818,17 +964,17 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                 logger.error(f"Line being parsed: {line}")
 
             # Update location totals
-            Item.location.db_add_location(True)
+            ItemObject.location.db_add_location(True)
             game.players[sender].update_locations(game)
             game.update_locations()
 
             # Live-Classify if the item is Conditional Progression
-            Item = live_classification(Item)
+            ItemObject = live_classification(ItemObject)
 
             icon: str = None
             item_with_icon = lambda item, icon: f"{icon} {item}" if bool(icon) else item
 
-            match Item.classification:
+            match ItemObject.classification:
                 case "progression":
                     icon = "<:progression:1424290927735869461>"
                 case "trap":
@@ -844,26 +990,26 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
 
             if not skip_msg:
                 logger.info(
-                    f"{sender}: ({str(game.players[sender].collected_locations)}/{str(game.players[sender].total_locations)}/{str(round(game.players[sender].collection_percentage, 2))}%) {item_location} -> {receiver}'s {item} ({Item.classification})"
+                    f"{sender}: ({str(game.players[sender].collected_locations)}/{str(game.players[sender].total_locations)}/{str(round(game.players[sender].collection_percentage, 2))}%) {item_location} -> {receiver}'s {item} ({ItemObject.classification})"
                 )
 
             # By vote of spotzone: if it's filler, don't post it
             # 2026-01-15 amendment: specific locations might be important (goal-bearing),
             # We'll handle individual cases for now but this might become a function
-            if Item.location.game == "Spyro 3" and Item.location.name.endswith(
+            if ItemObject.location.game == "Spyro 3" and ItemObject.location.name.endswith(
                 "(Skill Point)"
             ):
                 pass
-            elif Item.location.game == "Simon Tatham's Portable Puzzle Collection":
+            elif ItemObject.location.game == "Simon Tatham's Portable Puzzle Collection":
                 pass
             elif (
-                Item.location.game == "Here Comes Niko!"
-                and Item.location.name in hcn_friends_locations
-                and Item.location.player.settings["Completion Goal"] == "Friend"
+                ItemObject.location.game == "Here Comes Niko!"
+                and ItemObject.location.name in hcn_friends_locations
+                and ItemObject.location.player.settings["Completion Goal"] == "Friend"
             ):
                 pass
             # original rule
-            elif Item.is_filler() or Item.is_currency():
+            elif ItemObject.is_filler() or ItemObject.is_currency():
                 continue
 
             # If this is part of a release, send it there instead
@@ -872,23 +1018,23 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                 and not skip_msg
                 and (timestamp - release_buffer[sender]["timestamp"] <= RELEASE_DELTA)
             ):
-                release_buffer[sender]["items"][receiver].append(Item)
+                release_buffer[sender]["items"][receiver].append(ItemObject)
                 logger.debug(f"Adding {item} for {receiver} to release buffer.")
             elif (  # Or if it is part of a collect
                 receiver in collect_buffer
                 and not skip_msg
                 and (timestamp - collect_buffer[receiver]["timestamp"] <= RELEASE_DELTA)
             ):
-                collect_buffer[receiver]["items"][sender].append(Item)
-                logger.debug(f"{Item.location.name} was collected by {receiver}.")
+                collect_buffer[receiver]["items"][sender].append(ItemObject)
+                logger.debug(f"{ItemObject.location.name} was collected by {receiver}.")
             else:
                 # Update item name based on settings for special items
                 location = item_location
                 if bool(game.players[receiver].settings):
                     try:
-                        item = handle_item_tracking(game, game.players[receiver], Item)
+                        item = handle_item_tracking(game, game.players[receiver], ItemObject)
                         location = handle_location_tracking(
-                            game, game.players[sender], Item
+                            game, game.players[sender], ItemObject
                         )
                     except KeyError as e:
                         logger.error(
@@ -898,7 +1044,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                         )
 
                 # Update the message appropriately
-                if Item.classification == "trap":
+                if ItemObject.classification == "trap":
                     trap_messages = []
 
                     def random_nontrap_item(player: Player):
@@ -907,9 +1053,8 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
 
                         non_trap_items = [
                             it.name
-                            for it in game.item_instance_cache.values()
+                            for it in game.item_instance_cache.find(receiver=player)
                             if it.classification not in ["trap", "currency", "filler"]
-                            and it.receiver == player
                             and it.found is False
                         ]
 
@@ -989,12 +1134,12 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                             receiver in game.players[sender].settings["SBURBelago Connections"] and 
                             receiver not in game.players[sender].settings["SBURBelago Discovered Connections"] and
                             game.world_settings.get("modifier", "") == "SBURBelago" and
-                            ((game["sburbelago"]["settings"]["Progression Only"] is True and Item.classification in ["progression", "useful"]) or 
+                            ((game["sburbelago"]["settings"]["Progression Only"] is True and ItemObject.classification in ["progression", "useful"]) or 
                              game["sburbelago"]["settings"]["Progression Only"] is False)
                              ): 
                             # Well that was a mess of a rule, but basically: if the item is progression or progression-only mode is off
                             # then discovering this item also discovers the connection
-                            logger.info(f"{sender} has discovered a new SBURBelago connection to {receiver} by receiving {item} ({Item.classification}) from them!")
+                            logger.info(f"{sender} has discovered a new SBURBelago connection to {receiver} by receiving {item} ({ItemObject.classification}) from them!")
                             if not skip_msg:
                                 message_buffer.append(
                                     f"**{sender}** has discovered a new SBURBelago connection to **{receiver}**!"
@@ -1018,7 +1163,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                 #     message = f"**That was their last check! They're probably just waiting to finish now...**"
                 #     message_buffer.append(message)
 
-        elif match := regex_patterns["item_hints"].match(line):
+        elif kind == "item_hints":
             timestamp = match.groups()[0]
             receiver = match.groups()[1]
             item = match.groups()[2]
@@ -1032,9 +1177,13 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                 hint_status = match.group("hint_status")
 
             if hint_status == "found":
+                game.players[sender].hints["sending"].mark_found(sender, item_location)
+                game.players[receiver].hints["receiving"].mark_found(sender, item_location)
+                game.players[sender].touch()
+                game.players[receiver].touch()
                 continue
 
-            Item = game.get_or_create_item(
+            ItemObject = game.get_or_create_item(
                 game.players[sender],
                 game.players[receiver],
                 item,
@@ -1042,48 +1191,48 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                 entrance=entrance,
             )
             if item_location not in game.spoiler_log[sender]:
-                game.spoiler_log[sender][item_location] = Item
+                game.spoiler_log[sender][item_location] = ItemObject
             else:
-                Item = game.spoiler_log[sender].get(item_location)
+                ItemObject = game.spoiler_log[sender].get(item_location)
 
             # Store the hint in the player's hints dictionary
-            game.players[sender].add_hint("sending", Item)
-            game.players[receiver].add_hint("receiving", Item)
+            game.players[sender].add_hint("sending", ItemObject, hint_status)
+            game.players[receiver].add_hint("receiving", ItemObject, hint_status)
             game.spoiler_log[sender][item_location].hint()
 
-            if Item.is_filler() or Item.is_currency():
+            if ItemObject.is_filler() or ItemObject.is_currency():
                 continue
             # Balatro shop items are hinted as soon as they appear and are usually bought right away, so skip their hints
-            if Item.game == "Balatro" and any(
+            if ItemObject.game == "Balatro" and any(
                 [
-                    Item.location.name.startswith(shop)
+                    ItemObject.location.name.startswith(shop)
                     for shop in ["Shop Item", "Consumable Item"]
                 ]
             ):
                 continue
 
             item_location = handle_location_tracking(
-                game, game.players[sender], Item, True
+                game, game.players[sender], ItemObject, True
             )
 
-            message = Item.to_hint_text()
+            message = ItemObject.to_hint_text()
 
-            if bool(Item.location.requirements):
-                message += f"\n> -# This will require {join_words(Item.location.requirements)} to obtain."
-            if bool(Item.location.description):
-                message += f"\n> -# {Item.location.description}"
+            if bool(ItemObject.location.requirements):
+                message += f"\n> -# This will require {join_words(ItemObject.location.requirements)} to obtain."
+            if bool(ItemObject.location.description):
+                message += f"\n> -# {ItemObject.location.description}"
 
             if (
                 not skip_msg
                 and game.players[receiver].is_finished() is False
-                and not Item.found
+                and not ItemObject.found
             ):
                 message_buffer.append(message)
                 logger.info(
-                    f"[HINT] {sender}: {item_location} -> {receiver}'s {item} ({Item.classification})"
+                    f"[HINT] {sender}: {item_location} -> {receiver}'s {item} ({ItemObject.classification})"
                 )
 
-        elif match := regex_patterns["goals"].match(line):
+        elif kind == "goals":
             timestamp, sender = match.groups()
             if sender not in game.players:
                 game.players[sender] = {"goaled": True}
@@ -1091,6 +1240,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
             game.players[sender].finished_percentage = game.players[
                 sender
             ].collection_percentage
+            game.players[sender].touch()
 
             message = f"**{sender} has finished!** That's {len([p for p in game.players.values() if p.is_goaled()])}/{len(game.players)} goaled! ({len([p for p in game.players.values() if p.is_finished()])}/{len(game.players)} including releases)"
             if (
@@ -1103,29 +1253,31 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
             if not skip_msg:
                 logger.info(f"{sender} has finished their game.")
                 message_buffer.append(message)
-        elif match := regex_patterns["releases"].match(line):
+        elif kind == "releases":
             timestamp, sender = match.groups()
             game.players[sender].released = True
+            game.players[sender].touch()
             if not skip_msg:
                 logging.info(f"{sender} has released their remaining items.")
                 release_buffer[sender] = {
                     "timestamp": parse_to_datetime(timestamp),
                     "items": defaultdict(list),
                 }
-        elif match := regex_patterns["collects"].match(line):
+        elif kind == "collects":
             timestamp, receiver = match.groups()
             game.players[receiver].collected = True
+            game.players[receiver].touch()
             if not skip_msg:
                 logging.info(f"{receiver} has collected their remaining items.")
                 collect_buffer[receiver] = {
                     "timestamp": parse_to_datetime(timestamp),
                     "items": defaultdict(list),
                 }
-        elif match := regex_patterns["room_shutdown"].match(line):
+        elif kind == "room_shutdown":
             game.running = False
             if not skip_msg:
                 logger.info("Room has spun down due to inactivity.")
-        elif match := regex_patterns["room_spinup"].match(line):
+        elif kind == "room_spinup":
             timestamp, address = match.groups()
             game.running = True
             if not skip_msg:
@@ -1145,7 +1297,8 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                             "port",
                             seed_address.split(":")[1],
                         )
-                        sqlcon.commit()
+                        with metrics.db_seconds.time(operation="commit"):
+                            sqlcon.commit()
                     if seed_address_was is not None:
                         message = f"**The seed address has changed.** Use this updated address: `{address}`"
                         send_meta("Archipelago", message)
@@ -1165,8 +1318,8 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                             item.location.name == "Starting Items"
                             and item.location.player == "Archipelago"
                         ):
-                            item.received_timestamp = start_time
-        elif match := regex_patterns["messages"].match(line):
+                            item.received_timestamp = epoch_seconds(start_time)
+        elif kind == "messages":
             timestamp, sender, message = match.groups()
             if msg_webhooks:
                 if message.startswith("!"):
@@ -1176,7 +1329,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                         logger.info(f"[CHAT] {sender}: {message}")
                         send_chat(sender, message)
 
-        elif match := regex_patterns["joins"].match(line):
+        elif kind == "joins":
             timestamp, player, verb, playergame, client_version, tags = match.groups()
 
             timestamp = parse_to_datetime(timestamp)
@@ -1185,6 +1338,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                 tags_str = tags
                 tags = ast.literal_eval(tags_str)
                 game.players[player].tags = tags
+                game.players[player].touch()
             except json.JSONDecodeError:
                 logger.error(f"Failed to parse player tags. {player}: {tags_str}")
                 tags = tags_str
@@ -1197,7 +1351,7 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
                     logger.info(f"{player} is checking what is in logic.")
                 #     message_buffer.append(message)
 
-        elif match := regex_patterns["parts"].match(line):
+        elif kind == "parts":
             timestamp, player, version, tags = match.groups()
 
             timestamp = parse_to_datetime(timestamp)
@@ -1211,6 +1365,11 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
             logger.debug(f"Unparsed line: {line}")
 
         line_end_time = time.time_ns()
+        metrics.line_seconds.observe(
+            (line_end_time - line_start_time) / 1_000_000_000,
+            kind=kind or "unmatched",
+            game=line_game(kind, match),
+        )
 
         # If the line processing took more than 5 ms, log it
 
@@ -1223,6 +1382,18 @@ def process_new_log_lines(new_lines, skip_msg: bool = False):
 ### Common non-loop functions
 
 
+def line_game(kind: str | None, match) -> str:
+    """The game a log line is about, for labelling metrics."""
+    if kind == "item_hints":
+        name = match.group(5)  # The location is in the finder's world
+    elif kind is not None and kind not in ("room_spinup", "room_shutdown"):
+        name = match.group(2)
+    else:
+        return ""
+    player = game.players.get(name)
+    return player.game if player else ""
+
+
 def log_to_file(message):
     global room_id
 
@@ -1231,6 +1402,7 @@ def log_to_file(message):
         log_file.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
 
 
+@metrics.webhook_seconds.time(kind="chat")
 def send_chat(sender, message):
     payload = {"username": sender, "content": message}
 
@@ -1243,13 +1415,14 @@ def send_chat(sender, message):
             if "/slack" in webhook:
                 payload["text"] = payload["content"]
                 del payload["content"]
-            response = requests.post(webhook, json=payload, timeout=5)
+            response = http_client.post(webhook, json=payload, timeout=5)
             response.raise_for_status()
             # log_to_file(message)  # Log the message to a file
         except requests.RequestException as e:
             logging.error(f"Error sending chat message to webhook: {e}")
 
 
+@metrics.webhook_seconds.time(kind="log")
 def send_log(message):
     payload = {"content": message}
 
@@ -1267,24 +1440,81 @@ def send_log(message):
                 del payload["content"]
             elif "discord.com" not in webhook:
                 payload["content"] = re.sub(r"<:\S+:\d+>", "", payload["content"])
-            response = requests.post(webhook, json=payload, timeout=5)
+            response = http_client.post(webhook, json=payload, timeout=5)
             response.raise_for_status()
             # log_to_file(message)  # Log the message to a file
         except requests.RequestException as e:
             logging.error(f"Error sending log message to webhook: {e}")
 
 
+@metrics.webhook_seconds.time(kind="meta")
 def send_meta(sender, message):
     payload = {"username": sender, "content": message}
 
     try:
-        response = requests.post(meta_webhook[0], json=payload, timeout=5)
+        response = http_client.post(meta_webhook[0], json=payload, timeout=5)
         response.raise_for_status()
         # log_to_file(message)  # Log the message to a file
     except requests.RequestException as e:
         logging.error(f"Error sending meta message to webhook: {e}")
 
 
+def release_messages(sender, data) -> list[str]:
+    """Build the messages for a buffered release, split to fit in a webhook post.
+    Empty if nobody who's still playing received anything."""
+    messages = []
+    message = f"**{sender}** has released their remaining items."
+    initial_msg = message
+    running_message = message
+    for receiver, items in data["items"].items():
+        if game.players[receiver].is_finished():
+            continue
+        item_counts = defaultdict(int)
+        for item in items:
+            if item.is_filler():
+                continue
+            item_counts[item.name] += 1
+        item_list = ", ".join(
+            [
+                f"{item} (x{count})" if count > 1 else item
+                for item, count in item_counts.items()
+            ]
+        )
+        running_message += (
+            f"\n{dim_if_goaled(receiver)}**{receiver}** receives: {item_list}"
+        )
+        if len(running_message) > MAX_MSG_LENGTH:
+            messages.append(message)
+            message = running_message.replace(message, "")
+        else:
+            message = running_message
+    if message != initial_msg:
+        messages.append(message)
+    return messages
+
+
+def collection_messages(receiver, data) -> list[str]:
+    """Build the messages for a buffered collect, split to fit in a webhook post.
+    Empty if nobody who's still playing had anything collected."""
+    messages = []
+    message = f"**{receiver}** has collected their items from the multiworld."
+    initial_msg = message
+    running_message = message
+    for sender, items in data["items"].items():
+        if game.players[sender].is_finished():
+            continue
+        loc_list = ", ".join([i.location.name for i in items])
+        running_message += f"\n{dim_if_goaled(sender)}**{sender}**, {len(items)} locations collected: {loc_list}"
+        if len(running_message) > MAX_MSG_LENGTH:
+            messages.append(message)
+            message = running_message.replace(message, "")
+        else:
+            message = running_message
+    if message != initial_msg:
+        messages.append(message)
+    return messages
+
+
 def send_release_messages():
     global release_buffer
 
@@ -1292,37 +1522,14 @@ def send_release_messages():
         if len(data) == 0:
             continue
         if time.time() - data["timestamp"].timestamp() > 1:
-            message = f"**{sender}** has released their remaining items."
-            initial_msg = message
-            running_message = message
-            for receiver, items in data["items"].items():
-                if game.players[receiver].is_finished():
-                    continue
-                item_counts = defaultdict(int)
-                for item in items:
-                    if item.is_filler():
-                        continue
-                    item_counts[item.name] += 1
-                item_list = ", ".join(
-                    [
-                        f"{item} (x{count})" if count > 1 else item
-                        for item, count in item_counts.items()
-                    ]
-                )
-                running_message += (
-                    f"\n{dim_if_goaled(receiver)}**{receiver}** receives: {item_list}"
-                )
-                if len(running_message) > MAX_MSG_LENGTH:
-                    send_log(message)
-                    message = running_message.replace(message, "")
-                    time.sleep(1)
-                else:
-                    message = running_message
-            if message == initial_msg:
+            messages = release_messages(sender, data)
+            if not messages:
                 return
-            else:
+            for i, message in enumerate(messages):
+                if i > 0:
+                    time.sleep(1)
                 send_log(message)
-                logger.info(f"{sender} release sent.")
+            logger.info(f"{sender} release sent.")
             del release_buffer[sender]
 
 
@@ -1333,37 +1540,117 @@ def send_collection_messages():
         if len(data) == 0:
             continue
         if time.time() - data["timestamp"].timestamp() > 1:
-            message = f"**{receiver}** has collected their items from the multiworld."
-            initial_msg = message
-            running_message = message
-            for sender, items in data["items"].items():
-                if game.players[sender].is_finished():
-                    continue
-                loc_list = ", ".join([i.location.name for i in items])
-                running_message += f"\n{dim_if_goaled(sender)}**{sender}**, {len(items)} locations collected: {loc_list}"
-                if len(running_message) > MAX_MSG_LENGTH:
-                    send_log(message)
-                    message = running_message.replace(message, "")
-                    time.sleep(1)
-                else:
-                    message = running_message
-            if message == initial_msg:
+            messages = collection_messages(receiver, data)
+            if not messages:
                 return
-            else:
+            for i, message in enumerate(messages):
+                if i > 0:
+                    time.sleep(1)
                 send_log(message)
-                logger.info(f"{receiver} collection sent.")
+            logger.info(f"{receiver} collection sent.")
             del collect_buffer[receiver]
 
 
-def fetch_log(url):
-    try:
-        cookies = {"session": session_cookie}
-        response = requests.get(url, cookies=cookies, timeout=15)
-        response.raise_for_status()
-        return response.text.splitlines()
-    except requests.RequestException as e:
-        logger.error(f"Error fetching log file: {e}")
-        return False
+def pop_due_messages() -> list[list[str]]:
+    """Build the messages for every buffered release and collect whose wait is over,
+    and drop them from their buffers. Each entry is one release/collect's messages."""
+    due = []
+    now = datetime.now(ZoneInfo("UTC")).astimezone()
+    for buffer, build_messages, action in (
+        (release_buffer, release_messages, "release"),
+        (collect_buffer, collection_messages, "collection"),
+    ):
+        for name, data in list(buffer.items()):
+            if len(data) == 0 or now - data["timestamp"] <= RELEASE_DELTA:
+                continue
+            if messages := build_messages(name, data):
+                due.append(messages)
+                logger.info(f"{name} {action} queued.")
+            del buffer[name]
+    return due
+
+
+def push_log_position(position: tuple[int, int, str]):
+    """Store how far through the log we are, so a restart can pick up from here."""
+    last_line, last_offset, last_line_hash = position
+    with sqlcon.cursor() as cursor:
+        game.pushdb(cursor, "pepper.ap_all_rooms", "last_line", last_line)
+        game.pushdb(cursor, "pepper.ap_all_rooms", "last_offset", last_offset)
+        game.pushdb(cursor, "pepper.ap_all_rooms", "last_line_hash", last_line_hash)
+        with metrics.db_seconds.time(operation="commit"):
+            sqlcon.commit()
+
+
+def write_checkpoint(position: tuple[int, int, str]):
+    """Save the game state, so a restart only has to replay the log from `position`."""
+    save_checkpoint(
+        room_id,
+        position,
+        {
+            "game": game,
+            "seed_address": seed_address,
+            "start_time": start_time,
+        },
+    )
+
+
+def chunk_messages(messages: list[str]) -> list[str]:
+    """Join messages with newlines, split into chunks that fit in one webhook post."""
+    all_messages = "\n".join(messages)
+    if len(all_messages) <= MAX_MSG_LENGTH:
+        return [all_messages]
+
+    logger.warning(
+        f"Message buffer exceeded {MAX_MSG_LENGTH} characters, splitting into chunks."
+    )
+    # Split into chunks not exceeding MAX_MSG_LENGTH
+    chunks = []
+    current_chunk = ""
+    for msg in messages:
+        # +1 for the newline if not first message
+        if len(current_chunk) + len(msg) + (1 if current_chunk else 0) > MAX_MSG_LENGTH:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = msg
+        else:
+            if current_chunk:
+                current_chunk += "\n" + msg
+            else:
+                current_chunk = msg
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def room_finished() -> bool:
+    """Whether every player is done and there's nothing left to send."""
+    return (
+        all(p.is_finished() for p in game.players.values())
+        and len(message_buffer) == 0
+        and len(release_buffer) == 0
+        and len(collect_buffer) == 0
+    )
+
+
+def finish_room():
+    logger.info(
+        "All players have finished and are offline, and there's no more messages in the buffers to process. We're done here."
+    )
+
+    # Some maintenance items before we exit
+    uncheckable = []
+    for p in game.players.values():
+        if p.released is True:
+            # Any locations not 'checked' by this point should be marked as uncheckable
+            logger.debug(
+                f"{p.name} ({p.game}) released, marking remaining unchecked locations as uncheckable."
+            )
+            for loc in p.spoilers["locations"].values():
+                location = loc.location
+                if location.found is False and location.is_checkable is None:
+                    logger.info(f"Marking {p.game}: {location.name} as uncheckable.")
+                    uncheckable.append(location)
+    db_add_locations(uncheckable)
 
 
 ### Emitter events
@@ -1377,30 +1664,111 @@ def handle_sphere_message(message):
 event_emitter.on("milestone", handle_milestone_message)
 # event_emitter.on("sphere_completion", handle_sphere_message)
 
+def run_in_state(func, *args):
+    """Run a change to the game state from another thread, one at a time with
+    the main loop, and publish a snapshot with it. Returns what `func` returns."""
+
+    def job():
+        with state_lock:
+            result = func(*args)
+            snapshots.publish(game)
+            return result
+
+    if state_executor is not None:
+        return state_executor.submit(job).result()
+    return job()
+
+
+def classification_notified(payload: str | None):
+    # Called from the listener thread, so just queue it for the main loop
+    classification_changes.put(json.loads(payload) if payload else None)
+
+
+def apply_classification_changes() -> int:
+    """Reclassify the items named in queued classification changes.
+    A None change means notifications may have been missed, so the whole room is refreshed."""
+    updated = 0
+    while not classification_changes.empty():
+        change = classification_changes.get_nowait()
+        if change is None:
+            updated += game.classifications_changed(None)
+        else:
+            updated += game.classifications_changed(change["game"], change.get("items"))
+    if updated:
+        snapshots.publish(game)
+    return updated
+
+
 ### Main function to watch the log file
 
 
-def watch_log(url, interval):
-    global collect_buffer
+def prepare_room(url) -> tuple[LogTail, int, bool]:
+    """Restore or rebuild the room's state and catch up on the log, ready to start watching it.
+
+    Returns the log tail, the last line we've sent messages for, and whether
+    the state was restored from a checkpoint."""
     global players
     global game
+    global seed_address
+    global start_time
 
     last_line = 0
 
-    game.fetch_room_api()
-    game.fetch_static_tracker()
-    game.fetch_slot_data()
+    log_tail = LogTail(url, cookies={"session": session_cookie})
+    stored_line_hash = None
 
-    if seed_url:
-        logger.info("Processing spoiler log.")
-        game.has_spoiler = True
-        process_spoiler_log(seed_url)
-        for player in game.players.values():
-            # We're going to 'collapse' player spheres here:
-            # If any player has *no* items in a sphere, delete that sphere
-            # That way we can still have accurate sphere counts and milestones without
-            # worrying about players having different sphere distributions
-            player.collapse_spheres()
+    # Get the last line number we processed from the database
+    if not DEBUG:
+        with sqlcon.cursor() as cursor:
+            cursor.execute(
+                "ALTER TABLE pepper.ap_all_rooms ADD COLUMN IF NOT EXISTS last_offset bigint, ADD COLUMN IF NOT EXISTS last_line_hash varchar(40)"
+            )
+            with metrics.db_seconds.time(operation="commit"):
+                sqlcon.commit()
+            try:
+                last_line = int(game.pulldb(cursor, "pepper.ap_all_rooms", "last_line"))
+            except TypeError:
+                # Last Line probably hasn't been set yet; this room is new
+                pass
+            stored_line_hash = game.pulldb(cursor, "pepper.ap_all_rooms", "last_line_hash")
+
+    # If we have a checkpoint that still lines up with the log, restore it
+    # instead of rebuilding everything from the spoiler and the whole log
+    checkpoint = None if DEBUG else load_checkpoint(room_id)
+    if checkpoint:
+        log_tail.restore(*checkpoint["position"])
+        if log_tail.matches() is not True:
+            logger.warning("Checkpoint doesn't line up with the room log, ignoring it.")
+            log_tail = LogTail(url, cookies={"session": session_cookie})
+            checkpoint = None
+
+    if checkpoint:
+        logger.info(f"Restoring game state from checkpoint at line {log_tail.last_line}.")
+        game = checkpoint["state"]["game"]
+        game.events = event_emitter
+        seed_address = checkpoint["state"]["seed_address"]
+        start_time = checkpoint["state"]["start_time"]
+        game.preload_metadata()
+    else:
+        game.fetch_room_api()
+        game.fetch_static_tracker()
+        game.fetch_slot_data()
+        game.preload_metadata()
+
+        if seed_url:
+            logger.info("Processing spoiler log.")
+            game.has_spoiler = True
+            process_spoiler_log(seed_url)
+            for player in game.players.values():
+                # We're going to 'collapse' player spheres here:
+                # If any player has *no* items in a sphere, delete that sphere
+                # That way we can still have accurate sphere counts and milestones without
+                # worrying about players having different sphere distributions
+                player.collapse_spheres()
+
+        # Collected items and hints come from one tracker call, so replaying
+        # the log below only has to fill in what the tracker doesn't carry
+        game.fetch_tracker()
 
     if pathlib.Path(f".cache/{room_id}").exists():
         for player in game.players.values():
@@ -1409,26 +1777,37 @@ def watch_log(url, interval):
                 with open(f".cache/{room_id}/{player.name}.json") as file:
                     player.upload_data = json.loads(file.read())
 
-    previous_lines = fetch_log(url)
+    logger.info("Parsing existing log lines before we start watching it...")
 
-    if not previous_lines:
-        # Sleep and try again until we get something
-        while not previous_lines:
+    if checkpoint:
+        # Only replay what we'd already sent messages for since the checkpoint was written
+        replay_count = max(0, last_line - log_tail.last_line)
+        previous_lines = log_tail.fetch_new_lines(limit=replay_count)
+        while previous_lines is False:
             time.sleep(15)
-            previous_lines = fetch_log(url)
+            previous_lines = log_tail.fetch_new_lines(limit=replay_count)
+        last_line = log_tail.last_line
+        logger.info(f"Replaying {len(previous_lines)} log lines since the checkpoint.")
+        process_new_log_lines(previous_lines, True)
+    else:
+        previous_lines = log_tail.fetch_full(seek_to=last_line)
 
-    logger.info("Parsing existing log lines before we start watching it...")
+        if not previous_lines:
+            # Sleep and try again until we get something
+            while not previous_lines:
+                time.sleep(15)
+                previous_lines = log_tail.fetch_full(seek_to=last_line)
 
-    # Get the last line number we processed from the database
-    if not DEBUG:
-        with sqlcon.cursor() as cursor:
-            try:
-                last_line = int(game.pulldb(cursor, "pepper.ap_all_rooms", "last_line"))
-            except TypeError:
-                # Last Line probably hasn't been set yet; this room is new
-                pass
+        if stored_line_hash and stored_line_hash != log_tail.last_hash:
+            logger.warning(
+                f"Line {last_line} of the log doesn't match what we last processed, the log may have been reset."
+            )
 
-    process_new_log_lines(previous_lines[:last_line], True)  # Read for hints etc
+        logger.info(f"Initial log lines: {len(previous_lines[:last_line])}")
+        logger.info(
+            f"Log lines queued up for processing: {len(previous_lines[last_line:])}"
+        )
+        process_new_log_lines(previous_lines[:last_line], True)  # Read for hints etc
 
     if pathlib.Path(f".cache/{room_id}").exists() and pathlib.Path(f".cache/{room_id}/spoiled_items.json").exists():
         with open(f".cache/{room_id}/spoiled_items.json", "r") as file:
@@ -1439,12 +1818,9 @@ def watch_log(url, interval):
                             game.spoiler_log[sender][location].spoiled = True
                         except ValueError:
                             logger.error(f"Failed to parse spoiled item line: {line.strip()}")
-    release_buffer = {}
-    collect_buffer = {}
-    logger.info(f"Initial log lines: {len(previous_lines[:last_line])}")
-    logger.info(
-        f"Log lines queued up for processing: {len(previous_lines[last_line:])}"
-    )
+    release_buffer.clear()
+    collect_buffer.clear()
+    del previous_lines
     for p in game.players.values():
         p.update_locations(game)
         p.on_item_collected(None)
@@ -1463,15 +1839,27 @@ def watch_log(url, interval):
                 game.pushdb(
                     cursor, "pepper.ap_all_rooms", "port", seed_address.split(":")[1]
                 )
-                sqlcon.commit()
+                with metrics.db_seconds.time(operation="commit"):
+                    sqlcon.commit()
             except AttributeError:
                 # Seed Address not processed/set yet
                 pass
 
     message_buffer.clear()  # Clear buffer in case we have any old messages
+    snapshots.publish(game, full=True)
+
+    return log_tail, last_line, bool(checkpoint)
+
+
+def watch_log(url, interval):
+    global last_poll
+
+    log_tail, last_line, restored = prepare_room(url)
 
     # classification_thread = threading.Thread(target=save_classifications)
     # classification_thread.start()
+    if sqlcon:
+        db.listen(CLASSIFICATION_CHANNEL, classification_notified)
 
     logger.info("Ready!")
     flask_thread = threading.Thread(target=run_flask, daemon=True)
@@ -1479,79 +1867,63 @@ def watch_log(url, interval):
 
     tracker_sleep_count = 10
 
+    # The poll delay adapts to how busy the room is, with `interval` as the baseline
+    scheduler = PollScheduler(base=interval)
+    poll_delay = interval
+
+    last_checkpoint = time.monotonic()
+    if not DEBUG and not restored:
+        write_checkpoint(log_tail.position())
+
     ### Main Loop
     while True:
         if tracker_sleep_count >= 10 and game.running is False:
-            game.fetch_tracker()
+            with state_lock:
+                game.fetch_tracker()
+                snapshots.publish(game)
             tracker_sleep_count = 0
-        time.sleep(interval)
-        current_lines = fetch_log(url)
-        if current_lines is False:
+        time.sleep(poll_delay)
+        with state_lock:
+            apply_classification_changes()
+        # Only the lines appended since the last poll are fetched
+        with metrics.log_fetch_seconds.time():
+            new_lines = log_tail.fetch_new_lines()
+        last_poll = time.time()
+        if new_lines is False:
             # if fetch fails we don't want it to sync back '0' and then re-read the entire log file
             pass
-        elif len(current_lines) > last_line:
-            new_lines = current_lines[last_line:]
-            if len(new_lines) > 0:
+        else:
+            scheduler.record(len(new_lines))
+            metrics.log_fetch_lines.inc(len(new_lines))
+        if new_lines:
+            with state_lock:
                 process_new_log_lines(new_lines)
-                tracker_sleep_count += 1
+                snapshots.publish(game)
+            tracker_sleep_count += 1
             if message_buffer:
                 try:
-                    # Join all messages with newlines
-                    all_messages = "\n".join(message_buffer)
-                    if len(all_messages) > MAX_MSG_LENGTH:
-                        logger.warning(
-                            f"Message buffer exceeded {MAX_MSG_LENGTH} characters, splitting into chunks."
-                        )
-                        # Split into chunks not exceeding MAX_MSG_LENGTH
-                        chunks = []
-                        current_chunk = ""
-                        for msg in message_buffer:
-                            # +1 for the newline if not first message
-                            if (
-                                len(current_chunk)
-                                + len(msg)
-                                + (1 if current_chunk else 0)
-                                > MAX_MSG_LENGTH
-                            ):
-                                if current_chunk:
-                                    chunks.append(current_chunk)
-                                current_chunk = msg
-                            else:
-                                if current_chunk:
-                                    current_chunk += "\n" + msg
-                                else:
-                                    current_chunk = msg
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                        # Send each chunk, waiting 2 seconds between
-                        for i, chunk in enumerate(chunks):
-                            send_log(chunk)
-                            logger.debug(
-                                f"sent chunk {i + 1}/{len(chunks)} ({len(chunk)} chars) to webhook"
-                            )
-                            if i < len(chunks) - 1:
-                                time.sleep(2)
-                    else:
-                        send_log(all_messages)
+                    # Send each chunk, waiting 2 seconds between
+                    chunks = chunk_messages(message_buffer)
+                    for i, chunk in enumerate(chunks):
+                        send_log(chunk)
                         logger.debug(
-                            f"sent {len(message_buffer)} messages ({len(all_messages)} chars) to webhook"
+                            f"sent chunk {i + 1}/{len(chunks)} ({len(chunk)} chars) to webhook"
                         )
+                        if i < len(chunks) - 1:
+                            time.sleep(2)
 
                     # Clear the buffer and sync last_line if successful
                     message_buffer.clear()
-                    if len(current_lines) > last_line:
-                        last_line = len(current_lines)
-                        with sqlcon.cursor() as cursor:
-                            game.pushdb(
-                                cursor,
-                                "pepper.ap_all_rooms",
-                                "last_line",
-                                len(current_lines),
-                            )
-                            sqlcon.commit()
+                    if log_tail.last_line > last_line:
+                        last_line = log_tail.last_line
+                        push_log_position(log_tail.position())
                 except requests.RequestException as e:
                     pass
 
+            if not DEBUG and time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                write_checkpoint(log_tail.position())
+                last_checkpoint = time.monotonic()
+
         if len(release_buffer) > 0:
             if any(
                 datetime.now(ZoneInfo("UTC")).astimezone()
@@ -1572,39 +1944,13 @@ def watch_log(url, interval):
                 logger.info(f"Collect buffer period has already passed, sending.")
                 send_collection_messages()
 
-        if (
-            len(message_buffer) == 0
-            and bool(current_lines)
-            and len(current_lines) > last_line
-        ):
+        if len(message_buffer) == 0 and log_tail.last_line > last_line:
             # If we have no messages to send but the log has updated, sync last_line anyway
-            last_line = len(current_lines)
+            last_line = log_tail.last_line
 
         # Check if all players have finished
-        if (
-            all(p.is_finished() for p in game.players.values())
-            and len(message_buffer) == 0
-            and len(release_buffer) == 0
-            and len(collect_buffer) == 0
-        ):
-            logger.info(
-                "All players have finished and are offline, and there's no more messages in the buffers to process. We're done here."
-            )
-
-            # Some maintenance items before we exit
-            for p in game.players.values():
-                if p.released is True:
-                    # Any locations not 'checked' by this point should be marked as uncheckable
-                    logger.debug(
-                        f"{p.name} ({p.game}) released, marking remaining unchecked locations as uncheckable."
-                    )
-                    for loc in p.spoilers["locations"].values():
-                        location = loc.location
-                        if location.found is False and location.is_checkable is None:
-                            logger.info(
-                                f"Marking {p.game}: {location.name} as uncheckable."
-                            )
-                            location.db_add_location(is_check=False)
+        if room_finished():
+            finish_room()
 
             # We're done
             logger.info("Sleeping forever now. (Keeping the API open) Goodnight!")
@@ -1612,6 +1958,162 @@ def watch_log(url, interval):
                 time.sleep(600)
         logger.debug(f"Message buffer has {len(message_buffer)} messages queued.")
 
+        poll_delay = scheduler.next_delay(
+            players_online=len([p for p in game.players.values() if p.online]),
+            running=game.running,
+            backlog=len(message_buffer) + len(release_buffer) + len(collect_buffer),
+        )
+
+
+### Asyncio runtime
+
+
+def process_batch(new_lines) -> list[str]:
+    """Process a batch of new log lines, returning the messages they produced."""
+    process_new_log_lines(new_lines)
+    snapshots.publish(game)
+    messages = list(message_buffer)
+    message_buffer.clear()
+    return messages
+
+
+def refresh_tracker_state():
+    game.fetch_tracker()
+    snapshots.publish(game)
+
+
+def room_activity() -> tuple[int, bool, int]:
+    """Players online, whether the room is running, and how many releases/collects are waiting."""
+    return (
+        len([p for p in game.players.values() if p.online]),
+        game.running,
+        len(release_buffer) + len(collect_buffer),
+    )
+
+
+async def watch_log_async(url, interval):
+    """Watch the log as cooperating asyncio tasks:
+    - fetching new lines on the adaptive poll schedule
+    - processing them into the game state
+    - posting messages to the webhooks
+    - flushing buffered releases/collects once their wait is over, and applying
+      classification changes the bot announces
+    - refreshing the tracker while the room is asleep
+
+    Anything that touches the game state or the release/collect buffers runs on
+    a single worker thread, one job at a time, so they can't race each other.
+    Webhook posts and database writes run on the default executor, so a slow
+    webhook doesn't hold up the next poll."""
+    global state_executor
+
+    loop = asyncio.get_running_loop()
+    state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="itemlog-state")
+
+    def in_state(func, *args):
+        return loop.run_in_executor(state_executor, func, *args)
+
+    log_tail, last_line, restored = await in_state(prepare_room, url)
+    if sqlcon:
+        db.listen(CLASSIFICATION_CHANNEL, classification_notified)
+
+    logger.info("Ready!")
+    flask_thread = threading.Thread(target=run_flask, daemon=True)
+    flask_thread.start()
+
+    # (new lines, log position after them)
+    line_queue: asyncio.Queue[tuple[list[str], tuple[int, int, str]]] = asyncio.Queue()
+    # (message chunks, pause between chunks, log position to store once sent)
+    send_queue: asyncio.Queue[tuple[list[str], float, tuple | None]] = asyncio.Queue()
+    finished = asyncio.Event()
+    tracker_polls = 10
+
+    if not DEBUG and not restored:
+        await in_state(write_checkpoint, log_tail.position())
+
+    async def fetch_lines():
+        global last_poll
+        scheduler = PollScheduler(base=interval)
+        poll_delay = interval
+        while not finished.is_set():
+            await asyncio.sleep(poll_delay)
+            with metrics.log_fetch_seconds.time():
+                new_lines = await asyncio.to_thread(log_tail.fetch_new_lines)
+            last_poll = time.time()
+            if new_lines is not False:
+                scheduler.record(len(new_lines))
+                metrics.log_fetch_lines.inc(len(new_lines))
+            if new_lines:
+                await line_queue.put((new_lines, log_tail.position()))
+
+            players_online, running, buffered = await in_state(room_activity)
+            poll_delay = scheduler.next_delay(
+                players_online=players_online,
+                running=running,
+                backlog=line_queue.qsize() + send_queue.qsize() + buffered,
+            )
+
+    async def process_lines():
+        nonlocal tracker_polls
+        last_checkpoint = time.monotonic()
+        while True:
+            new_lines, position = await line_queue.get()
+            messages = await in_state(process_batch, new_lines)
+            tracker_polls += 1
+            if messages:
+                await send_queue.put((chunk_messages(messages), 2, position))
+
+            if not DEBUG and time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                # Only checkpoint lines whose messages have gone out, or a restart
+                # would skip them. Nothing else is processed meanwhile, so the
+                # game state still matches `position`.
+                await send_queue.join()
+                await in_state(write_checkpoint, position)
+                last_checkpoint = time.monotonic()
+            line_queue.task_done()
+
+    async def dispatch_messages():
+        nonlocal last_line
+        while True:
+            chunks, pause, position = await send_queue.get()
+            for i, chunk in enumerate(chunks):
+                if i > 0:
+                    await asyncio.sleep(pause)
+                await asyncio.to_thread(send_log, chunk)
+            logger.debug(f"sent {len(chunks)} chunk(s) to webhook")
+
+            if position and position[0] > last_line:
+                last_line = position[0]
+                await asyncio.to_thread(push_log_position, position)
+            send_queue.task_done()
+
+    async def flush_buffers():
+        while not finished.is_set():
+            await asyncio.sleep(1)
+            await in_state(apply_classification_changes)
+            for messages in await in_state(pop_due_messages):
+                await send_queue.put((messages, 1, None))
+
+            if line_queue.empty() and send_queue.empty() and await in_state(room_finished):
+                await in_state(finish_room)
+                finished.set()
+                logger.info("Sleeping forever now. (Keeping the API open) Goodnight!")
+
+    async def refresh_tracker():
+        nonlocal tracker_polls
+        while not finished.is_set():
+            if tracker_polls >= 10 and game.running is False:
+                await in_state(refresh_tracker_state)
+                tracker_polls = 0
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(
+        fetch_lines(),
+        process_lines(),
+        dispatch_messages(),
+        flush_buffers(),
+        refresh_tracker(),
+    )
+
 
 def process_releases():
     global release_buffer
@@ -1641,6 +2143,13 @@ webview.logger.removeHandler(default_handler)
 CORS(webview)
 
 
+@webview.teardown_request
+def release_db_connection(exc):
+    # Request threads come and go, so hand their connection back to the pool straight away
+    if sqlcon:
+        sqlcon.release()
+
+
 def safe_globals():
     # Only show non-private, non-module, non-callable globals
     return {
@@ -1661,48 +2170,78 @@ def inspect():
     return Response(pprint.pformat(safe_globals()), mimetype="text/plain")
 
 
+@webview.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Line processing, log fetch, webhook and database timings, for Prometheus to scrape."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@webview.route("/health", methods=["GET"])
+def get_health():
+    """Liveness info for the supervisor."""
+    return jsonify(
+        {
+            "room_id": room_id,
+            "pid": os.getpid(),
+            "running": snapshots.current.game.get("running"),
+            "last_poll": last_poll,
+            "finished": all(
+                p["goaled"] or p["released"] or p["collected"]
+                for p in snapshots.current.players.values()
+            ),
+            "snapshot_version": snapshots.current.version,
+        }
+    )
+
+
 @webview.route("/inspectgame", methods=["GET"])
 def get_game():
-    return jsonify(game.to_dict())
+    """The game state as of the last published snapshot."""
+    snapshot = snapshots.current
+    return jsonify({**snapshot.to_dict(), "snapshot_version": snapshot.version})
 
 @webview.route("/spoilitem/<player_name>/<item>", methods=["GET"])
 def spoil_item(player_name: str, item: str):
     """Reveal the location of a specific item in a player's spoiler log.
     Marks the item as 'spoiled'."""
+    body, status = run_in_state(mark_spoiled, player_name, item)
+    return jsonify(body), status
+
+
+def mark_spoiled(player_name: str, item: str) -> tuple[dict, int]:
     player = game.get_player(player_name)
     if player is None:
-        return jsonify({"error": f"Player '{player_name}' not found"}), 404
+        return {"error": f"Player '{player_name}' not found"}, 404
 
-    for item_location, item_obj in game.spoiler_log[player_name].items():
+    for item_location, item_obj in game.spoiler_log.get(player.name, {}).items():
         if item_obj.name == item:
             item_obj.spoiled = True
+            player.touch()
 
             if not pathlib.Path(f".cache/{room_id}").exists():
                 pathlib.Path(f".cache/{room_id}").mkdir(parents=True, exist_ok=True)
             with open(f".cache/{room_id}/spoiled_items.json", "a") as file:
                 file.write(f"{player_name}`{item}`{item_obj.location.player}`{item_location}\n")
 
-            return jsonify({
+            return {
                 "player": player_name,
                 "item": item,
                 "location": item_location,
                 "hint_text": item_obj.to_hint_text(),
-            }), 200
+            }, 200
 
-    return jsonify({"error": f"Item '{item}' not found in {player_name}'s spoiler log"}), 404
+    return {"error": f"Item '{item}' not found in {player_name}'s spoiler log"}, 404
 
 
 @webview.route("/refreshclassifications", methods=["GET"])
 def refresh_classifications():
-    global game
-
     # Optional query parameters to narrow the refresh scope
     game_name = request.args.get("game")
     item_name = request.args.get("item")
 
     try:
-        processed, updated = game.refresh_classifications(
-            game=game_name, item_name=item_name
+        processed, updated = run_in_state(
+            lambda: game.refresh_classifications(game=game_name, item_name=item_name)
         )
         msg = f"Refreshed classifications. Processed={processed}, Updated={updated}."
         if game_name:
@@ -1716,57 +2255,63 @@ def refresh_classifications():
 @webview.route("/locations/checkable/", methods=["GET"], defaults={"found": False})
 @webview.route("/locations/checkable/found", methods=["GET"], defaults={"found": True})
 def get_checkable_locations(found: bool = False):
+    snapshot = snapshots.current
     locationtable = {}
-    for player_name, player in game.players.items():
-        if player.game not in locationtable:
-            locationtable[player.game] = {}
-        for location_name, location in player.locations.items():
+    for player_name, locations in snapshot.spoiler_log.items():
+        player = snapshot.players.get(player_name)
+        if player is None:
+            continue
+        if player["game"] not in locationtable:
+            locationtable[player["game"]] = {}
+        for location_name, item in locations.items():
             if found:
-                locationtable[player.game][location_name] = [
-                    location.found,
-                    location.is_location_checkable,
+                locationtable[player["game"]][location_name] = [
+                    item["found"],
+                    item["location"]["is_checkable"],
                 ]
             else:
-                locationtable[player.game][location_name] = (
-                    location.is_location_checkable
+                locationtable[player["game"]][location_name] = (
+                    item["location"]["is_checkable"]
                 )
     return jsonify(locationtable)
 
 
 @webview.route("/upload_data/<slotname>", methods=["POST"])
 def upload_data(slotname: str):
-    player = None
-    logger.debug(f"Available players: {list(game.players.keys())}")
-    logger.debug(f"Player names: {[p.name for p in game.players.values()]}")
     logger.debug(f"Received slotname bytes: {slotname.encode('utf-8')}")
     logger.debug(f"Received slotname repr: {repr(slotname)}")
 
-    player = game.get_player(slotname)
-
-    if player is None:
-        logger.error(f"Couldn't find player '{slotname}' to upload data to")
-        logger.error(f"Available: {[p.name for p in game.players.values()]}")
-        return jsonify({"error": f"Player {slotname} not found"}), 404
-
     try:
         data = request.get_json()
         if not isinstance(data, dict):
             return jsonify({"error": "Invalid JSON format, expected a dictionary"}), 400
 
-        player.upload_data = data
-
-        if not pathlib.Path(f".cache/{room_id}").exists():
-            pathlib.Path(f".cache/{room_id}").mkdir(parents=True, exist_ok=True)
-        with open(f".cache/{room_id}/{player.name}.json", "w") as file:
-            file.write(json.dumps(data))
-
-        return jsonify(
-            {"message": f"Data uploaded successfully for player {slotname}"}
-        ), 200
+        body, status = run_in_state(store_upload_data, slotname, data)
+        return jsonify(body), status
     except Exception as e:
         logger.error(f"Error uploading data for player {slotname}: {e}")
         return jsonify({"error": str(e)}), 500
 
+
+def store_upload_data(slotname: str, data: dict) -> tuple[dict, int]:
+    logger.debug(f"Available players: {list(game.players.keys())}")
+    player = game.get_player(slotname)
+
+    if player is None:
+        logger.error(f"Couldn't find player '{slotname}' to upload data to")
+        logger.error(f"Available: {[p.name for p in game.players.values()]}")
+        return {"error": f"Player {slotname} not found"}, 404
+
+    player.upload_data = data
+    player.touch()
+
+    if not pathlib.Path(f".cache/{room_id}").exists():
+        pathlib.Path(f".cache/{room_id}").mkdir(parents=True, exist_ok=True)
+    with open(f".cache/{room_id}/{player.name}.json", "w") as file:
+        file.write(json.dumps(data))
+
+    return {"message": f"Data uploaded successfully for player {slotname}"}, 200
+
 def create_progress_bar(percentage: float, width: int = 20) -> str:
     """Create a text-based progress bar representation.
     
@@ -1782,60 +2327,97 @@ def create_progress_bar(percentage: float, width: int = 20) -> str:
     return f"[{bar}] {percentage:.1f}%"
 
 
+def snapshot_player(snapshot, player_name: str) -> dict | None:
+    """The player's entry in the snapshot, looking them up by alias if the slot name doesn't match."""
+    if player_name in snapshot.players:
+        return snapshot.players[player_name]
+    player = game.get_player(player_name)
+    return snapshot.players.get(player.name) if player is not None else None
+
+
+def player_progress(player: dict) -> dict:
+    return {
+        "game": player["game"],
+        "percentage": player["collection_percentage"],
+        "collected_locations": player["collected_locations"],
+        "total_locations": player["total_locations"],
+        "progress_bar": create_progress_bar(player["collection_percentage"]),
+        "is_finished": player["goaled"] or player["released"] or player["collected"],
+        "goaled": player["goaled"],
+        "released": player["released"],
+        "collected": player["collected"],
+    }
+
+
 @webview.route("/progress", methods=["GET"])
 def get_progress():
     """Get overall multiworld progress for all players."""
     try:
+        snapshot = snapshots.current
         progress_data = {
-            "total_percentage": game.collection_percentage,
-            "collected_locations": game.collected_locations,
-            "total_locations": game.total_locations,
-            "progress_bar": create_progress_bar(game.collection_percentage),
-            "players": {}
+            "total_percentage": snapshot.game["collection_percentage"],
+            "collected_locations": snapshot.game["collected_locations"],
+            "total_locations": snapshot.game["total_locations"],
+            "progress_bar": create_progress_bar(snapshot.game["collection_percentage"]),
+            "players": {
+                player_name: player_progress(player)
+                for player_name, player in snapshot.players.items()
+            },
         }
-        
-        for player_name, player in game.players.items():
-            progress_data["players"][player_name] = {
-                "game": player.game,
-                "percentage": player.collection_percentage,
-                "collected_locations": player.collected_locations,
-                "total_locations": player.total_locations,
-                "progress_bar": create_progress_bar(player.collection_percentage),
-                "is_finished": player.is_finished(),
-                "goaled": player.goaled,
-                "released": player.released,
-                "collected": player.collected
-            }
-        
+
         return jsonify(progress_data), 200
     except Exception as e:
         logger.error(f"Error getting progress: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+@webview.route("/spheres", methods=["GET"])
+def get_spheres():
+    """Playthrough sphere progress for the multiworld and each player."""
+    snapshot = snapshots.current
+    return jsonify(
+        {
+            "current_sphere": snapshot.game["current_sphere"],
+            "spheres": snapshot.sphere_progress,
+            "players": snapshot.player_spheres,
+        }
+    )
+
+
+@webview.route("/hints/<player_name>", methods=["GET"])
+def get_player_hints(player_name: str):
+    """The player's unfound hints, leaving out hints for players who have goaled or released."""
+    snapshot = snapshots.current
+    player = snapshot_player(snapshot, player_name)
+    if player is None:
+        return jsonify({"error": f"Player '{player_name}' not found"}), 404
+
+    def receiver_done(hint: dict) -> bool:
+        receiver = snapshot.players.get(hint["receiver"])
+        return receiver is not None and (receiver["goaled"] or receiver["released"])
+
+    hints = snapshot.hints[player["name"]]
+    return jsonify(
+        {
+            "player_name": player["name"],
+            "goaled": player["goaled"],
+            "released": player["released"],
+            "sending": [h for h in hints["sending"] if not receiver_done(h)],
+            "receiving": [h for h in hints["receiving"] if not receiver_done(h)],
+        }
+    )
+
+
 @webview.route("/progress/<player_name>", methods=["GET"])
 def get_player_progress(player_name: str):
     """Get progress for a specific player."""
     try:
-        player = game.get_player(player_name)
-        
+        player = snapshot_player(snapshots.current, player_name)
+
         if player is None:
             return jsonify({"error": f"Player '{player_name}' not found"}), 404
-        
-        progress_data = {
-            "player_name": player.name,
-            "game": player.game,
-            "percentage": player.collection_percentage,
-            "collected_locations": player.collected_locations,
-            "total_locations": player.total_locations,
-            "progress_bar": create_progress_bar(player.collection_percentage),
-            "is_finished": player.is_finished(),
-            "goaled": player.goaled,
-            "released": player.released,
-            "collected": player.collected
-        }
-        
-        return jsonify(progress_data), 200
+
+        return jsonify({"player_name": player["name"], **player_progress(player)}), 200
     except Exception as e:
         logger.error(f"Error getting progress for player {player_name}: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1843,7 +2425,7 @@ def get_player_progress(player_name: str):
 def run_flask():
     # Dynamically select an available port starting from 42069
     port = 42069
-    while True:
+    while not flask_port:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             try:
                 s.bind(("0.0.0.0", port))
@@ -1868,23 +2450,34 @@ def run_flask():
             except ValueError:
                 port += 1
 
+    if flask_port:
+        port = int(flask_port)
+
     logger.info(f"Starting Flask webview on port {port}...")
 
     # Store the selected port in the database for use elsewhere
     if sqlcon:
         with sqlcon.cursor() as cursor:
             game.pushdb(cursor, "pepper.ap_all_rooms", "flask_port", port)
-            sqlcon.commit()
+            with metrics.db_seconds.time(operation="commit"):
+                sqlcon.commit()
     webview.run(host="0.0.0.0", port=port, debug=False, use_reloader=False)
 
 
-if __name__ == "__main__":
+def run():
     logger.info(f"logging messages from AP Room ID {room_id}")
 
-    release_thread = threading.Thread(target=process_releases)
-    release_thread.start()
+    if ASYNC_RUNTIME:
+        asyncio.run(watch_log_async(log_url, INTERVAL))
+    else:
+        release_thread = threading.Thread(target=process_releases)
+        release_thread.start()
+
+        collect_thread = threading.Thread(target=process_collects)
+        collect_thread.start()
 
-    collect_thread = threading.Thread(target=process_collects)
-    collect_thread.start()
+        watch_log(log_url, INTERVAL)
 
-    watch_log(log_url, INTERVAL)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,72 @@
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+
+# Runs several itemlog rooms in one process, for the supervisor.
+#
+# Every room gets its own copy of the ap_itemlog module, so each has its own
+# game state, log tail and webview. Everything those copies import is loaded
+# once and shared between them: the database pool, the HTTP session, and the
+# location, item metadata and classification caches, which are keyed by game.
+#
+# ITEMLOG_ROOMS holds a JSON list with each room's configuration, in the same
+# variables ap_itemlog.py reads from the environment when it runs on its own.
+
+logger = logging.getLogger("ap_roomhost")
+handler = logging.StreamHandler()
+handler.setFormatter(
+    logging.Formatter("[%(name)s %(process)d][%(levelname)s] %(message)s")
+)
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+ITEMLOG_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ap_itemlog.py")
+
+
+def load_room(room_id: str, env: dict):
+    """Load a copy of ap_itemlog configured for one room."""
+    name = f"ap_itemlog_{room_id}"
+    spec = importlib.util.spec_from_file_location(name, ITEMLOG_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    module.ROOM_ENV = env
+    sys.modules[name] = module  # Flask finds the webview's module by name
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def run_room(room_id: str, module):
+    try:
+        module.run()
+    except Exception:
+        logger.exception(f"Room {room_id} stopped.")
+
+
+if __name__ == "__main__":
+    rooms = json.loads(os.environ["ITEMLOG_ROOMS"])
+
+    threads = []
+    for env in rooms:
+        room_id = env["LOG_URL"].split("/")[-1]
+        try:
+            module = load_room(room_id, env)
+        except (Exception, SystemExit):
+            # Its health checks fail, so the supervisor restarts us after a while
+            logger.exception(f"Couldn't load room {room_id}.")
+            continue
+
+        thread = threading.Thread(
+            target=run_room, args=(room_id, module), daemon=True, name=f"room-{room_id}"
+        )
+        thread.start()
+        threads.append(thread)
+
+    logger.info(f"Hosting {len(threads)} of {len(rooms)} room(s).")
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,93 @@
+import logging
+import os
+import signal
+import threading
+
+import requests
+import yaml
+from flask import Flask, Response, jsonify, request
+from flask.logging import default_handler
+from flask_cors import CORS
+
+from cmds.ap_scripts import http_client
+from cmds.ap_scripts.supervisor import ROOMS_PER_HOST, Supervisor
+
+# Runs every configured itemlog room under one supervisor. Rooms run a few to a
+# process (see ap_roomhost.py), sharing its database pool and caches; a process
+# is restarted with backoff when it crashes or one of its rooms stops
+# responding. The rooms' webviews are all reachable through one port,
+# namespaced by room ID (/rooms/<room_id>/...).
+
+logger = logging.getLogger("ap_supervisor")
+handler = logging.StreamHandler()
+handler.setFormatter(
+    logging.Formatter("[%(name)s %(process)d][%(levelname)s] %(message)s")
+)
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+with open("config.yaml", "r", encoding="UTF-8") as file:
+    cfg = yaml.safe_load(file)
+
+SUPERVISOR_PORT = int(
+    os.getenv("SUPERVISOR_PORT", cfg["bot"]["archipelago"].get("supervisor_port", 42068))
+)
+
+# Headers that only make sense for a single hop
+HOP_HEADERS = {"connection", "content-encoding", "content-length", "transfer-encoding", "keep-alive"}
+
+supervisor = Supervisor(
+    cfg["bot"]["archipelago"]["itemlogs"],
+    rooms_per_host=int(cfg["bot"]["archipelago"].get("rooms_per_host", ROOMS_PER_HOST)),
+)
+
+webview = Flask(__name__)
+webview.logger.removeHandler(default_handler)
+CORS(webview)
+
+
+@webview.route("/health", methods=["GET"])
+def get_health():
+    rooms = supervisor.status()
+    healthy = all(room["running"] for room in rooms)
+    return jsonify({"healthy": healthy, "rooms": rooms}), 200 if healthy else 503
+
+
+@webview.route("/rooms/<room_id>/", defaults={"path": ""}, methods=["GET", "POST"])
+@webview.route("/rooms/<room_id>/<path:path>", methods=["GET", "POST"])
+def proxy_room(room_id: str, path: str):
+    """Forward a request to the room's own webview."""
+    port = supervisor.port_for(room_id)
+    if port is None:
+        return jsonify({"error": f"Room {room_id} isn't running."}), 404
+
+    try:
+        response = http_client.request(
+            request.method,
+            f"http://localhost:{port}/{path}",
+            params=request.args,
+            data=request.get_data(),
+            headers={"Content-Type": request.content_type} if request.content_type else None,
+            timeout=30,
+            retries=0,
+        )
+    except requests.RequestException as e:
+        logger.error(f"Error forwarding request to room {room_id}: {e}")
+        return jsonify({"error": f"Room {room_id} didn't respond."}), 502
+
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in HOP_HEADERS]
+    return Response(response.content, status=response.status_code, headers=headers)
+
+
+def run_flask():
+    logger.info(f"Starting supervisor webview on port {SUPERVISOR_PORT}...")
+    webview.run(host="0.0.0.0", port=SUPERVISOR_PORT, debug=False, use_reloader=False)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+
+    flask_thread = threading.Thread(target=run_flask, daemon=True)
+    flask_thread.start()
+
+    supervisor.run()
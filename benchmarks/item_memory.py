@@ -0,0 +1,130 @@
+"""Memory benchmark for the Item/Location records held by a room.
+
+Builds a synthetic seed through Game.get_or_create_item and compares its
+footprint against the old record layout (dict subclasses with the data in an
+instance __dict__, a datetime per item, and a fresh string for every name
+parsed from the log).
+
+Usage:
+    python -m benchmarks.item_memory [--items 50000] [--players 40]
+
+Runs without a database: lookups that would hit it are skipped, so this only
+measures what the records themselves cost.
+"""
+
+import argparse
+import datetime
+import gc
+import random
+import tracemalloc
+
+from cmds.ap_scripts import utils
+from cmds.ap_scripts.utils import Game, Player
+
+GAMES = ["A Link to the Past", "Hollow Knight", "Super Mario 64", "Ocarina of Time", "Pokemon Emerald"]
+
+
+def parsed(name: str) -> str:
+    """A fresh copy of the string, like every name we get out of a log line."""
+    return "".join(list(name))
+
+
+def synthetic_seed(items: int, players: int) -> tuple[list[tuple[str, str, str, str]], dict[str, str]]:
+    rng = random.Random(42)
+    slots = {f"Player{i}": GAMES[i % len(GAMES)] for i in range(players)}
+    item_names = [f"Item {i}" for i in range(600)]
+    records = []
+    for i in range(items):
+        sender = f"Player{i % players}"
+        receiver = rng.choice(list(slots))
+        records.append(
+            (sender, receiver, rng.choice(item_names), f"{slots[sender]} Location {i // players}")
+        )
+    return records, slots
+
+
+class LegacyLocation(dict):
+    def __init__(self, item, player, name, game, entrance=None):
+        super().__init__()
+        self.player = player
+        self.name = name
+        self.game = game
+        self.entrance = entrance
+        self.item = item
+        self.requirements, self.description = [], ""
+        self.is_checkable = True
+        self.is_checked = False
+
+
+class LegacyItem(dict):
+    def __init__(self, sender, receiver, item, location, received_timestamp=None):
+        super().__init__()
+        self.receiver = receiver
+        self.name = item
+        self.game = receiver.game
+        self.id = None
+        self.location = LegacyLocation(self, sender, location, sender.game)
+        self.classification = None
+        self.count = 1
+        self.found = False
+        self.hinted = False
+        self.spoiled = False
+        self.received_timestamp = received_timestamp
+
+
+def build_legacy(records, game: Game) -> dict:
+    cache = {}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for sender, receiver, item, location in records:
+        item, location = parsed(item), parsed(location)
+        cache[(sender, location, item)] = LegacyItem(
+            game.players[sender], game.players[receiver], item, location, now
+        )
+    return cache
+
+
+def build_current(records, game: Game) -> dict:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for sender, receiver, item, location in records:
+        game.get_or_create_item(
+            game.players[sender], game.players[receiver], parsed(item), parsed(location),
+            received_timestamp=now,
+        )
+    return game.item_instance_cache
+
+
+def measure(build, records, slots) -> tuple[int, int]:
+    game = Game()
+    for name, game_name in slots.items():
+        game.players[name] = Player(name, game_name, len(game.players) + 1, game)
+    utils.item_table.clear()
+
+    gc.collect()
+    tracemalloc.start()
+    cache = build(records, game)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used, len(cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--players", type=int, default=40)
+    args = parser.parse_args()
+
+    utils.sqlcon = False
+    records, slots = synthetic_seed(args.items, args.players)
+
+    before, count = measure(build_legacy, records, slots)
+    after, _ = measure(build_current, records, slots)
+
+    print(f"{count} items, {len(slots)} players")
+    print(f"before: {before / 2**20:>8.1f} MiB ({before / count:.0f} bytes/item)")
+    print(f"after:  {after / 2**20:>8.1f} MiB ({after / count:.0f} bytes/item)")
+    print(f"reduction: {(1 - after / before) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Micro-benchmark for log line classification in process_new_log_lines.
+
+Compares the old approach (rebuilding the regex dict, then trying each pattern
+in turn) against LineClassifier, and checks they agree on every line.
+
+Usage:
+    python -m benchmarks.line_classifier [path/to/room.log] [--lines 100000]
+
+Without a log file, a synthetic log is generated from typical room lines.
+"""
+
+import argparse
+import random
+import time
+
+import regex as re
+
+from cmds.ap_scripts.line_classifier import LineClassifier
+
+PLAYERS = [f"Player{i}" for i in range(40)] + ["Spot", "Lily_2", "Mr. Boss"]
+
+TEMPLATES = [
+    (60, "[{ts}]: (Team #1) {p1} sent Progressive Sword to {p2} ({loc})"),
+    (8, "[{ts}]: Notice (Team #1): [Hint]: {p1}'s Hookshot is at {loc} in {p2}'s World. (unfound)"),
+    (8, "[{ts}]: Notice (all): {p1}: is anyone else stuck in logic?"),
+    (6, "[{ts}]: Notice (all): {p1} (Team #1) playing A Hat in Time has joined. Client(0.6.1), ['AP']."),
+    (6, "[{ts}]: Notice (all): {p1} (Team #1) has left the game. Client(0.6.1), ['AP']."),
+    (3, "[{ts}]: Notice (all): {p1} (Team #1) has completed their goal."),
+    (1, "[{ts}]: Notice (all): {p1} (Team #1) has released all remaining items from their world."),
+    (1, "[{ts}]: Notice (all): {p1} (Team #1) has collected their items from other worlds."),
+    (2, "[{ts}]: Hosting game at archipelago.gg:38281"),
+    (2, "[{ts}]: Shutting down due to inactivity."),
+    (3, "[{ts}]: {p1} (Team #1) has been disconnected for inactivity."),
+]
+
+
+def synthetic_log(count: int) -> list[str]:
+    rng = random.Random(42)
+    weights = [w for w, _ in TEMPLATES]
+    lines = []
+    for i in range(count):
+        _, template = rng.choices(TEMPLATES, weights)[0]
+        lines.append(
+            template.format(
+                ts=f"2025-01-{1 + i // 10000:02d} 12:{(i // 60) % 60:02d}:{i % 60:02d},123",
+                p1=rng.choice(PLAYERS),
+                p2=rng.choice(PLAYERS),
+                loc=f"Location {rng.randrange(500)}",
+            )
+        )
+    return lines
+
+
+def legacy_classify(lines: list[str], players) -> list[str | None]:
+    """How process_new_log_lines matched lines before LineClassifier."""
+    regex_patterns = {
+        "sent_items": re.compile(
+            r"\[(.*?)]: \(Team #\d\) (\L<players>) sent (.*?(?= to)) to (\L<players>) \((.+)\)$",
+            players=players,
+        ),
+        "item_hints": re.compile(
+            r"\[(.*?)]: Notice \(Team #\d\): \[Hint]: (\L<players>)\'s (.*) is at (.*) in (\L<players>)\'s World(?: at (?P<entrance>(.+)))?\. \((?P<hint_status>(.+))\)$",
+            players=players,
+        ),
+        "goals": re.compile(
+            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has completed their goal\.$"
+        ),
+        "releases": re.compile(
+            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has released all remaining items from their world\.$"
+        ),
+        "collects": re.compile(
+            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has collected their items from other worlds\.$"
+        ),
+        "messages": re.compile(r"\[(.*?)\]: Notice \(all\): (.*?): (.+)$"),
+        "room_shutdown": re.compile(r"\[(.*?)\]: Shutting down due to inactivity.$"),
+        "room_spinup": re.compile(r"\[(.*?)\]: Hosting game at (.+?)$"),
+        "joins": re.compile(
+            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) (playing|viewing|tracking) (.+?) has joined. Client\(([0-9\.]+)\), (?P<tags>.+)\.$"
+        ),
+        "parts": re.compile(
+            r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has left the game\. Client\(([0-9\.]+)\), (?P<tags>.+)\.$"
+        ),
+    }
+    kinds = []
+    for line in lines:
+        for kind, pattern in regex_patterns.items():
+            if pattern.match(line):
+                kinds.append(kind)
+                break
+        else:
+            kinds.append(None)
+    return kinds
+
+
+def classifier_classify(classifier: LineClassifier, lines: list[str], players) -> list[str | None]:
+    classifier.update_players(players)
+    return [classifier.classify(line)[0] for line in lines]
+
+
+def timed(func, *args) -> tuple[float, list]:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", nargs="?", help="A recorded room log to classify")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=50, help="Lines per process_new_log_lines call")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="UTF-8") as file:
+            lines = file.read().splitlines()[: args.lines]
+        pattern = re.compile(r"\]: \(Team #\d\) (.+?) sent .* to (.+?) \(")
+        players = set()
+        for line in lines:
+            if match := pattern.search(line):
+                players.update(match.groups())
+    else:
+        lines = synthetic_log(args.lines)
+        players = set(PLAYERS)
+
+    batches = [lines[i : i + args.batch] for i in range(0, len(lines), args.batch)]
+    print(f"{len(lines)} lines, {len(players)} players, {len(batches)} batches of {args.batch}")
+
+    # Before: the pattern dict was rebuilt for every batch
+    before, legacy_kinds = timed(
+        lambda: [k for batch in batches for k in legacy_classify(batch, players)]
+    )
+    classifier = LineClassifier()
+    after, new_kinds = timed(
+        lambda: [k for batch in batches for k in classifier_classify(classifier, batch, players)]
+    )
+
+    print(f"before: {len(lines) / before:>12,.0f} lines/s ({before:.2f}s)")
+    print(f"after:  {len(lines) / after:>12,.0f} lines/s ({after:.2f}s)")
+    print(f"speedup: {before / after:.1f}x")
+
+    differences = [
+        (line, old, new)
+        for line, old, new in zip(lines, legacy_kinds, new_kinds)
+        if old != new
+    ]
+    print(f"lines classified differently: {len(differences)}")
+    for line, old, new in differences[:10]:
+        print(f"  {old} -> {new}: {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import logging
+import os
+import pathlib
+import pickle
+import sys
+import time
+
+logger = logging.getLogger("ap_itemlog")
+
+# Bump this whenever the Game/Player/Item/Location classes change shape,
+# so old checkpoints are ignored instead of restoring stale objects
+CHECKPOINT_VERSION = 9
+
+# Don't write a checkpoint more often than this (in seconds)
+CHECKPOINT_INTERVAL = 5 * 60
+
+# The object graph is deeply linked (items -> locations -> players -> inventories),
+# so pickling it needs more headroom than the default recursion limit
+PICKLE_RECURSION_LIMIT = 20000
+
+
+def checkpoint_path(room_id: str) -> pathlib.Path:
+    return pathlib.Path(f".cache/{room_id}/checkpoint.pickle")
+
+
+def save_checkpoint(room_id: str, position: tuple[int, int, str], state: dict) -> bool:
+    """Write the room's state to disk, tagged with the log position it covers.
+
+    `position` is the log tail's (last_line, offset, last_hash), and `state` holds
+    the objects to restore (the Game, plus any loose globals that go with it)."""
+    path = checkpoint_path(room_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "room_id": room_id,
+        "position": position,
+        "saved_at": time.time(),
+        "state": state,
+    }
+
+    start = time.perf_counter()
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, PICKLE_RECURSION_LIMIT))
+    try:
+        # Write to a temporary file first, so a crash mid-write can't corrupt the last good checkpoint
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as file:
+            pickle.dump(checkpoint, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except (OSError, pickle.PicklingError, RecursionError, TypeError) as e:
+        logger.error(f"Failed to write checkpoint: {e}")
+        return False
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+
+    logger.debug(
+        f"Wrote checkpoint at line {position[0]} in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return True
+
+
+def load_checkpoint(room_id: str) -> dict | None:
+    """Load the room's checkpoint, if there is a usable one.
+    Returns a dict with the `position` and `state` that were saved."""
+    path = checkpoint_path(room_id)
+    if not path.exists():
+        return None
+
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, PICKLE_RECURSION_LIMIT))
+    try:
+        with open(path, "rb") as file:
+            checkpoint = pickle.load(file)
+    except Exception as e:
+        # Anything from a truncated file to a class that no longer exists
+        logger.warning(f"Couldn't load checkpoint, ignoring it: {e}")
+        return None
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+        logger.info("Checkpoint is from a different version, ignoring it.")
+        return None
+    if checkpoint.get("room_id") != room_id:
+        logger.warning("Checkpoint is for a different room, ignoring it.")
+        return None
+
+    return checkpoint
+
+
+def discard_checkpoint(room_id: str):
+    checkpoint_path(room_id).unlink(missing_ok=True)
@@ -0,0 +1,154 @@
+import logging
+from typing import Callable
+
+import psycopg2 as psql
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger("ap_itemlog")
+
+# Shared by the itemlog (one game's datapackage at a time, by checksum) and the
+# cog's /archipelago db import_datapackage (a whole datapackage export).
+#
+# Each game is copied into temp tables with execute_values and merged into
+# item_classifications and game_locations with a few set-based statements,
+# in one transaction per game. Imported (game, checksum) pairs are recorded in
+# archipelago.datapackage_imports, so checking for them is one indexed lookup.
+
+Progress = Callable[[str, int, int, str], None]  # (game, index, total, "imported" | "skipped" | "failed")
+
+
+def ensure_schema(cursor):
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS archipelago.datapackage_imports (
+            game bpchar, checksum varchar(64), items integer, locations integer,
+            imported_at timestamptz DEFAULT now(), PRIMARY KEY (game, checksum)
+        )"""
+    )
+
+
+def imported(cursor, packages: dict[str, str]) -> set[str]:
+    """Which of these games (game -> checksum) are already imported at that checksum."""
+    if not packages:
+        return set()
+    cursor.execute(
+        "SELECT game, checksum FROM archipelago.datapackage_imports WHERE checksum = ANY(%s);",
+        (list(set(packages.values())),),
+    )
+    done = {((game or "").rstrip(), checksum) for game, checksum in cursor.fetchall()}
+    return {game for game, checksum in packages.items() if (game.rstrip(), checksum) in done}
+
+
+def import_game(cursor, game: str, data: dict) -> tuple[int, int]:
+    """Merge one game's datapackage into the database. Run inside a transaction,
+    which the caller commits. Returns how many items and locations were merged."""
+    checksum = data.get("checksum")
+
+    groups: dict[str, list[str]] = {}
+    for group, members in data.get("item_name_groups", {}).items():
+        if group == "Everything":
+            continue
+        for item in members:
+            groups.setdefault(item, []).append(group)
+    item_ids = data.get("item_name_to_id", {})
+    items = dict.fromkeys(data.get("item_name_groups", {}).get("Everything", []))
+    items.update(dict.fromkeys(item_ids))
+
+    location_ids = data.get("location_name_to_id", {})
+    locations = dict.fromkeys(data.get("location_name_groups", {}).get("Everywhere", []))
+    locations.update(dict.fromkeys(location_ids))
+
+    cursor.execute(
+        "CREATE TEMP TABLE datapackage_items (item bpchar, item_id bigint, groups text[]) ON COMMIT DROP"
+    )
+    cursor.execute(
+        "CREATE TEMP TABLE datapackage_locations (location bpchar, location_id bigint) ON COMMIT DROP"
+    )
+    execute_values(
+        cursor,
+        "INSERT INTO datapackage_items (item, item_id, groups) VALUES %s",
+        [(item, item_ids.get(item), groups.get(item)) for item in items],
+        template="(%s, %s, %s::text[])",
+    )
+    execute_values(
+        cursor,
+        "INSERT INTO datapackage_locations (location, location_id) VALUES %s",
+        [(location, location_ids.get(location)) for location in locations],
+    )
+
+    # Classifications are left alone, groups are merged with what's already there
+    cursor.execute(
+        """INSERT INTO archipelago.item_classifications AS g
+            (game, item, classification, datapackage_checksum, item_id, group_name)
+        SELECT %(game)s, s.item, NULL, %(checksum)s, s.item_id, s.groups FROM datapackage_items s
+        ON CONFLICT (game, item) DO UPDATE SET
+            datapackage_checksum = COALESCE(EXCLUDED.datapackage_checksum, g.datapackage_checksum),
+            item_id = COALESCE(EXCLUDED.item_id, g.item_id),
+            group_name = CASE
+                WHEN EXCLUDED.group_name IS NULL THEN g.group_name
+                ELSE ARRAY(
+                    SELECT unnest(COALESCE(g.group_name, '{}')) UNION SELECT unnest(EXCLUDED.group_name)
+                )
+            END""",
+        {"game": game, "checksum": checksum},
+    )
+    cursor.execute(
+        """INSERT INTO archipelago.game_locations AS g
+            (game, location, is_checkable, datapackage_checksum, location_id)
+        SELECT %(game)s, s.location, true, %(checksum)s, s.location_id FROM datapackage_locations s
+        ON CONFLICT (game, location) DO UPDATE SET
+            is_checkable = EXCLUDED.is_checkable,
+            location_id = COALESCE(EXCLUDED.location_id, g.location_id)""",
+        {"game": game, "checksum": checksum},
+    )
+
+    if checksum:
+        cursor.execute(
+            """INSERT INTO archipelago.datapackage_imports (game, checksum, items, locations)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (game, checksum) DO UPDATE SET
+                items = EXCLUDED.items, locations = EXCLUDED.locations, imported_at = now()""",
+            (game, checksum, len(items), len(locations)),
+        )
+    return len(items), len(locations)
+
+
+def import_datapackage(con, games: dict[str, dict], progress: Progress | None = None) -> list[str]:
+    """Import every game of a datapackage (game -> that game's data), skipping
+    the ones already imported at their checksum.
+
+    `con` is a connection (or db.Connection) that isn't in autocommit mode,
+    since each game is merged in its own transaction. `progress` is called
+    after every game. Returns the games that were imported."""
+    games = {game: data for game, data in games.items() if game != "Archipelago"}
+    total = len(games)
+
+    with con.cursor() as cursor:
+        ensure_schema(cursor)
+        skip = imported(
+            cursor,
+            {game: data["checksum"] for game, data in games.items() if data.get("checksum")},
+        )
+    con.commit()
+
+    done = []
+    for index, (game, data) in enumerate(games.items(), start=1):
+        if game in skip:
+            logger.info(f"Datapackage for {game} with checksum {data.get('checksum')} is already imported; skipping.")
+            status = "skipped"
+        else:
+            try:
+                with con.cursor() as cursor:
+                    items, locations = import_game(cursor, game, data)
+                con.commit()
+                logger.info(
+                    f"Imported datapackage for {game} with checksum {data.get('checksum')} ({items} items, {locations} locations)"
+                )
+                done.append(game)
+                status = "imported"
+            except psql.Error as e:
+                logger.error(f"Error importing the datapackage for {game}: {e}")
+                con.rollback()
+                status = "failed"
+        if progress:
+            progress(game, index, total, status)
+    return done
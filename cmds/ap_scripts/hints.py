@@ -0,0 +1,37 @@
+from cmds.ap_scripts.spheres import location_key
+
+
+class HintIndex(dict):
+    """Hinted items, keyed by (finding player, location), with each hint's status
+    as the log reports it (unfound, found, priority, ...).
+
+    Unfound hints are also kept in their own dict, so they can be listed
+    without going through the found ones."""
+
+    def __init__(self):
+        super().__init__()
+        self.status: dict[tuple[str, str], str] = {}
+        self.unfound: dict[tuple[str, str], object] = {}
+
+    def add(self, item, status: str = "unfound") -> bool:
+        """Add or update the hint for the item's location.
+        Returns False if the log just repeated a hint we already had."""
+        key = location_key(item.location)
+        if self.get(key) is item and self.status.get(key) == status:
+            return False
+        self[key] = item
+        self.status[key] = status
+        if status == "found":
+            self.unfound.pop(key, None)
+        else:
+            self.unfound[key] = item
+        return True
+
+    def mark_found(self, finder: str, location: str):
+        """Mark the hint for this location as found. Returns the hinted item, if there was one."""
+        key = (finder, location)
+        if key not in self:
+            return None
+        self.status[key] = "found"
+        self.unfound.pop(key, None)
+        return self[key]
@@ -0,0 +1,153 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("ap_itemlog")
+
+# One shared session for webhost, webhook and API traffic, so connections
+# (and their TLS handshakes) are kept alive and reused between requests.
+
+DEFAULT_TIMEOUT = (5, 15)  # (connect, read) in seconds
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # seconds, doubled every attempt
+BACKOFF_MAX = 10
+POOL_SIZE = 10  # Kept-alive connections per host
+HOST_CONCURRENCY = 4  # Requests in flight per host at once
+HOST_SLOT_TIMEOUT = 60  # seconds to wait for one of the host's slots before giving up
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+_session: requests.Session = None
+_session_lock = threading.Lock()
+_host_limits: dict[str, threading.BoundedSemaphore] = {}
+
+
+def get_session() -> requests.Session:
+    """Get the shared session, creating it on first use."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # We do our own retries, so the adapter only handles pooling
+            adapter = HTTPAdapter(
+                pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _session = session
+        return _session
+
+
+def host_limit(host: str) -> threading.BoundedSemaphore:
+    """The semaphore holding the host's concurrency slots."""
+    with _session_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+        return _host_limits[host]
+
+
+def release_on_close(response: requests.Response, semaphore: threading.BoundedSemaphore):
+    """Keep a streamed response's host slot until its body has been read and it's closed."""
+    close = response.close
+    released = False
+
+    def close_and_release():
+        nonlocal released
+        try:
+            close()
+        finally:
+            if not released:
+                released = True
+                semaphore.release()
+
+    response.close = close_and_release
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (zero-indexed) attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def retry_after(response: requests.Response, attempt: int) -> float:
+    """How long the server asked us to wait, falling back to our own backoff."""
+    try:
+        return min(BACKOFF_MAX, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return backoff(attempt)
+
+
+def request(
+    method: str, url: str, retries: int = MAX_RETRIES, **kwargs
+) -> requests.Response:
+    """Send a request through the shared session.
+
+    Connection errors, timeouts and retryable statuses (429/5xx) are retried with
+    jittered backoff. Requests that aren't idempotent (webhook POSTs) are only
+    retried when the server rate-limits them, so a message is never posted twice.
+
+    Errors are raised as the usual `requests` exceptions, and the final response
+    is returned as-is, whatever its status code. A streamed response (stream=True)
+    holds its host slot until it's closed, so use it as a context manager, and
+    close it before sending another request to the same host. Waiting too long
+    for a slot raises requests.Timeout."""
+    method = method.upper()
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    idempotent = method in IDEMPOTENT_METHODS
+    host = urlsplit(url).netloc
+
+    session = get_session()
+    semaphore = host_limit(host)
+    if not semaphore.acquire(timeout=HOST_SLOT_TIMEOUT):
+        raise requests.Timeout(
+            f"No request slot free for {host} after {HOST_SLOT_TIMEOUT}s, {HOST_CONCURRENCY} already in flight"
+        )
+    try:
+        for attempt in range(retries + 1):
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt >= retries:
+                    raise
+                delay = backoff(attempt)
+                logger.debug(f"{method} {host} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if (
+                response.status_code in RETRY_STATUSES
+                and attempt < retries
+                and (idempotent or response.status_code == 429)
+            ):
+                delay = retry_after(response, attempt)
+                logger.debug(
+                    f"{method} {host} returned HTTP {response.status_code}, retrying in {delay:.1f}s"
+                )
+                response.close()
+                time.sleep(delay)
+                continue
+            break
+    except BaseException:
+        semaphore.release()
+        raise
+
+    if kwargs.get("stream"):
+        release_on_close(response, semaphore)
+    else:
+        semaphore.release()
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
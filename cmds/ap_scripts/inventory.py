@@ -0,0 +1,35 @@
+from collections import Counter
+
+
+class Inventory(list):
+    """A player's collected items, in the order they were received.
+
+    Also keeps a count and a list of items for every item name, so count and
+    has-item queries don't scan the whole inventory. Add items with `append`
+    (or `extend`) so those stay up to date."""
+
+    def __init__(self, items=()):
+        super().__init__()
+        self.counts: Counter[str] = Counter()
+        self.by_name: dict[str, list] = {}
+        self.extend(items)
+
+    def __reduce__(self):
+        # Rebuild the counts from the items, instead of pickling them alongside
+        return (type(self), (list(self),))
+
+    def append(self, item):
+        super().append(item)
+        self.counts[item.name] += 1
+        self.by_name.setdefault(item.name, []).append(item)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def count_of(self, name: str) -> int:
+        return self.counts[name]
+
+    def named(self, name: str) -> list:
+        """The collected items with this name, in the order they were received."""
+        return self.by_name.get(name, [])
@@ -0,0 +1,79 @@
+ItemKey = tuple[str, str, str]  # (sender, location, item)
+
+
+class ItemIndex(dict):
+    """Item instances keyed by (sender, location, item), with secondary indexes
+    by receiver, by (game, item name) and by classification.
+
+    Add items with `add` and change their classification with `reclassify`,
+    so the indexes stay in step with the items. There's an entry in each index
+    for every item in the seed, so they hold plain lists and sets rather than
+    more keyed dicts."""
+
+    def __init__(self):
+        super().__init__()
+        self.by_location: dict[str, dict[str, ItemKey]] = {}  # sender -> location -> key
+        self.by_receiver: dict[str, list] = {}
+        self.by_name: dict[tuple[str, str], list] = {}
+        self.by_classification: dict[str | None, set] = {}
+
+    def add(self, key: ItemKey, item):
+        self[key] = item
+        sender, location, _ = key
+        self.by_location.setdefault(sender, {})[location] = key
+        self.by_receiver.setdefault(str(item.receiver), []).append(item)
+        self.by_name.setdefault((item.game, item.name), []).append(item)
+        self.by_classification.setdefault(item.classification, set()).add(item)
+
+    def reclassify(self, item, classification: str | None):
+        """Set the item's classification, moving it to the matching index."""
+        if item.classification == classification:
+            return
+        bucket = self.by_classification.get(item.classification)
+        if bucket is not None:
+            bucket.discard(item)
+        # Even if it wasn't indexed under its old classification, so it can't drop out
+        self.by_classification.setdefault(classification, set()).add(item)
+        item.classification = classification
+
+    def names(self, game: str) -> list[str]:
+        """Names of the game's items that have turned up in this seed."""
+        return [name for (g, name) in self.by_name if g == game]
+
+    def at_location(self, sender: str, location: str) -> list[ItemKey]:
+        """Keys of the items at a sender's location (a location only holds one)."""
+        key = self.by_location.get(sender, {}).get(location)
+        return [key] if key is not None else []
+
+    def find(
+        self,
+        receiver: str | None = None,
+        game: str | None = None,
+        name: str | None = None,
+        classification: str | None = None,
+    ) -> list:
+        """Items matching all the given filters.
+
+        Starts from the smallest index that applies, and only checks the rest
+        of the filters on what's in it."""
+        buckets = []
+        if receiver is not None:
+            buckets.append(self.by_receiver.get(str(receiver), []))
+        if game is not None and name is not None:
+            buckets.append(self.by_name.get((game, name), []))
+        elif game is not None:
+            buckets.append(
+                [item for (g, _), items in self.by_name.items() if g == game for item in items]
+            )
+        if classification is not None:
+            buckets.append(self.by_classification.get(classification, set()))
+        bucket = min(buckets, key=len) if buckets else self.values()
+
+        return [
+            item
+            for item in bucket
+            if (receiver is None or str(item.receiver) == str(receiver))
+            and (game is None or item.game == game)
+            and (name is None or item.name == name)
+            and (classification is None or item.classification == classification)
+        ]
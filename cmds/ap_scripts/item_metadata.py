@@ -0,0 +1,103 @@
+import json
+import time
+from typing import NamedTuple
+
+from cmds import db
+from cmds.ap_scripts import metrics
+from cmds.ap_scripts.location_table import table_key
+
+# Classification changes are announced on this channel, see notify_classified
+CLASSIFICATION_CHANNEL = "item_classifications"
+NOTIFY_PAYLOAD_MAX = 7900  # bytes, Postgres caps NOTIFY payloads at 8000
+
+
+class ItemRow(NamedTuple):
+    classification: str | None
+    datapackage_checksum: str | None
+    item_id: int | None
+    groups: list[str]
+
+
+class ItemMetadata(dict):
+    """archipelago.item_classifications for the games in this room, held in memory.
+
+    Maps (game, item) to an ItemRow. Like LocationTable, games are loaded
+    whole: `preload` loads every game in the room at startup, and a lookup for
+    a game that isn't loaded yet loads that game. Anything that writes to
+    item_classifications should update the table with `set` (or `forget` the
+    game)."""
+
+    def __init__(self):
+        super().__init__()
+        self.loaded_at: dict[str, float] = {}  # game -> when it was loaded
+
+    def preload(self, cursor, games) -> int:
+        """Load every item of these games. Returns how many items were loaded."""
+        games = {table_key(game, "")[0] for game in games}
+        if not games:
+            return 0
+        with metrics.db_seconds.time(operation="preload_items"):
+            cursor.execute(
+                "SELECT game, item, classification, datapackage_checksum, item_id, group_name FROM archipelago.item_classifications WHERE game = ANY(%s::bpchar[]);",
+                (list(games),),
+            )
+            rows = cursor.fetchall()
+        for game in games:
+            self.forget(game)
+        self._store(rows)
+        now = time.time()
+        self.loaded_at.update({game: now for game in games})
+        return len(rows)
+
+    def reload(self, cursor, game: str, items) -> int:
+        """Load just these items of a game again. Returns how many were found."""
+        items = list(items)
+        with metrics.db_seconds.time(operation="preload_items"):
+            cursor.execute(
+                "SELECT game, item, classification, datapackage_checksum, item_id, group_name FROM archipelago.item_classifications WHERE game = %s AND item = ANY(%s::bpchar[]);",
+                (game, items),
+            )
+            rows = cursor.fetchall()
+        for item in items:
+            self.pop(table_key(game, item), None)
+        self._store(rows)
+        return len(rows)
+
+    def _store(self, rows):
+        for game, item, classification, checksum, item_id, groups in rows:
+            self[table_key(game, item)] = ItemRow(
+                classification.lower() if classification else None, checksum, item_id, groups or []
+            )
+
+    def lookup(self, cursor_factory, game: str, item: str, max_age: float | None = None) -> ItemRow | None:
+        """The item's row, or None if it isn't in the database.
+        If the game was loaded more than `max_age` seconds ago, it's loaded again first.
+        `cursor_factory` is only called if the game has to be loaded."""
+        key = table_key(game, item)
+        loaded_at = self.loaded_at.get(key[0])
+        if loaded_at is None or (max_age is not None and time.time() - loaded_at > max_age):
+            with cursor_factory() as cursor:
+                self.preload(cursor, [key[0]])
+        return self.get(key)
+
+    def set(self, game: str, item: str, **changes):
+        """Write through a change made to item_classifications."""
+        key = table_key(game, item)
+        row = self.get(key, ItemRow(None, None, None, []))
+        self[key] = row._replace(**changes)
+
+    def forget(self, game: str):
+        """Drop a game's items, so the next lookup loads them again."""
+        game = table_key(game, "")[0]
+        self.loaded_at.pop(game, None)
+        for key in [key for key in self if key[0] == game]:
+            del self[key]
+
+
+def notify_classified(cursor, game: str, items: list[str] | None = None):
+    """Tell every running itemlog that these items of the game were (re)classified.
+    Leave out `items` (or pass too many to fit) to have the whole game refreshed."""
+    payload = json.dumps({"game": game, "items": items})
+    if len(payload.encode()) > NOTIFY_PAYLOAD_MAX:
+        payload = json.dumps({"game": game, "items": None})
+    db.notify(cursor, CLASSIFICATION_CHANNEL, payload)
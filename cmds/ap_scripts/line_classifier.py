@@ -0,0 +1,104 @@
+from typing import Iterable
+
+import regex as re
+
+# Regular expressions for different log message types
+# These don't depend on who is in the room, so they're only compiled once
+static_patterns = {
+    "goals": re.compile(
+        r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has completed their goal\.$"
+    ),
+    "releases": re.compile(
+        r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has released all remaining items from their world\.$"
+    ),
+    "collects": re.compile(
+        r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has collected their items from other worlds\.$"
+    ),
+    "messages": re.compile(r"\[(.*?)\]: Notice \(all\): (.*?): (.+)$"),
+    "room_shutdown": re.compile(r"\[(.*?)\]: Shutting down due to inactivity.$"),
+    "room_spinup": re.compile(r"\[(.*?)\]: Hosting game at (.+?)$"),
+    "joins": re.compile(
+        r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) (playing|viewing|tracking) (.+?) has joined. Client\(([0-9\.]+)\), (?P<tags>.+)\.$"
+    ),
+    "parts": re.compile(
+        r"\[(.*?)\]: Notice \(all\): (.*?) \(Team #\d\) has left the game\. Client\(([0-9\.]+)\), (?P<tags>.+)\.$"
+    ),
+}
+
+# Server notices are told apart by how they end
+notice_suffixes = [
+    ("goals", " has completed their goal."),
+    ("releases", " has released all remaining items from their world."),
+    ("collects", " has collected their items from other worlds."),
+]
+notice_markers = [
+    ("joins", " has joined. Client("),
+    ("parts", " has left the game. Client("),
+]
+
+
+class LineClassifier:
+    """Sends each room log line to the one pattern that can match it.
+
+    Lines are routed with cheap prefix/keyword tests on the text after the
+    timestamp, so at most one or two regexes run per line. The patterns that
+    embed the player list (`\\L<players>`) are only recompiled when the set of
+    players changes."""
+
+    def __init__(self):
+        self.players: frozenset[str] = None
+        self.patterns = dict(static_patterns)
+        self.update_players([])
+
+    def update_players(self, players: Iterable[str]):
+        """Recompile the player-dependent patterns, if the players have changed."""
+        players = frozenset(players)
+        if players == self.players:
+            return
+        self.players = players
+        self.patterns["sent_items"] = re.compile(
+            r"\[(.*?)]: \(Team #\d\) (\L<players>) sent (.*?(?= to)) to (\L<players>) \((.+)\)$",
+            players=players,
+        )
+        self.patterns["item_hints"] = re.compile(
+            r"\[(.*?)]: Notice \(Team #\d\): \[Hint]: (\L<players>)\'s (.*) is at (.*) in (\L<players>)\'s World(?: at (?P<entrance>(.+)))?\. \((?P<hint_status>(.+))\)$",
+            players=players,
+        )
+
+    def route(self, line: str) -> str | None:
+        """Pick the pattern that could match this line, without running any regex."""
+        body = line.find("]: ")
+        if body == -1:
+            return None
+        body += 3
+
+        if line.startswith("(Team #", body):
+            return "sent_items"
+        if line.startswith("Notice (all): ", body):
+            for kind, suffix in notice_suffixes:
+                if line.endswith(suffix):
+                    return kind
+            for kind, marker in notice_markers:
+                if marker in line:
+                    return kind
+            return "messages"
+        if line.startswith("Notice (Team #", body) and "): [Hint]: " in line:
+            return "item_hints"
+        if line.startswith("Hosting game at ", body):
+            return "room_spinup"
+        if line.startswith("Shutting down due to inactivity", body):
+            return "room_shutdown"
+        return None
+
+    def classify(self, line: str):
+        """Returns `(kind, match)` for the line, or `(None, None)` if nothing matches."""
+        kind = self.route(line)
+        if kind is None:
+            return None, None
+        if match := self.patterns[kind].match(line):
+            return kind, match
+        if kind in ("goals", "releases", "collects", "joins", "parts"):
+            # Player chat can look like a notice, so give it another go as a message
+            if match := self.patterns["messages"].match(line):
+                return "messages", match
+        return None, None
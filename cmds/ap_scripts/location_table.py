@@ -0,0 +1,71 @@
+import logging
+
+from cmds.ap_scripts import metrics
+
+logger = logging.getLogger("ap_itemlog")
+
+LocationKey = tuple[str, str]  # (game, location)
+
+
+def table_key(game: str, location: str) -> LocationKey:
+    # bpchar ignores trailing spaces, so compare without them
+    return ((game or "").rstrip(), (location or "").rstrip())
+
+
+class LocationTable(dict):
+    """archipelago.game_locations for the games in this room, held in memory.
+
+    Maps (game, location) to (is_checkable, location_id). Games are loaded
+    whole, in one query: `preload` loads every game in the room at startup,
+    and a lookup for a game that isn't loaded yet loads that game. Anything
+    that writes to game_locations should update the table with `set` (or
+    `forget` the game), so lookups never go back to the database."""
+
+    def __init__(self):
+        super().__init__()
+        self.games: set[str] = set()
+
+    def preload(self, cursor, games) -> int:
+        """Load every location of these games. Returns how many locations were loaded."""
+        games = {table_key(game, "")[0] for game in games} - self.games
+        if not games:
+            return 0
+        with metrics.db_seconds.time(operation="preload_locations"):
+            cursor.execute(
+                "SELECT game, location, is_checkable, location_id FROM archipelago.game_locations WHERE game = ANY(%s::bpchar[]);",
+                (list(games),),
+            )
+            rows = cursor.fetchall()
+        for game, location, is_checkable, location_id in rows:
+            self[table_key(game, location)] = (is_checkable, location_id)
+        self.games |= games
+        return len(rows)
+
+    def lookup(self, cursor_factory, game: str, location: str) -> tuple[bool | None, int | None]:
+        """(is_checkable, location_id) for the location, or (None, None) if it isn't in the database.
+        `cursor_factory` is only called if the game still has to be loaded."""
+        key = table_key(game, location)
+        if key[0] not in self.games:
+            with cursor_factory() as cursor:
+                self.preload(cursor, [key[0]])
+        return self.get(key, (None, None))
+
+    def has(self, game: str, location: str) -> bool:
+        """Whether the location is in the database, as far as the loaded games go."""
+        return table_key(game, location) in self
+
+    def set(self, game: str, location: str, is_checkable: bool | None = None, location_id: int | None = None):
+        """Write through a change made to game_locations. Values left as None are kept."""
+        key = table_key(game, location)
+        old_checkable, old_id = self.get(key, (None, None))
+        self[key] = (
+            old_checkable if is_checkable is None else is_checkable,
+            old_id if location_id is None else location_id,
+        )
+
+    def forget(self, game: str):
+        """Drop a game's locations, so the next lookup loads them again."""
+        game = table_key(game, "")[0]
+        self.games.discard(game)
+        for key in [key for key in self if key[0] == game]:
+            del self[key]
@@ -0,0 +1,309 @@
+import hashlib
+import logging
+import re
+
+import requests
+
+from cmds.ap_scripts import http_client
+
+logger = logging.getLogger("ap_itemlog")
+
+# How many bytes before the stored offset we re-request on every poll,
+# so we can check the last processed line is still where we left it.
+# Grown to fit the last processed line when that's longer.
+TAIL_OVERLAP = 4096
+
+content_range_start = re.compile(r"^bytes (\d+)-")
+
+
+def hash_line(line: bytes) -> str:
+    """Content hash used to recognise the last processed log line."""
+    return hashlib.sha1(line.rstrip(b"\r")).hexdigest()
+
+
+def decode_line(line: bytes) -> str:
+    return line.rstrip(b"\r").decode("UTF-8", errors="replace")
+
+
+class LogTail:
+    """Follows an Archipelago room log by byte offset.
+
+    After the initial full fetch, only the bytes appended since the last poll
+    are requested (HTTP Range plus ETag/Last-Modified validators). The last
+    processed line is re-requested alongside the new bytes and compared against
+    its stored hash; if it doesn't match, the log has been reset or truncated
+    and we fall back to a full fetch."""
+
+    url: str = None
+    cookies: dict = None
+
+    last_line: int = 0  # Number of complete lines processed
+    offset: int = 0  # Byte offset just past the last processed line
+    last_hash: str = None  # Hash of the last processed line
+
+    etag: str = None
+    last_modified: str = None
+    overlap: int = TAIL_OVERLAP  # Enough to re-request the whole last processed line
+
+    def __init__(self, url: str, cookies: dict = None, timeout: int = 15):
+        self.url = url
+        self.cookies = cookies
+        self.timeout = timeout
+        self.last_line = 0
+        self.offset = 0
+        self.last_hash = None
+        self.etag = None
+        self.last_modified = None
+        self.overlap = TAIL_OVERLAP
+
+    def position(self) -> tuple[int, int, str]:
+        """The (last_line, offset, last_hash) triple to persist."""
+        return (self.last_line, self.offset, self.last_hash)
+
+    def restore(self, last_line: int, offset: int = None, last_hash: str = None):
+        """Restore a persisted position. Without an offset, the next poll
+        will do a full fetch to work it out."""
+        self.last_line = last_line or 0
+        self.offset = offset or 0
+        self.last_hash = last_hash
+        self.overlap = TAIL_OVERLAP
+        if self.last_line > 0 and (offset is None or last_hash is None):
+            self.offset = None
+
+    def fetch_full(self, seek_to: int = None) -> list[str] | bool:
+        """Download the whole log and return its complete lines.
+        The tail is positioned after `seek_to` lines (default: the end of the log).
+
+        Returns False if the log couldn't be fetched."""
+        fetched = self._fetch_raw()
+        if fetched is False:
+            return False
+        lines, offsets = fetched
+
+        self._seek(lines, offsets, seek_to)
+        return [decode_line(line) for line in lines]
+
+    def matches(self) -> bool | None:
+        """Check the log still has our last processed line where we left it,
+        without downloading anything past it.
+
+        Returns None if the log couldn't be fetched."""
+        if self.offset is None:
+            return False
+        if self.last_line == 0:
+            return True
+
+        start = max(0, self.offset - self.overlap)
+        try:
+            response = http_client.get(
+                self.url,
+                cookies=self.cookies,
+                headers={"Range": f"bytes={start}-{self.offset - 1}"},
+                timeout=self.timeout,
+            )
+            if response.status_code == 416:
+                return False
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Error fetching log file: {e}")
+            return None
+
+        if response.status_code == 206:
+            match = content_range_start.match(response.headers.get("Content-Range", ""))
+            if not match or int(match.group(1)) != start:
+                return False
+            anchor = response.content
+        else:
+            start = 0
+            anchor = response.content[: self.offset]
+        if len(anchor) != self.offset - start:
+            return False
+        # A window too short to hold the whole line counts as a mismatch; the
+        # full fetch that follows works out how long the line is
+        return bool(self._check_anchor(anchor, start))
+
+    def fetch_new_lines(self, limit: int = None) -> list[str] | bool:
+        """Fetch any lines appended since the last poll, and advance past them.
+        With `limit`, stop after that many lines and leave the rest for later.
+
+        Returns False if the log couldn't be fetched."""
+        if self.offset is None:
+            return self._resync(limit)
+
+        start = max(0, self.offset - self.overlap)
+        headers = {"Range": f"bytes={start}-"}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        elif self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        try:
+            with http_client.get(
+                self.url,
+                cookies=self.cookies,
+                headers=headers,
+                timeout=self.timeout,
+                stream=True,
+            ) as response:
+                read = self._read_new_lines(response, start, limit)
+        except requests.RequestException as e:
+            logger.error(f"Error fetching log file: {e}")
+            return False
+
+        if read is None:
+            # Out here, the streamed response has given its host slot back for the full fetch
+            return self._resync(limit)
+        new_lines, consumed = read
+
+        if new_lines:
+            self.last_line += len(new_lines)
+            self.offset = consumed
+            self.last_hash = hash_line(new_lines[-1])
+            self._fit_overlap(new_lines[-1])
+        return [decode_line(line) for line in new_lines]
+
+    def _read_new_lines(
+        self, response: requests.Response, start: int, limit: int = None
+    ) -> tuple[list[bytes], int] | None:
+        """Read the lines past our offset from a streamed ranged fetch starting at `start`.
+        Returns them with the offset just past the last one, or None if our
+        position can't be verified and the log needs a full fetch."""
+        if response.status_code == 304:
+            return [], self.offset
+        if response.status_code == 416:
+            # The log is now shorter than our offset
+            logger.warning("Log file is shorter than our last position, it may have been truncated.")
+            return None
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            match = content_range_start.match(response.headers.get("Content-Range", ""))
+            if not match or int(match.group(1)) != start:
+                return None
+        else:
+            start = 0  # Server ignored the range, this is the whole log
+
+        anchor_length = self.offset - start
+        buffer = b""
+        anchor_checked = False
+        new_lines = []
+        consumed = self.offset
+
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buffer += chunk
+            if not anchor_checked:
+                if len(buffer) < anchor_length:
+                    continue
+                anchored = self._check_anchor(buffer[:anchor_length], start)
+                if anchored is None:
+                    logger.debug("Last processed log line is longer than the overlap, refetching.")
+                    return None
+                if not anchored:
+                    logger.warning("Last processed log line has changed, the log may have been reset.")
+                    return None
+                buffer = buffer[anchor_length:]
+                anchor_checked = True
+
+            *complete, buffer = buffer.split(b"\n")
+            for line in complete:
+                if limit is not None and len(new_lines) >= limit:
+                    break
+                consumed += len(line) + 1
+                new_lines.append(line)
+            if limit is not None and len(new_lines) >= limit:
+                break
+
+        if not anchor_checked:
+            logger.warning("Log file is shorter than our last position, it may have been truncated.")
+            return None
+
+        if limit is None or len(new_lines) < limit:
+            # Only remember validators once we've read everything they cover
+            self._store_validators(response)
+        return new_lines, consumed
+
+    def _check_anchor(self, anchor: bytes, start: int) -> bool | None:
+        """Check that the bytes before our offset still end with the last processed line.
+        None if the window started partway through the line, so it can't be verified."""
+        if self.last_line == 0:
+            return True
+        if not anchor.endswith(b"\n"):
+            return False
+        _, separator, line = anchor[:-1].rpartition(b"\n")
+        if not separator and start > 0:
+            return None
+        return hash_line(line) == self.last_hash
+
+    def _fit_overlap(self, line: bytes):
+        # The line, its newline and the newline before it
+        self.overlap = max(TAIL_OVERLAP, len(line) + 2)
+
+    def _resync(self, limit: int = None) -> list[str] | bool:
+        """Full fetch, then carry on from where we were if the log still lines up."""
+        last_line, last_hash = self.last_line, self.last_hash
+        self.etag = self.last_modified = None
+
+        fetched = self._fetch_raw()
+        if fetched is False:
+            return False
+        lines, offsets = fetched
+
+        lines_up = (
+            last_line == 0
+            or last_hash is None
+            or (len(lines) >= last_line and hash_line(lines[last_line - 1]) == last_hash)
+        )
+        if not lines_up and len(lines) > last_line:
+            # Different content at our position but the log is still longer:
+            # process whatever is past our line count, as a full fetch always did
+            logger.warning(
+                f"Log contents changed before line {last_line}, resuming by line count."
+            )
+        if lines_up or len(lines) > last_line:
+            end = len(lines) if limit is None else min(len(lines), last_line + limit)
+            new_lines = lines[last_line:end]
+        else:
+            logger.warning(
+                f"Log was reset or truncated ({len(lines)} lines, we were at {last_line}). Resuming from the end."
+            )
+            new_lines = []
+            end = len(lines)
+
+        self._seek(lines, offsets, end)
+        if end < len(lines):
+            # There's more we haven't read yet, so don't let the next poll get a 304
+            self.etag = self.last_modified = None
+        return [decode_line(line) for line in new_lines]
+
+    def _fetch_raw(self) -> tuple[list[bytes], list[int]] | bool:
+        """Download the whole log, returning its complete lines and the byte offset after each."""
+        try:
+            response = http_client.get(self.url, cookies=self.cookies, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Error fetching log file: {e}")
+            return False
+
+        self._store_validators(response)
+        raw = response.content
+        del response
+
+        lines = raw.split(b"\n")[:-1]  # Anything after the last newline is incomplete
+        offsets = []
+        position = 0
+        for line in lines:
+            position += len(line) + 1
+            offsets.append(position)
+        return lines, offsets
+
+    def _seek(self, lines: list[bytes], offsets: list[int], line_count: int = None):
+        if line_count is None or line_count > len(lines):
+            line_count = len(lines)
+        self.last_line = line_count
+        self.offset = offsets[line_count - 1] if line_count > 0 else 0
+        self.last_hash = hash_line(lines[line_count - 1]) if line_count > 0 else None
+        self._fit_overlap(lines[line_count - 1] if line_count > 0 else b"")
+
+    def _store_validators(self, response):
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
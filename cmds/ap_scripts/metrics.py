@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# A small in-process metrics registry, rendered in the Prometheus text format
+# by the itemlog webview's /metrics route.
+
+# Latency buckets in seconds, from sub-millisecond line parsing up to slow webhooks
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+_registry: list["Metric"] = []
+_lock = threading.Lock()
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type: str = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, object] = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with _lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            lines.extend(self._render_value(dict(zip(self.labelnames, key)), value))
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _render_value(self, labels: dict, value) -> list[str]:
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}"]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram. Its `_count` series doubles as a counter."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, labels: dict, value) -> list[str]:
+        bucket_counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            bucket_labels = format_labels({**labels, "le": format_value(float(bound))})
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+        lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics, in the Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+### Metrics shared by the itemlog modules
+
+line_seconds = Histogram(
+    "itemlog_line_processing_seconds",
+    "Time spent processing a room log line, by line type and game.",
+    ("kind", "game"),
+)
+log_fetch_seconds = Histogram(
+    "itemlog_log_fetch_seconds",
+    "Time spent fetching new room log lines.",
+)
+log_fetch_lines = Counter(
+    "itemlog_log_fetch_lines_total",
+    "Room log lines fetched.",
+)
+webhook_seconds = Histogram(
+    "itemlog_webhook_seconds",
+    "Time spent posting a message to all webhooks of a kind.",
+    ("kind",),
+)
+db_seconds = Histogram(
+    "itemlog_db_seconds",
+    "Time spent on database calls.",
+    ("operation",),
+)
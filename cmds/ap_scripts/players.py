@@ -0,0 +1,32 @@
+class PlayerRegistry(dict):
+    """The room's players, keyed by slot name, with lookups by slot ID and alias.
+
+    Slot IDs and aliases can change after a player is added (the spoiler and
+    the tracker fill them in), so those indexes are checked on every lookup
+    and rebuilt when they've gone stale, rather than kept up on every write."""
+
+    def __init__(self):
+        super().__init__()
+        self.ids: dict[int, object] = {}
+        self.aliases: dict[str, object] = {}
+
+    def _current(self, player) -> bool:
+        return player is not None and self.get(player.name) is player
+
+    def by_id(self, id: int):
+        player = self.ids.get(id)
+        if not (self._current(player) and player.id == id):
+            self.ids = {p.id: p for p in self.values()}
+            player = self.ids.get(id)
+        return player
+
+    def by_alias(self, alias: str):
+        player = self.aliases.get(alias)
+        if not (self._current(player) and player.alias == alias):
+            self.aliases = {p.alias: p for p in self.values() if p.alias}
+            player = self.aliases.get(alias)
+        return player
+
+    def contains(self, player) -> bool:
+        """Whether this exact Player object is registered, by identity."""
+        return self._current(player)
@@ -0,0 +1,74 @@
+import logging
+import time
+
+logger = logging.getLogger("ap_itemlog")
+
+
+class PollScheduler:
+    """Works out how long to wait before polling a room's log again.
+
+    The delay follows the room's activity:
+    - Messages waiting to go out to webhooks: poll again as soon as allowed
+    - Lines arriving quickly (a release storm, busy sync): shrink towards `minimum`
+    - Players online: the `base` interval
+    - Nobody online: back off exponentially towards `idle`
+    - Room spun down: `asleep`, as nothing is logged until someone reconnects
+    """
+
+    # Lines we're happy to pick up per poll while the room is busy
+    TARGET_LINES_PER_POLL = 10
+
+    def __init__(
+        self,
+        base: float = 60,
+        minimum: float = 5,
+        idle: float = 600,
+        asleep: float = 900,
+        smoothing: float = 0.5,
+    ):
+        self.base = base
+        self.minimum = minimum
+        self.idle = idle
+        self.asleep = asleep
+        self.smoothing = smoothing
+
+        self.line_rate: float = 0.0  # Smoothed lines per second
+        self.idle_polls: int = 0  # Consecutive polls with nothing new
+        self.last_poll: float = None
+
+    def record(self, line_count: int):
+        """Record how many new lines the latest poll returned."""
+        now = time.monotonic()
+        if self.last_poll is not None and now > self.last_poll:
+            rate = line_count / (now - self.last_poll)
+            self.line_rate = (
+                self.smoothing * rate + (1 - self.smoothing) * self.line_rate
+            )
+        self.last_poll = now
+
+        if line_count > 0:
+            self.idle_polls = 0
+        else:
+            self.idle_polls += 1
+
+    def next_delay(
+        self, players_online: int, running: bool, backlog: int = 0
+    ) -> float:
+        """Seconds to sleep before the next poll."""
+        if backlog > 0:
+            delay = self.minimum
+        elif self.line_rate > 0 and self.idle_polls == 0:
+            # Aim to pick up a handful of lines each poll while things are busy
+            delay = self.TARGET_LINES_PER_POLL / self.line_rate
+            delay = max(self.minimum, min(delay, self.base))
+        elif not running:
+            delay = self.asleep
+        elif players_online == 0:
+            delay = min(self.idle, self.base * 2 ** min(self.idle_polls, 8))
+        else:
+            delay = self.base
+
+        logger.debug(
+            f"Next poll in {delay:.0f}s (rate {self.line_rate:.2f} lines/s, {players_online} online, running: {running}, backlog: {backlog})"
+        )
+        return delay
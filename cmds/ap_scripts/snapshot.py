@@ -0,0 +1,105 @@
+import time
+
+
+class Snapshot:
+    """A read-only copy of the game state for the webview, as plain dicts.
+
+    Never changed once it's published: the next batch publishes a new one,
+    which reuses this one's entries for anything that hasn't changed."""
+
+    __slots__ = (
+        "version",
+        "published_at",
+        "game",
+        "players",
+        "hints",
+        "player_spheres",
+        "spoiler_log",
+        "spheres",
+        "sphere_progress",
+    )
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.published_at = time.time()
+        self.game: dict = {}
+        self.players: dict[str, dict] = {}
+        self.hints: dict[str, dict[str, list[dict]]] = {}
+        self.player_spheres: dict[str, dict] = {}
+        self.spoiler_log: dict[str, dict] = {}
+        self.spheres: dict[str, list[dict]] = {}
+        self.sphere_progress: dict = {}
+
+    def to_dict(self) -> dict:
+        """The same shape as Game.to_dict."""
+        return {
+            **self.game,
+            "spoiler_log": self.spoiler_log,
+            "players": self.players,
+            "spheres": self.spheres,
+        }
+
+
+def player_hints(player) -> dict[str, list[dict]]:
+    """The player's unfound hints, with their status."""
+    return {
+        hint_type: [
+            {**item.to_dict(), "status": hints.status[key]}
+            for key, item in hints.unfound.items()
+        ]
+        for hint_type, hints in player.hints.items()
+    }
+
+
+class SnapshotPublisher:
+    """Builds snapshots from the game and publishes them for the webview.
+
+    Only the players and spheres the game has noted as changed (see
+    Player.touch) are serialized again; everything else is carried over from
+    the previous snapshot. Publishing swaps a single reference, so readers on
+    other threads always see either the old snapshot or the new one, whole."""
+
+    def __init__(self):
+        self.current = Snapshot()
+
+    def publish(self, game, full: bool = False) -> Snapshot:
+        """Publish a snapshot of the game. Call this from the thread that changes the game state."""
+        previous = self.current
+        changed_players, game.changed_players = game.changed_players, set()
+        changed_spheres, game.changed_spheres = game.changed_spheres, set()
+        if full:
+            changed_players = set(game.players)
+            changed_spheres = set(game.spheres)
+
+        snapshot = Snapshot(previous.version + 1)
+        snapshot.game = game.summary_dict()
+        snapshot.sphere_progress = game.spheres.progress()
+
+        for name, player in game.players.items():
+            if name in changed_players or name not in previous.players:
+                snapshot.players[name] = player.to_dict()
+                snapshot.hints[name] = player_hints(player)
+                snapshot.player_spheres[name] = {
+                    "current_sphere": player.current_sphere,
+                    "spheres": player.spheres.progress(),
+                }
+            else:
+                snapshot.players[name] = previous.players[name]
+                snapshot.hints[name] = previous.hints[name]
+                snapshot.player_spheres[name] = previous.player_spheres[name]
+
+        for name, locations in game.spoiler_log.items():
+            if name in changed_players or name not in previous.spoiler_log:
+                snapshot.spoiler_log[name] = {k: v.to_dict() for k, v in locations.items()}
+            else:
+                snapshot.spoiler_log[name] = previous.spoiler_log[name]
+
+        for sphere, locations in game.spheres.items():
+            key = str(sphere)
+            if sphere in changed_spheres or key not in previous.spheres:
+                snapshot.spheres[key] = [location.to_dict() for location in locations]
+            else:
+                snapshot.spheres[key] = previous.spheres[key]
+
+        self.current = snapshot
+        return snapshot
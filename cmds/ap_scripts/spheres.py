@@ -0,0 +1,82 @@
+def location_key(location) -> tuple[str, str]:
+    """Identifies a location by its owner and name, rather than by the object,
+    so the same location re-created from the spoiler or the log still matches."""
+    return (str(location.player), location.name)
+
+
+class SphereIndex(dict):
+    """Playthrough spheres, keyed by sphere number with the list of locations in that sphere as value.
+
+    Membership is tracked in sets, and each sphere keeps a count of its
+    locations that haven't been checked yet, so adding a location and
+    checking whether a sphere is complete are both O(1)."""
+
+    def __init__(self):
+        super().__init__()
+        self.location_spheres: dict[tuple[str, str], int] = {}
+        self.checked: set[tuple[str, str]] = set()
+        self.remaining: dict[int, int] = {}
+
+    def ensure(self, sphere: int) -> list:
+        """Create the sphere if it doesn't exist yet."""
+        if sphere not in self:
+            self[sphere] = []
+            self.remaining[sphere] = 0
+        return self[sphere]
+
+    def add(self, sphere: int, location) -> bool:
+        """Add the location to the sphere. A location is only ever in one sphere,
+        so returns False if it's already in this one or another."""
+        self.ensure(sphere)
+        key = location_key(location)
+        if key in self.location_spheres:
+            return False
+        self[sphere].append(location)
+        self.location_spheres[key] = sphere
+        if location.is_checked:
+            self.checked.add(key)
+        else:
+            self.remaining[sphere] += 1
+        return True
+
+    def mark_checked(self, location) -> int | None:
+        """Count the location as checked. Returns its sphere, or None if it isn't in one."""
+        key = location_key(location)
+        sphere = self.location_spheres.get(key)
+        if sphere is None or key in self.checked:
+            return sphere
+        self.checked.add(key)
+        self.remaining[sphere] -= 1
+        return sphere
+
+    def is_complete(self, sphere: int) -> bool:
+        return sphere in self and self.remaining[sphere] == 0
+
+    def next_sphere(self, sphere: int) -> int:
+        """The next sphere after this one that has any locations in it."""
+        sphere += 1
+        while sphere in self and len(self[sphere]) == 0:
+            sphere += 1
+        return sphere
+
+    def collapsed(self) -> "SphereIndex":
+        """A copy with empty spheres removed and the rest renumbered from 0."""
+        index = SphereIndex()
+        new_sphere_number = 0
+        for old_sphere_number in sorted(self.keys()):
+            if len(self[old_sphere_number]) > 0:
+                for location in self[old_sphere_number]:
+                    index.add(new_sphere_number, location)
+                new_sphere_number += 1
+        return index
+
+    def progress(self) -> dict:
+        """Checked/total counts for every sphere."""
+        return {
+            sphere: {
+                "total": len(locations),
+                "checked": len(locations) - self.remaining[sphere],
+                "remaining": self.remaining[sphere],
+            }
+            for sphere, locations in sorted(self.items())
+        }
@@ -0,0 +1,190 @@
+import logging
+import os
+import pathlib
+import pickle
+import re
+import time
+from typing import Iterator
+
+import requests
+
+from cmds.ap_scripts import http_client
+
+logger = logging.getLogger("ap_itemlog")
+
+# Raw spoilers are keyed by host and seed, so rooms sharing a seed share the download
+SPOILER_CACHE = pathlib.Path(".cache/spoilers")
+
+DOWNLOAD_ATTEMPTS = 5
+DOWNLOAD_TIMEOUT = (10, 60)  # (connect, read between chunks) in seconds
+CHUNK_SIZE = 256 * 1024
+
+# Bump this whenever process_spoiler_log changes what it records,
+# so parsed spoilers from an older parser are ignored and re-parsed
+SPOILER_PARSER_VERSION = 2
+
+# Another process downloading the same seed; wait for it rather than fetching twice
+LOCK_STALE_AFTER = 10 * 60
+LOCK_WAIT = 2
+
+content_range_start = re.compile(r"^bytes (\d+)-")
+
+
+def cache_name(hostname: str, seed_id: str) -> str:
+    # Seed IDs are only unique per webhost
+    return re.sub(r"[^\w.-]", "_", f"{hostname}_{seed_id}")
+
+
+def spoiler_path(hostname: str, seed_id: str) -> pathlib.Path:
+    return SPOILER_CACHE / f"{cache_name(hostname, seed_id)}.txt"
+
+
+def download_spoiler(hostname: str, seed_id: str) -> pathlib.Path | None:
+    """Download the seed's spoiler log to the on-disk cache, if it isn't there already.
+
+    Downloads are streamed to a `.part` file and resumed with a Range request
+    after a dropped connection (or a restart). Returns None if it couldn't be
+    downloaded."""
+    path = spoiler_path(hostname, seed_id)
+    if path.exists():
+        logger.info(f"Using cached spoiler log for seed {seed_id}.")
+        return path
+
+    SPOILER_CACHE.mkdir(parents=True, exist_ok=True)
+    lock_path = path.with_suffix(".lock")
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL))
+            break
+        except FileExistsError:
+            if path.exists():
+                return path
+            if time.time() - lock_path.stat().st_mtime > LOCK_STALE_AFTER:
+                logger.warning(f"Taking over stale spoiler download lock for seed {seed_id}.")
+                lock_path.unlink(missing_ok=True)
+                continue
+            time.sleep(LOCK_WAIT)
+
+    try:
+        if path.exists():
+            # Someone else finished it while we waited for the lock
+            return path
+        if _download(f"https://{hostname}/dl_spoiler/{seed_id}", path):
+            return path
+        return None
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+
+def _download(url: str, path: pathlib.Path) -> bool:
+    part_path = path.with_suffix(".part")
+    for attempt in range(DOWNLOAD_ATTEMPTS):
+        have = part_path.stat().st_size if part_path.exists() else 0
+        # Ask for the raw bytes, so Range offsets line up with what's on disk
+        headers = {"Accept-Encoding": "identity"}
+        if have:
+            headers["Range"] = f"bytes={have}-"
+
+        try:
+            with http_client.get(
+                url, headers=headers, timeout=DOWNLOAD_TIMEOUT, stream=True
+            ) as response:
+                if response.status_code == 416:
+                    if response.headers.get("Content-Range", "").endswith(f"/{have}"):
+                        # We already have all of it
+                        part_path.replace(path)
+                        return True
+                    # The partial file doesn't match what's on the server, start over
+                    part_path.unlink(missing_ok=True)
+                    continue
+                response.raise_for_status()
+
+                if response.status_code == 206:
+                    match = content_range_start.match(response.headers.get("Content-Range", ""))
+                    if not match or int(match.group(1)) != have:
+                        # Appending anything but the bytes right after ours would corrupt it
+                        logger.warning(
+                            f"Spoiler log server resumed at the wrong place ({response.headers.get('Content-Range')}), starting over."
+                        )
+                        part_path.unlink(missing_ok=True)
+                        continue
+                    mode = "ab"
+                    logger.info(f"Resuming spoiler log download at {have} bytes.")
+                else:
+                    mode = "wb"  # Server ignored the range (or there wasn't one)
+                    logger.info("Downloading spoiler log.")
+
+                with open(part_path, mode) as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+        except requests.RequestException as e:
+            delay = http_client.backoff(attempt)
+            logger.warning(
+                f"Spoiler log download interrupted ({e}), retrying in {delay:.1f}s."
+            )
+            time.sleep(delay)
+            continue
+
+        part_path.replace(path)
+        logger.info(f"Downloaded spoiler log ({path.stat().st_size} bytes).")
+        return True
+
+    logger.error(f"Failed to download spoiler log after {DOWNLOAD_ATTEMPTS} attempts.")
+    return False
+
+
+def spoiler_lines(path: pathlib.Path) -> Iterator[str]:
+    """Yield the spoiler log's lines one at a time, without their newlines."""
+    with open(path, "r", encoding="UTF-8", errors="replace", newline="\n") as file:
+        for line in file:
+            yield line[:-1] if line.endswith("\n") else line
+
+
+def artifact_path(hostname: str, seed_id: str) -> pathlib.Path:
+    return SPOILER_CACHE / f"{cache_name(hostname, seed_id)}.parsed.v{SPOILER_PARSER_VERSION}.pickle"
+
+
+def save_spoiler_artifact(hostname: str, seed_id: str, artifact: dict) -> bool:
+    """Save the result of parsing a seed's spoiler, so later starts can skip the parse.
+
+    The artifact only holds plain records (names, settings, tuples), not the
+    room's Item/Location/Player objects, so any room on the seed can load it."""
+    path = artifact_path(hostname, seed_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as file:
+            pickle.dump(
+                {
+                    "version": SPOILER_PARSER_VERSION,
+                    "hostname": hostname,
+                    "seed_id": seed_id,
+                    **artifact,
+                },
+                file,
+                pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temp_path, path)
+    except (OSError, pickle.PicklingError, TypeError) as e:
+        logger.error(f"Failed to save parsed spoiler log: {e}")
+        return False
+    return True
+
+
+def load_spoiler_artifact(hostname: str, seed_id: str) -> dict | None:
+    path = artifact_path(hostname, seed_id)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as file:
+            artifact = pickle.load(file)
+    except Exception as e:
+        logger.warning(f"Couldn't load parsed spoiler log, parsing it again: {e}")
+        return None
+    if (
+        artifact.get("version") != SPOILER_PARSER_VERSION
+        or artifact.get("hostname") != hostname
+        or artifact.get("seed_id") != seed_id
+    ):
+        return None
+    return artifact
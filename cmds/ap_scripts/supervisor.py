@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from cmds.ap_scripts import http_client
+
+logger = logging.getLogger("ap_supervisor")
+
+ITEMLOG_SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "ap_itemlog.py")
+ROOMHOST_SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "ap_roomhost.py")
+
+# Rooms get webview ports handed out from here, instead of each one scanning for its own
+ROOM_PORT_START = 42069
+ROOMS_PER_HOST = 8  # Default for bot.archipelago.rooms_per_host
+
+HEALTH_INTERVAL = 30  # Seconds between health checks
+STARTUP_GRACE = 15 * 60  # Parsing a spoiler and catching up on the log can take a while
+STALE_POLL = 30 * 60  # A room that hasn't polled its log in this long is stuck
+MAX_FAILED_CHECKS = 3
+
+RESTART_BACKOFF_BASE = 10  # seconds, doubled every consecutive crash
+RESTART_BACKOFF_MAX = 30 * 60
+STABLE_AFTER = 30 * 60  # A host that stays up this long has its backoff reset
+
+
+def room_env(log: dict) -> dict:
+    """The variables an itemlog reads its room configuration from."""
+    return {
+        "LOG_URL": log["log_url"],
+        "WEBHOOK_URL": log["webhooks"][0] if len(log["webhooks"]) > 0 else "",
+        "SESSION_COOKIE": log["session_cookie"],
+        "SPOILER_URL": log["spoiler_url"] if log["spoiler_url"] else "",
+        "MSGHOOK_URL": log["msghooks"][0] if len(log["msghooks"]) > 0 else "",
+        "METAHOOK_URL": (
+            log["meta_webhook"] if "meta_webhook" in log and log["meta_webhook"] is not None else ""
+        ),
+    }
+
+
+def itemlog_env(log: dict) -> dict:
+    """The environment an itemlog process reads its room configuration from."""
+    env = os.environ.copy()
+    env.update(room_env(log))
+    return env
+
+
+def port_is_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(("0.0.0.0", port))
+            return True
+        except OSError:
+            return False
+
+
+class RoomWorker:
+    """One supervised itemlog room, and how its health checks have gone."""
+
+    def __init__(self, log: dict):
+        self.log = log
+        self.room_id: str = log["log_url"].split("/")[-1]
+        self.guild = log.get("guild")
+        self.port: int = None
+        self.host: "RoomHost" = None
+
+        self.failed_checks: int = 0
+        self.last_health: dict = None
+
+    def check(self) -> bool:
+        """Ask the room's webview how it's doing. False if it's unreachable or stuck."""
+        try:
+            response = http_client.get(
+                f"http://localhost:{self.port}/health", timeout=5, retries=0
+            )
+            response.raise_for_status()
+            self.last_health = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.debug(f"Health check for room {self.room_id} failed: {e}")
+            return False
+
+        if self.last_health.get("finished"):
+            return True  # Finished rooms stop polling their log, but keep their webview up
+        last_poll = self.last_health.get("last_poll")
+        if last_poll is not None and time.time() - last_poll > STALE_POLL:
+            logger.warning(f"Room {self.room_id} hasn't polled its log since {last_poll}.")
+            return False
+        return True
+
+    def status(self) -> dict:
+        host = self.host
+        return {
+            "room_id": self.room_id,
+            "guild": self.guild,
+            "port": self.port,
+            "host": host.name,
+            "pid": host.process.pid if host.process else None,
+            "running": host.is_running(),
+            "uptime": time.monotonic() - host.started_at if host.is_running() else None,
+            "restarts": host.restarts,
+            "failed_checks": self.failed_checks,
+            "health": self.last_health,
+        }
+
+
+class RoomHost:
+    """One ap_roomhost.py process running a few rooms, restarted with backoff
+    when it crashes or one of its rooms stops responding."""
+
+    def __init__(self, name: str, rooms: list[RoomWorker]):
+        self.name = name
+        self.rooms = rooms
+        for room in rooms:
+            room.host = self
+        self.process: subprocess.Popen = None
+
+        self.started_at: float = None
+        self.restarts: int = 0
+        self.crashes: int = 0  # Consecutive, reset once the host has been stable for a while
+        self.next_start: float = 0
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, ports: list[int]):
+        rooms = []
+        for room, port in zip(self.rooms, ports):
+            room.port = port
+            room.failed_checks = 0
+            room.last_health = None
+            rooms.append({**room_env(room.log), "FLASK_PORT": str(port)})
+
+        env = os.environ.copy()
+        env["ITEMLOG_ROOMS"] = json.dumps(rooms)
+        logger.info(
+            f"Starting {self.name} for room(s) "
+            + ", ".join(f"{room.room_id} on port {room.port}" for room in self.rooms)
+        )
+        self.process = subprocess.Popen([sys.executable, ROOMHOST_SCRIPT], env=env)
+        self.started_at = time.monotonic()
+
+    def stop(self, timeout: float = 10):
+        if not self.is_running():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{self.name} didn't stop in time, killing it.")
+            self.process.kill()
+            self.process.wait()
+
+    def schedule_restart(self):
+        uptime = time.monotonic() - self.started_at if self.started_at else 0
+        if uptime > STABLE_AFTER:
+            self.crashes = 0
+        delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2**self.crashes)
+        self.crashes += 1
+        self.restarts += 1
+        self.next_start = time.monotonic() + delay
+        self.process = None
+        logger.warning(f"Restarting {self.name} in {delay}s (restart #{self.restarts})")
+
+
+class Supervisor:
+    """Keeps a set of itemlog rooms running, a few to each host process,
+    and knows where to reach each one."""
+
+    def __init__(self, logs: list[dict], rooms_per_host: int = ROOMS_PER_HOST):
+        self.workers: dict[str, RoomWorker] = {}
+        for log in logs:
+            worker = RoomWorker(log)
+            self.workers[worker.room_id] = worker
+
+        rooms = list(self.workers.values())
+        rooms_per_host = max(1, rooms_per_host)
+        self.hosts: list[RoomHost] = [
+            RoomHost(f"host-{index}", rooms[start : start + rooms_per_host])
+            for index, start in enumerate(range(0, len(rooms), rooms_per_host))
+        ]
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def free_ports(self, count: int) -> list[int]:
+        taken = {
+            room.port for host in self.hosts if host.is_running() for room in host.rooms
+        }
+        ports = []
+        port = ROOM_PORT_START
+        while len(ports) < count:
+            if port not in taken and port_is_free(port):
+                ports.append(port)
+            port += 1
+        return ports
+
+    def tick(self):
+        """Start, health check and restart rooms as needed.
+
+        The health checks are HTTP requests, so they run with the lock released,
+        on a list of the rooms to check taken while holding it."""
+        now = time.monotonic()
+        to_check: list[tuple[RoomWorker, bool]] = []  # (room, still starting up)
+        with self.lock:
+            for host in self.hosts:
+                if host.process is None:
+                    if now >= host.next_start:
+                        host.start(self.free_ports(len(host.rooms)))
+                    continue
+
+                exit_code = host.process.poll()
+                if exit_code is not None:
+                    logger.error(f"{host.name} exited with code {exit_code}.")
+                    host.schedule_restart()
+                    continue
+
+                for room in host.rooms:
+                    # Still starting up, the webview only comes up once the room is ready
+                    starting = now - host.started_at < STARTUP_GRACE and room.last_health is None
+                    to_check.append((room, starting))
+
+        results = [(room, starting, room.check()) for room, starting in to_check]
+
+        failing: set[RoomHost] = set()
+        with self.lock:
+            for room, starting, healthy in results:
+                if starting:
+                    continue
+                if healthy:
+                    room.failed_checks = 0
+                    continue
+                room.failed_checks += 1
+                if room.failed_checks >= MAX_FAILED_CHECKS:
+                    logger.error(
+                        f"Room {room.room_id} failed {room.failed_checks} health checks, restarting {room.host.name}."
+                    )
+                    failing.add(room.host)
+
+        for host in failing:
+            host.stop()
+            with self.lock:
+                host.schedule_restart()
+
+    def run(self):
+        logger.info(f"Supervising {len(self.workers)} itemlog room(s) in {len(self.hosts)} host(s).")
+        try:
+            while not self.stopping.is_set():
+                self.tick()
+                self.stopping.wait(HEALTH_INTERVAL)
+        finally:
+            with self.lock:
+                for host in self.hosts:
+                    host.stop()
+
+    def stop(self):
+        self.stopping.set()
+
+    def port_for(self, room_id: str) -> int | None:
+        worker = self.workers.get(room_id)
+        if worker and worker.host.is_running():
+            return worker.port
+        return None
+
+    def status(self) -> list[dict]:
+        with self.lock:
+            return [worker.status() for worker in self.workers.values()]
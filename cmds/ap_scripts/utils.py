@@ -1,8 +1,12 @@
+import copy
 import datetime
 import fnmatch
+import json
 import logging
 import math
+import pathlib
 import re
+import sys
 import time
 from typing import Any, Iterable
 from zoneinfo import ZoneInfo
@@ -11,9 +15,19 @@ import discord
 import psycopg2 as psql
 import requests
 import yaml
-
-from cmds.ap_scripts.emitter import event_emitter
+from psycopg2.extras import execute_values
+
+from cmds import db
+from cmds.ap_scripts import datapackage_import, http_client, metrics
+from cmds.ap_scripts.emitter import EventEmitter, event_emitter
+from cmds.ap_scripts.hints import HintIndex
+from cmds.ap_scripts.inventory import Inventory
+from cmds.ap_scripts.item_index import ItemIndex
+from cmds.ap_scripts.item_metadata import ItemMetadata
+from cmds.ap_scripts.location_table import LocationTable
 from cmds.ap_scripts.name_translations import gzDoomMapNames
+from cmds.ap_scripts.players import PlayerRegistry
+from cmds.ap_scripts.spheres import SphereIndex
 
 # setup logging
 logger = logging.getLogger("ap_itemlog")
@@ -22,15 +36,8 @@ with open("config.yaml", "r", encoding="UTF-8") as file:
     cfg = yaml.safe_load(file)
 
 
-sqlcfg = cfg["bot"]["psql"]
 try:
-    sqlcon = psql.connect(
-        dbname=sqlcfg["database"],
-        user=sqlcfg["user"],
-        password=sqlcfg["password"] if "password" in sqlcfg else None,
-        host=sqlcfg["host"],
-        port=sqlcfg["port"],
-    )
+    sqlcon = db.connect()
 except psql.OperationalError:
     # TODO Disable commands that need SQL connectivity
     sqlcon = False
@@ -39,7 +46,31 @@ except psql.OperationalError:
 classification_cache = {}
 cache_timeout = 1 * 60 * 60  # 1 hour(s)
 
-item_table = {}
+# Datapackages never change for a given checksum, so they're cached on disk
+DATAPACKAGE_CACHE = pathlib.Path(".cache/datapackages")
+datapackage_id_cache = {}  # checksum -> {"items": {id: name}, "locations": {id: name}}
+
+# The tracker API's HintStatus values, named the way the room log prints them
+HINT_STATUSES = {0: "unspecified", 10: "no priority", 20: "avoid", 30: "priority", 40: "found"}
+
+# archipelago.game_locations and item_classifications for this room's games,
+# so Locations and Items don't each query them
+location_table = LocationTable()
+item_metadata = ItemMetadata()
+
+
+def intern_name(name: str | None) -> str | None:
+    """Intern a game/item/location name. The same few thousand names are
+    repeated across every item in a seed, so they can share one string."""
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def epoch_seconds(timestamp) -> float | None:
+    """Store timestamps as epoch floats, whether we got a datetime or one already."""
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp.timestamp()
+    return timestamp
+
 
 gzd = gzDoomMapNames()
 
@@ -143,21 +174,62 @@ class Game(dict):
     running: bool = False
     has_spoiler: bool = False
 
-    world_settings = {}
-    spoiler_log = {}
-    players = {}
-    spheres = {} # Playthrough spheres
+    world_settings: dict
+    spoiler_log: dict
+    players: PlayerRegistry  # Keyed by slot name
+    spheres: SphereIndex  # Playthrough spheres
     current_sphere: int = 1
     collected_locations: int = 0
     total_locations: int = 0
     collection_percentage: float = 0.0
-    milestones = set()
+    milestones: set
     start_timestamp: float = None
 
+    # Where milestones and sphere completions are announced. An itemlog sets its own,
+    # so rooms hosted in the same process only hear about their own game
+    events: EventEmitter = event_emitter
+
     # This is a cache for Item instances, so we don't have to create new ones every time
-    # Unique by (sender, location)
-    # Store it in the Game class to keep duplicate instances minimal
-    item_instance_cache = {}
+    # Unique by (sender, location, item), and indexed by receiver, name and classification
+    # Store it on the Game to keep duplicate instances minimal
+    item_instance_cache: ItemIndex
+
+    # Attributes saved in checkpoints. Some are still class-level defaults until
+    # they're first set, so they wouldn't be in the instance __dict__
+    checkpoint_fields = (
+        "hostname", "seed", "room_id", "tracker_id", "version_generator",
+        "version_server", "running", "has_spoiler", "world_settings", "spoiler_log",
+        "players", "spheres", "current_sphere", "collected_locations",
+        "total_locations", "collection_percentage", "milestones", "start_timestamp",
+        "item_instance_cache",
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.world_settings = {}
+        self.spoiler_log = {}
+        self.players = PlayerRegistry()
+        self.spheres = SphereIndex()
+        self.milestones = set()
+        self.item_instance_cache = ItemIndex()
+
+        # How many of each player's received items (by slot ID) the tracker has given us so far
+        self.tracker_received = {}
+        # Items collected from the tracker that haven't shown up in the log yet
+        self.tracker_collected = set()
+
+        # What's changed since the webview snapshot was last published, see snapshot.py
+        self.changed_players = set()
+        self.changed_spheres = set()
+
+    def __getstate__(self):
+        state = {field: getattr(self, field) for field in self.checkpoint_fields}
+        state.update(self.__dict__)
+        state.pop("events", None)  # Its listeners belong to the running itemlog
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
 
     def init_db(self):
         cursor = sqlcon.cursor()
@@ -173,10 +245,9 @@ class Game(dict):
         )
 
     def update_locations(self):
-        self.collected_locations = sum(
-            [p.collected_locations for p in self.players.values()]
-        )
-        self.total_locations = sum([p.total_locations for p in self.players.values()])
+        """Refresh the completion percentage and milestones.
+        collected_locations is counted as locations are checked (see Player.location_checked),
+        and total_locations comes from the tracker."""
         self.collection_percentage = (
             (self.collected_locations / self.total_locations) * 100
             if self.total_locations > 0
@@ -187,18 +258,10 @@ class Game(dict):
         self.check_sphere_completion()
 
     def check_sphere_completion(self):
-        if self.current_sphere in self.spheres and all(
-            l.is_checked for l in self.spheres[self.current_sphere]
-        ):
+        while self.spheres.is_complete(self.current_sphere):
             message = f"**The game has completed Sphere {self.current_sphere}!**"
-            event_emitter.emit("sphere_completion", message)  # Emit the sphere completion message
-            self.current_sphere += 1
-            if self.current_sphere in self.spheres: 
-                try:
-                    while len(self.spheres[self.current_sphere]) == 0: # This shouldn't happen, but just in case
-                        self.current_sphere += 1
-                except KeyError:
-                    pass
+            self.events.emit("sphere_completion", message)  # Emit the sphere completion message
+            self.current_sphere = self.spheres.next_sphere(self.current_sphere)
 
     def check_milestones(self):
         milestones = [25, 50, 75, 80, 90, 100]  # Define milestones
@@ -210,28 +273,34 @@ class Game(dict):
                 self.milestones.add(milestone)
                 logger.info(f"Game reached {milestone}% completion!")
                 message = f"**The game has reached {milestone}% completion!**"
-                event_emitter.emit("milestone", message)  # Emit the milestone message
+                self.events.emit("milestone", message)  # Emit the milestone message
 
-    def to_dict(self):
-        logger.info("Serializing game state to dictionary.")
+    def summary_dict(self):
+        """The game-wide fields of to_dict, without the players, spoiler log and spheres."""
         return {
             "seed": self.seed,
             "room_id": self.room_id,
             "version_generator": self.version_generator,
             "version_server": self.version_server,
-            "world_settings": self.world_settings,
+            "world_settings": copy.deepcopy(self.world_settings),
             "start_timestamp": self.start_timestamp,
             "running": self.running,
+            "current_sphere": self.current_sphere,
+            "collected_locations": self.collected_locations,
+            "total_locations": self.total_locations,
+            "collection_percentage": self.collection_percentage,
+        }
+
+    def to_dict(self):
+        logger.debug("Serializing game state to dictionary.")
+        return {
+            **self.summary_dict(),
             "spoiler_log": {
                 k: {lk: lv.to_dict() for lk, lv in v.items()}
                 for k, v in self.spoiler_log.items()
             },
             "players": {k: v.to_dict() for k, v in self.players.items()},
             "spheres": {str(k): [l.to_dict() for l in v] for k, v in self.spheres.items()},
-            "current_sphere": self.current_sphere,
-            "collected_locations": self.collected_locations,
-            "total_locations": self.total_locations,
-            "collection_percentage": self.collection_percentage,
         }
 
     def get_or_create_item(
@@ -253,26 +322,28 @@ class Game(dict):
             logger.error(f"Invalid sender type: {type(sender)}")
             return None
         
+        location = intern_name(location)
+        itemname = intern_name(itemname)
         key = (sender_key, location, itemname)
         # logger.debug(f"Looking for item with key: '{key}' in cache.")
         
         if key in self.item_instance_cache:
             item = self.item_instance_cache[key]
             if received_timestamp is not None:
-                item.received_timestamp = received_timestamp
+                item.received_timestamp = epoch_seconds(received_timestamp)
             logger.debug(f"Item with key: {key} found in cache. Returning cached instance.")
             return item
         elif get_only is True and key not in self.item_instance_cache:
             logger.debug(f"Item with key: {key} not found in cache. get_only=True, returning None.")
             # Debug: Show what keys ARE in cache for this sender/location combo
-            similar_keys = [k for k in self.item_instance_cache.keys() if k[0] == sender_key and k[1] == location]
+            similar_keys = self.item_instance_cache.at_location(sender_key, location)
             if similar_keys:
                 logger.debug(f"  Similar cached items found: {similar_keys}")
             return None
         else:
             logger.debug(f"Item with key: {key} not found in cache. Creating new item instance.")
             obj = Item(sender, receiver, itemname, location, entrance, received_timestamp)
-            self.item_instance_cache[key] = obj
+            self.item_instance_cache.add(key, obj)
             return obj
         
     def add_to_sphere(self, item: 'Item', sphere: int, player: 'Player' = None):
@@ -298,8 +369,7 @@ class Game(dict):
             return
         
         # Ensure sphere exists
-        if sphere not in self.spheres:
-            self.spheres[sphere] = []
+        self.spheres.ensure(sphere)
         
         location = item.location
         
@@ -337,42 +407,38 @@ class Game(dict):
                 )
         
         # Add to global sphere
-        if location not in self.spheres[sphere]:
-            self.spheres[sphere].append(location)
+        if self.spheres.add(sphere, location):
             logger.debug(f"Added {item.name} to global sphere {sphere}")
         
         # Add to location owner's sphere
-        if location_owner.spheres.get(sphere) is None:
-            location_owner.spheres[sphere] = []
-        
-        if location not in location_owner.spheres[sphere]:
-            location_owner.spheres[sphere].append(location)
+        if location_owner.spheres.add(sphere, location):
             logger.debug(f"Added {item.name} to {location_owner.name}'s sphere {sphere}")
 
     def get_player(self, player):
-        """Get a Player object by name or ID."""
+        """Get a Player object by name, alias or ID."""
         if isinstance(player, Player):
             # Verify it's actually in our players dict
-            if player in self.players.values():
+            if self.players.contains(player):
                 return player
             # If not, try to find by name as fallback
-            if hasattr(player, 'name') and player.name in self.players:
+            if player.name in self.players:
                 return self.players[player.name]
             logger.warning(f"Player object {player} not found in game.players")
             return None
         
         elif isinstance(player, int):
-            for p in self.players.values():
-                if p.id == player:
-                    return p
-            logger.warning(f"No player with ID {player} found")
-            return None
+            found = self.players.by_id(player)
+            if found is None:
+                logger.warning(f"No player with ID {player} found")
+            return found
         
         elif isinstance(player, str):
             if player in self.players:
                 return self.players[player]
-            logger.warning(f"No player named '{player}' found")
-            return None
+            found = self.players.by_alias(player)
+            if found is None:
+                logger.warning(f"No player named '{player}' found")
+            return found
         
         logger.warning(f"Invalid player parameter type: {type(player)}")
         return None
@@ -381,7 +447,7 @@ class Game(dict):
         """Fetch room API data and update the Game instance accordingly."""
         api_url = f"http://{self.hostname}/api/room_status/{self.room_id}"
         logger.info(f"Fetching room info from {api_url}.")
-        room_api = requests.get(api_url).json()
+        room_api = http_client.get(api_url).json()
         self.tracker_id = room_api["tracker"]
 
         player_id = 1
@@ -395,13 +461,34 @@ class Game(dict):
         del player
         logger.info("Room info fetched and players initialized.")
 
+    def preload_metadata(self):
+        """Load archipelago.game_locations and item_classifications for every game
+        in the room, one query each, so creating Locations and Items doesn't
+        query them once per location and item."""
+        if not sqlcon:
+            return
+        games = {player.game for player in self.players.values()}
+        with sqlcon.cursor() as cursor:
+            with metrics.db_seconds.time(operation="schema"):
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS archipelago.item_classifications (game bpchar, item bpchar, classification varchar(32), datapackage_checksum varchar(64))"
+                )
+                cursor.execute(
+                    "ALTER TABLE archipelago.item_classifications ADD COLUMN IF NOT EXISTS datapackage_checksum varchar(64)"
+                )
+                sqlcon.commit()
+            locations = location_table.preload(cursor, games)
+            items = item_metadata.preload(cursor, games)
+        logger.info(f"locationsdb: preloaded {locations} locations for {len(games)} games")
+        logger.info(f"itemsdb: preloaded {items} items for {len(games)} games")
+
     def fetch_static_tracker(self) -> bool:
         """Grab static tracker data from the Archipelago server for this room.
         This should only be called once on boot, as the static data does not change."""
         tracker_url = f"http://{self.hostname}/api/static_tracker/{self.tracker_id}"
 
         logger.info(f"Fetching static tracker data from {tracker_url}")
-        tracker_data = requests.get(tracker_url)
+        tracker_data = http_client.get(tracker_url)
         if tracker_data.status_code != 200:
             logger.error(
                 f"Failed to fetch static tracker data from {tracker_url}: HTTP {tracker_data.status_code}"
@@ -452,7 +539,7 @@ class Game(dict):
         tracker_url = f"http://{self.hostname}/api/tracker/{self.tracker_id}"
 
         logger.info(f"Fetching dynamic tracker data from {tracker_url}")
-        tracker_data = requests.get(tracker_url)
+        tracker_data = http_client.get(tracker_url)
         if tracker_data.status_code != 200:
             logger.error(
                 f"Failed to fetch static tracker data from {tracker_url}: HTTP {tracker_data.status_code}"
@@ -496,54 +583,14 @@ class Game(dict):
         for p in tracker_json["connection_timers"]:
             pass  # we already track this via the logs
 
-        for p in tracker_json["hints"]:
-            player = self.get_player(p["player"])
-
-            # Can't do anything with this yet, but here's the structure:
-            ### receiving_player: int # player ID
-            ### finding_player: int # player ID
-            ### location: int # location ID
-            ### item: int # item ID
-            ### found: bool # whether the hint was found or not
-            ### entrance: str = "" # entrance name, if applicable
-            ### item_flags: int = 0 # bitfield of item flags
-            ### status: HintStatus
-
-            ### item/location IDs can be determined by the game datapackage
-            ### /api/datapackage/<datapackage_checksum>
-            ### item_name_to_id and location_name_to_id dicts
-
-            ### HintStatus:
-            ### 0 : Unspecified
-            ### 10 : No Priority (unset)
-            ### 20 : Avoid (traps etc)
-            ### 30 : Priority (progression etc)
-            ### 40 : Found
-
-            ### Example:
-            ### [2,1,60238,12320772,true,"Kakariko Shop",1,40]:
-            ### Player 2 received a hint from player 1 about location 60238 containing item 12320772
-            ### The item was found, the location is "Kakariko Shop", the item has the 'useful' flag, and the hint status is 'found'
-
-            pass
-
-        for p in tracker_json["player_checks_done"]:
-            pass  # I need to somehow figure out location IDs mapping to location names
-
-        for p in tracker_json["player_items_received"]:
-            player = self.get_player(p["player"])
-
-            ### Can't do anything about this either, but the structure is more simple:
-            ### item: int # item ID
-            ### location: int # location ID
-            ### player: int # player ID of the *SENDING* player
-            ### flags: int # bitfield of item flags, same as above
-
-            ### Example:
-            ### [54, 15471852, 4, 0] for player 1:
-            ### Player 1 received item 54 at location 15471852 from player 4, and it was a filler item (0)
-
-            pass
+        ### hints: per player, a list of
+        ###     [receiving_player, finding_player, location, item, found, entrance, item_flags, status]
+        ### player_checks_done: per player, the location IDs they've checked
+        ### player_items_received: per player, a list of NetworkItems they've received:
+        ###     [item, location, sending_player, flags]
+        ### HintStatus: 0 Unspecified, 10 No Priority, 20 Avoid, 30 Priority, 40 Found
+        ### Item and location IDs are mapped to names through each player's datapackage.
+        self.reconcile_tracker(tracker_json)
 
         for p in tracker_json["player_status"]:
             player = self.get_player(p["player"])
@@ -560,6 +607,9 @@ class Game(dict):
                     case _:
                         pass  # other statuses might be implemented later on
 
+        # Aliases and statuses can change any player
+        self.changed_players.update(self.players)
+
         for t in tracker_json["total_checks_done"]:
             ### There's no teams in AP, so there's always just one entry with team 0
             ### checks_done: int # total checks done by the team
@@ -569,12 +619,89 @@ class Game(dict):
         logger.info("Dynamic tracking info successfully processed.")
         return True
 
+    def id_maps(self, player: "Player") -> dict | None:
+        """ID to name maps for the player's game, see datapackage_id_maps."""
+        checksum = player.settings.get("datapackage_checksum")
+        if not checksum:
+            return None
+        return datapackage_id_maps(self.hostname, checksum)
+
+    def tracker_item(
+        self, sender_id: int, receiver_id: int, item_id: int, location_id: int, entrance: str = None
+    ):
+        """The Item for a tracker API record, or None if it isn't one of the slots' items."""
+        sender = self.players.by_id(sender_id)
+        receiver = self.players.by_id(receiver_id)
+        if sender is None or receiver is None:
+            return None  # Slot 0 is the server: starting items, admin commands
+        location = self.id_maps(sender)["locations"].get(location_id)
+        item = self.id_maps(receiver)["items"].get(item_id)
+        if location is None or item is None:
+            logger.warning(
+                f"Unknown tracker IDs: location {location_id} for {sender.name}, item {item_id} for {receiver.name}"
+            )
+            return None
+        return self.get_or_create_item(sender, receiver, item, location, entrance=entrance)
+
+    def reconcile_tracker(self, tracker_json: dict) -> int:
+        """Apply the tracker API's collected items and hints to the game state,
+        filling in anything the log missed (or hasn't got to yet).
+
+        Received items are picked up from where the last call left off, so a
+        refresh only costs what changed. Returns the number of items collected."""
+        missing = [p.name for p in self.players.values() if self.id_maps(p) is None]
+        if missing:
+            logger.warning(f"No datapackage for {', '.join(missing)}, can't reconcile the tracker.")
+            return 0
+
+        collected = []
+        for p in tracker_json["player_items_received"]:
+            receiver = self.get_player(p["player"])
+            if receiver is None:
+                continue
+            items = p["items"]
+            for network_item in items[self.tracker_received.get(receiver.id, 0) :]:
+                item_id, location_id, sender_id = network_item[:3]
+                item = self.tracker_item(sender_id, receiver.id, item_id, location_id)
+                if item is None or item.found:
+                    continue
+                sender = item.location.player
+                sender.collect_item(item)
+                self.spoiler_log[sender.name][item.location.name] = item
+                self.tracker_collected.add(item)
+                collected.append(item)
+            self.tracker_received[receiver.id] = len(items)
+
+        # Every player's list has the hints they're finding and receiving,
+        # so each hint shows up twice; add_hint ignores the repeat
+        for p in tracker_json["hints"]:
+            for hint in p["hints"]:
+                receiving_id, finding_id, location_id, item_id, found, entrance = hint[:6]
+                item = self.tracker_item(finding_id, receiving_id, item_id, location_id, entrance or None)
+                if item is None:
+                    continue
+                status = "found" if found else HINT_STATUSES.get(hint[7] if len(hint) > 7 else 0, "unspecified")
+                finder = item.location.player
+                if item.location.name not in self.spoiler_log[finder.name]:
+                    self.spoiler_log[finder.name][item.location.name] = item
+                finder.add_hint("sending", item, status)
+                item.receiver.add_hint("receiving", item, status)
+                item.hint()
+
+        if collected:
+            logger.info(f"Collected {len(collected)} item(s) from the tracker that the log hadn't shown.")
+            db_add_locations([item.location for item in collected], is_check=True)
+            for sender in {item.location.player for item in collected}:
+                sender.update_locations(self)
+            self.update_locations()
+        return len(collected)
+
     def fetch_slot_data(self) -> bool:
         """Fetch slot data from the Archipelago server for this room."""
         slot_url = f"http://{self.hostname}/api/slot_data_tracker/{self.tracker_id}"
 
         logger.info(f"Fetching slot data from {slot_url}")
-        slot_data = requests.get(slot_url)
+        slot_data = http_client.get(slot_url)
         if slot_data.status_code != 200:
             logger.error(
                 f"Failed to fetch slot data from {slot_url}: HTTP {slot_data.status_code}"
@@ -626,20 +753,22 @@ class Game(dict):
             f"Pushing to database {database}, column {column}, payload {payload}"
         )
         try:
-            cursor.execute(
-                f"UPDATE {database} set {column} = %s WHERE room_id = %s",
-                (payload, self.room_id),
-            )
+            with metrics.db_seconds.time(operation="push"):
+                cursor.execute(
+                    f"UPDATE {database} set {column} = %s WHERE room_id = %s",
+                    (payload, self.room_id),
+                )
         except Exception as e:
             logger.error(f"Error pushing to database: {e}")
 
     def pulldb(self, cursor, database: str, column: str):
         """Pull a value from the database for this game."""
         try:
-            cursor.execute(
-                f"SELECT {column} FROM {database} WHERE room_id = %s", (self.room_id,)
-            )
-            return cursor.fetchone()[0]
+            with metrics.db_seconds.time(operation="pull"):
+                cursor.execute(
+                    f"SELECT {column} FROM {database} WHERE room_id = %s", (self.room_id,)
+                )
+                return cursor.fetchone()[0]
         except Exception as e:
             logger.error(f"Error pulling from database: {e}")
             return None
@@ -660,18 +789,18 @@ class Game(dict):
 
         logger.info("Refreshing item classifications.")
 
+        # Classifications changed in the database, so load them again
+        games = [game] if game else {player.game for player in self.players.values()}
+        if sqlcon:
+            with sqlcon.cursor() as cursor:
+                item_metadata.preload(cursor, games)
+        for refreshed in games:
+            classification_cache.pop(refreshed, None)
+
         processed = 0
         updated = 0
 
-        for item in self.item_instance_cache.values():
-            # Filter by game if requested
-            if game is not None and item.game != game:
-                continue
-
-            # Filter by item name if requested (requires game to be meaningful)
-            if item_name is not None and item.name != item_name:
-                continue
-
+        for item in self.item_instance_cache.find(game=game, name=item_name):
             processed += 1
 
             try:
@@ -679,10 +808,11 @@ class Game(dict):
                 # set_item_classification returns the (possibly new) classification
                 new_class = item.set_item_classification(item.receiver)
                 # update the instance's stored classification
-                item.classification = new_class
+                self.item_instance_cache.reclassify(item, new_class)
 
                 if old_class != new_class:
                     updated += 1
+                    item.touch()
             except Exception as e:
                 logger.exception(
                     f"Error refreshing classification for {item.game}: {item.name}: {e}"
@@ -693,42 +823,78 @@ class Game(dict):
         )
         return (processed, updated)
 
+    def classifications_changed(self, game: str | None, items: list[str] | None = None) -> int:
+        """Apply a classification change announced by the bot (see item_metadata.notify_classified).
 
-def handle_hint_update(self):
-    pass
+        Only the named items are reloaded and reclassified, found through the
+        item index. Without `items` the whole game is refreshed, and without
+        `game` every game in the room is. Returns how many item instances
+        changed classification."""
+        if game is None:
+            return self.refresh_classifications()[1]
+        if game not in {player.game for player in self.players.values()}:
+            return 0
+        if items is None:
+            return self.refresh_classifications(game=game)[1]
 
+        if sqlcon:
+            with sqlcon.cursor() as cursor:
+                item_metadata.reload(cursor, game, items)
 
-class Player(dict):
-    name: str = None
-    game: str = None
-    id: int = None
+        updated = 0
+        for name in items:
+            classification_cache.get(game, {}).pop(name, None)
+            for item in self.item_instance_cache.find(game=game, name=name):
+                new_class = item.set_item_classification(item.receiver)
+                if new_class != item.classification:
+                    self.item_instance_cache.reclassify(item, new_class)
+                    item.touch()
+                    updated += 1
+        logger.info(f"Reclassified {updated} item(s) after {len(items)} {game} item(s) changed.")
+        return updated
 
-    alias: str = None
-    team: int = 0
 
-    inventory: list = []  # What items the player has collected
+def handle_hint_update(self):
+    pass
 
-    hints: dict = {}
-    spoilers: dict = {
-        "items": [],  # Items associated with this player
-        "locations": {},  # Locations associated with this player
-    }
-    spheres: dict = {} # Playthrough spheres, keyed by sphere number with list of locations in that sphere as value
-    current_sphere: int = 1
-    online: bool = False
-    last_online: datetime.datetime | None = None
-    tags = []
-    settings: dict = {}
-    slot_data: dict = {}
-    upload_data: dict = {}
+
+class Player:
+    __slots__ = (
+        "_super", "name", "game", "id", "alias", "team", "inventory", "hints",
+        "spoilers", "spheres", "current_sphere", "online", "last_online", "tags",
+        "settings", "slot_data", "upload_data", "stats", "goaled", "released",
+        "collected", "milestones", "collected_locations", "total_locations",
+        "collection_percentage", "finished_percentage",
+    )
+
+    name: str
+    game: str
+    id: int
+
+    alias: str
+    team: int
+
+    inventory: Inventory  # What items the player has collected
+
+    hints: dict[str, HintIndex]  # "sending" and "receiving" hints
+    spoilers: dict  # Items for this player, and the items in this player's locations
+    spheres: SphereIndex  # Playthrough spheres, keyed by sphere number with list of locations in that sphere as value
+    current_sphere: int
+    online: bool
+    last_online: float | None  # Epoch seconds
+    tags: list
+    settings: "PlayerSettings"
+    slot_data: dict
+    upload_data: dict
     stats: "PlayerState"  # Game-specific stats
-    goaled: bool = False  # Finished their game
-    released: bool = False  # Released their items
-    collected: bool = False  # Collected their items
-    collected_locations: int = 0
-    total_locations: int = 0
-    collection_percentage: float = 0.0
-    finished_percentage: float = 0.0
+    goaled: bool  # Finished their game
+    released: bool  # Released their items
+    collected: bool  # Collected their items
+    milestones: set
+    collected_locations: int
+    total_locations: int
+    collection_percentage: float
+    finished_percentage: float
 
     class PlayerState(dict):
         """A class to hold the player's state in the game.
@@ -759,32 +925,52 @@ class Player(dict):
                 self.stats[stat_name] = value
 
     def __init__(self, name: str, game: str, id: int, game_instance: Game):
-        super().__init__()
         self._super = game_instance
 
-        self.name = name
-        self.game = game
+        self.name = intern_name(name)
+        self.game = intern_name(game)
         self.id = id
-        self.inventory = []
-        self.hints = {"sending": [], "receiving": []}
+        self.alias = None
+        self.team = 0
+        self.inventory = Inventory()
+        self.hints = {"sending": HintIndex(), "receiving": HintIndex()}
+        self.spoilers = {
+            "items": [],  # Items associated with this player
+            "locations": {},  # Locations associated with this player
+        }
+        self.spheres = SphereIndex()
+        self.current_sphere = 1
+        self.online = False
+        self.last_online = None
+        self.tags = []
         self.settings = PlayerSettings()
+        self.slot_data = {}
+        self.upload_data = {}
+        self.stats = Player.PlayerState()
         self.goaled = False
         self.released = False
         self.collected = False
         self.milestones = set()
-        self.stats = Player.PlayerState()
+        self.collected_locations = 0
+        self.total_locations = 0
+        self.collection_percentage = 0.0
+        self.finished_percentage = 0.0
 
     def __str__(self):
         return self.name
 
+    def touch(self):
+        """Note that this player's state changed, so the next webview snapshot picks it up."""
+        self._super.changed_players.add(self.name)
+
     def to_dict(self):
-        logger.info(f"Serializing player {self.name} to dictionary.")
+        logger.debug(f"Serializing player {self.name} to dictionary.")
         return {
             "name": self.name,
             "game": self.game,
             "id": self.id,
             "inventory": [i.to_dict() for i in self.inventory],
-            "hints": {k: [i.to_dict() for i in v] for k, v in self.hints.items()},
+            "hints": {k: [i.to_dict() for i in v.values()] for k, v in self.hints.items()},
             "spoilers": {
                 "items": [i.to_dict() for i in self.spoilers["items"]],
                 "locations": {
@@ -794,10 +980,11 @@ class Player(dict):
             "spheres": {str(k): [l.to_dict() for l in v] for k, v in self.spheres.items()},
             "current_sphere": self.current_sphere,
             "online": self.online,
-            "last_online": self.last_online.timestamp() if self.last_online else None,
-            "tags": self.tags,
+            "last_online": self.last_online,
+            "tags": list(self.tags),
             "stats": self.stats.to_dict(),
-            "settings": dict(self.settings) if self.settings else {},
+            # Settings hold lists the log keeps appending to, so snapshots get their own copy
+            "settings": copy.deepcopy(self.settings) if self.settings else {},
             "slot_data": self.slot_data,
             "upload_data": self.upload_data,
             "goaled": self.goaled,
@@ -818,9 +1005,10 @@ class Player(dict):
     def has_uploaded_data(self) -> bool:
         return len(self.upload_data) > 0
 
-    def set_online(self, online: bool, timestamp: datetime.datetime):
+    def set_online(self, online: bool, timestamp: datetime.datetime | float):
         self.online = online
-        self.last_online = timestamp
+        self.last_online = epoch_seconds(timestamp)
+        self.touch()
 
     def last_seen(self):
         if self.online is True:
@@ -828,25 +1016,15 @@ class Player(dict):
         else:
             return self.last_online
 
-    def update_locations(self, game: Game):
-        locations = game.spoiler_log.get(self.name, {})
-
-        location_count = self.total_locations
-        checkable_location_count = len(
-            [l for l in locations.values() if l.location.is_checkable is True]
-        )
-
-        # if all(c > 0 for c in [checkable_location_count, location_count]) and (checkable_location_count / location_count) < 0.95:
-        #     # If the amount of checkable locations does not pass a certain threshold,
-        #     # The world has likely not been fully played through to determine checkability
-        #     # In this case just use the unfiltered total location count
-        #     self.total_locations = location_count
-        # else:
-        #     self.total_locations = checkable_location_count
+    def location_checked(self):
+        """Count one more of this player's locations as checked, for the player and the game."""
+        self.collected_locations += 1
+        self._super.collected_locations += 1
 
-        self.collected_locations = len(
-            [l for l in locations.values() if l.location.is_checked is True]
-        )
+    def update_locations(self, game: Game):
+        """Refresh the completion percentage and milestones.
+        collected_locations is counted as locations are checked, and total_locations comes from the tracker."""
+        self.touch()
         self.collection_percentage = (
             (self.collected_locations / self.total_locations) * 100
             if self.total_locations > 0
@@ -857,30 +1035,16 @@ class Player(dict):
         self.check_sphere_completion()
 
     def check_sphere_completion(self):
-        if self.current_sphere in self.spheres and all(
-            l.is_checked for l in self.spheres[self.current_sphere]
-        ):
+        while self.spheres.is_complete(self.current_sphere):
             message = f"**{self.name} has completed their Sphere {self.current_sphere}!**"
-            event_emitter.emit("sphere_completion", message)  # Emit the sphere completion message
-            self.current_sphere += 1
-            if self.current_sphere in self.spheres:
-                try:
-                    while len(self.spheres[self.current_sphere]) == 0:
-                            self.current_sphere += 1
-                except KeyError:
-                    pass
+            self._super.events.emit("sphere_completion", message)  # Emit the sphere completion message
+            self.current_sphere = self.spheres.next_sphere(self.current_sphere)
 
     def collapse_spheres(self):
         """Collapse the player's spheres so that there are no gaps in sphere numbering.
         If a sphere has no locations in it, it will be removed and the higher spheres will be shifted down."""
         old_count = len(self.spheres)
-        new_spheres = {}
-        new_sphere_number = 0
-        for old_sphere_number in sorted(self.spheres.keys()):
-            if len(self.spheres[old_sphere_number]) > 0:
-                new_spheres[new_sphere_number] = self.spheres[old_sphere_number]
-                new_sphere_number += 1
-        self.spheres = new_spheres
+        self.spheres = self.spheres.collapsed()
         new_count = len(self.spheres)
         if old_count != new_count:
             logger.info(f"Collapsed spheres for player {self.name}: {old_count} -> {new_count}")
@@ -896,13 +1060,14 @@ class Player(dict):
             ):
                 self.milestones.add(milestone)
                 message = f"**{self.name} has reached {milestone}% completion!**"
-                event_emitter.emit("milestone", message)  # Emit the milestone message
+                self._super.events.emit("milestone", message)  # Emit the milestone message
 
-    def add_hint(self, hint_type: str, item):
+    def add_hint(self, hint_type: str, item, status: str = "unfound"):
         if hint_type not in self.hints:
-            self.hints[hint_type] = list()
-        self.hints[hint_type].append(item)
-        self.on_hints_updated()
+            self.hints[hint_type] = HintIndex()
+        if self.hints[hint_type].add(item, status):
+            self.touch()
+            self.on_hints_updated()
 
     def on_hints_updated(self):
         # This method will be called whenever hints are updated
@@ -926,27 +1091,26 @@ class Player(dict):
 
     def get_item_count(self, item_name: str) -> int:
         """Get the count of a specific item in the player's inventory."""
-        return sum(1 for item in self.inventory if item.name == item_name)
+        return self.inventory.count_of(item_name)
 
     def get_item_worldtotal(self, item_name: str) -> int:
         """Returns count of all items with this name for this player."""
-        totalcount = 0
-        for item_obj in self._super.item_instance_cache.values():
-            if item_obj.name == item_name and item_obj.receiver == self:
-                totalcount += 1
-        return totalcount
+        return len(
+            self._super.item_instance_cache.find(
+                receiver=self.name, game=self.game, name=item_name
+            )
+        )
 
     def has_item(self, item_name: str) -> bool:
         """Check if the player has at least one of the specified item in their inventory."""
-        return any(item.name == item_name for item in self.inventory)
+        return self.inventory.count_of(item_name) > 0
 
     def get_collected_items(self, items: Iterable[Any]) -> list:
         """For a list of items requested, return the items that are present in the inventory."""
         collected_items = []
 
-        for collected_item in self.inventory:
-            if collected_item.name in items:
-                collected_items.append(collected_item)
+        for item_name in dict.fromkeys(items):
+            collected_items.extend(self.inventory.named(item_name))
 
         return collected_items
 
@@ -971,31 +1135,36 @@ class Player(dict):
                 self.spoilers["locations"][location_name] = item
 
 
-class Location(dict):
+class Location:
     """A location in the multiworld.
     A Location is associated with a Player and can have an Item placed in it.
     The Location might also be associated with an Entrance (for entrance randomizers),
     or have certain requirements to access (currency or a specific item)."""
 
-    name: str = None
-    game: str = None
-    player: Player = None
+    # There's one of these for every item in the seed, so keep them compact
+    __slots__ = (
+        "name", "game", "player", "entrance", "item", "requirements",
+        "description", "is_checkable", "is_checked",
+    )
 
-    entrance: str = None
-    item: "Item" = None
-    requirements: list[str] = []
-    description: str = None
+    name: str
+    game: str
+    player: Player | str
 
-    is_checkable: bool = None
-    is_checked: bool = False
+    entrance: str
+    item: "Item"
+    requirements: list[str]
+    description: str
+
+    is_checkable: bool
+    is_checked: bool
 
     def __init__(
         self, item: "Item", player: Player, name: str, game: str, entrance: str = None
     ):
-        super().__init__()
         self.player = player
-        self.name = name
-        self.game = game
+        self.name = intern_name(name)
+        self.game = intern_name(game)
         self.entrance = entrance
         self.item = item
         self.requirements, self.description = handle_location_hinting(
@@ -1014,7 +1183,7 @@ class Location(dict):
             "player": str(self.player) if hasattr(self.player, "name") else self.player,
             "entrance": self.entrance,
             "item": str(self.item),  # Item is this location's parent, avoid recursion
-            "requirements": self.requirements,
+            "requirements": list(self.requirements),
             "description": self.description,
             "is_checkable": self.is_checkable,
             "is_checked": self.is_checked,
@@ -1027,15 +1196,12 @@ class Location(dict):
             #     "No database connection available, cannot fetch location ID."
             # )
             return None
-        with sqlcon.cursor() as cursor:
-            cursor.execute(
-                "SELECT location_id FROM archipelago.game_locations WHERE game = %s AND location = %s;",
-                (self.game, self.name),
-            )
-            response = cursor.fetchone()
-            return response[0] if response else None
+        _, location_id = location_table.lookup(sqlcon.cursor, self.game, self.name)
+        return location_id
 
-    def fetch_islocation_checkable(self) -> bool:
+    def fixed_checkability(self) -> bool | None:
+        """Whether this location is checkable, if we know without asking the database.
+        Returns None if the database decides."""
         if not isinstance(self.player, Player):
             return False  # Archipelago starting items, etc
         match self.game:
@@ -1049,19 +1215,18 @@ class Location(dict):
                 return True
             case _:
                 if sqlcon:
-                    with sqlcon.cursor() as cursor:
-                        cursor.execute(
-                            "SELECT is_checkable FROM archipelago.game_locations WHERE game = %s AND location = %s;",
-                            (self.game, self.name),
-                        )
-                        response = cursor.fetchone()
-                        # logger.info(f"locationsdb: {self.sender.game}: {self.location} is checkable: {response[0]}") # debugging in info, yes i know
-                        return response[0] if response else False
-                else:
-                    # logger.debug(
-                    #     "No database connection available, defaulting to checkable for all locations."
-                    # )
-                    return True
+                    return None
+                # logger.debug(
+                #     "No database connection available, defaulting to checkable for all locations."
+                # )
+                return True
+
+    def fetch_islocation_checkable(self) -> bool:
+        fixed = self.fixed_checkability()
+        if fixed is not None:
+            return fixed
+        is_checkable, _ = location_table.lookup(sqlcon.cursor, self.game, self.name)
+        return bool(is_checkable)
 
     def db_add_location(self, is_check: bool = False):
         """Add this item's location to the database if it doesn't already exist.
@@ -1077,57 +1242,130 @@ class Location(dict):
             #     "No database connection available, skipping database update for location."
             # )
             return
+        # The table tells us what's already in the database, so we only go to it to write
+        is_checkable, _ = location_table.lookup(sqlcon.cursor, self.game, self.name)
+        known = location_table.has(self.game, self.name)
+        if known and not (is_checkable != is_check and is_check == True):
+            self.is_checkable = self.fetch_islocation_checkable()
+            return
+
         cursor = sqlcon.cursor()
 
-        cursor.execute(
-            "CREATE TABLE IF NOT EXISTS archipelago.game_locations (game bpchar, location bpchar, is_checkable boolean)"
+        with metrics.db_seconds.time(operation="add_location"):
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS archipelago.game_locations (game bpchar, location bpchar, is_checkable boolean)"
+            )
+
+            try:
+                if known:
+                    logger.debug(
+                        f"Request to update checkable status for {self.game}: {self.name} (to: {str(is_check)})"
+                    )
+                    cursor.execute(
+                        "UPDATE archipelago.game_locations set is_checkable = %s WHERE game = %s AND location = %s;",
+                        (str(is_check), self.game, self.name),
+                    )
+                else:
+                    logger.info(f"locationsdb: adding {self.game}: {self.name} to the db")
+                    cursor.execute(
+                        "INSERT INTO archipelago.game_locations VALUES (%s, %s, %s)",
+                        (self.game, self.name, str(is_check)),
+                    )
+                location_table.set(self.game, self.name, is_checkable=is_check)
+            finally:
+                sqlcon.commit()
+        logger.debug(
+            f"locationsdb: classified {self.game}: {self.name} as checkable: {is_checkable}"
         )
+        self.is_checkable = self.fetch_islocation_checkable()
 
-        is_checkable: bool = None
 
-        try:
+def db_add_locations(locations: Iterable[Location], is_check: bool = False):
+    """Batched `Location.db_add_location`, for registering a whole spoiler's worth of locations.
+
+    The locations are copied into a temporary table and merged into
+    archipelago.game_locations in one transaction, instead of several round
+    trips per location. Each location's `is_checkable` is then refreshed from
+    a single lookup."""
+    locations = list(locations)
+    if not sqlcon or not locations:
+        return
+
+    rows = {(location.game, location.name) for location in locations}
+    try:
+        with sqlcon.cursor() as cursor, metrics.db_seconds.time(operation="add_locations"):
             cursor.execute(
-                "SELECT game, location, is_checkable FROM archipelago.game_locations WHERE game = %s AND location = %s;",
-                (self.game, self.name),
+                "CREATE TABLE IF NOT EXISTS archipelago.game_locations (game bpchar, location bpchar, is_checkable boolean)"
             )
-            game, location, is_checkable = cursor.fetchone()
-            if is_checkable != is_check and is_check == True:
-                logger.debug(
-                    f"Request to update checkable status for {self.game}: {self.name} (to: {str(is_check)})"
-                )
+            cursor.execute(
+                "CREATE TEMP TABLE spoiler_locations (game bpchar, location bpchar) ON COMMIT DROP"
+            )
+            execute_values(
+                cursor, "INSERT INTO spoiler_locations (game, location) VALUES %s", list(rows)
+            )
+            if is_check:
                 cursor.execute(
-                    "UPDATE archipelago.game_locations set is_checkable = %s WHERE game = %s AND location = %s;",
-                    (str(is_check), game, location),
+                    """UPDATE archipelago.game_locations g SET is_checkable = true
+                    FROM spoiler_locations s
+                    WHERE g.game = s.game AND g.location = s.location AND g.is_checkable IS DISTINCT FROM true"""
                 )
-        except TypeError:
-            logger.debug("Nothing found for this location, likely")
-            logger.info(f"locationsdb: adding {self.game}: {self.name} to the db")
             cursor.execute(
-                "INSERT INTO archipelago.game_locations VALUES (%s, %s, %s)",
-                (self.game, self.name, str(is_check)),
+                """INSERT INTO archipelago.game_locations (game, location, is_checkable)
+                SELECT DISTINCT s.game, s.location, %s FROM spoiler_locations s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM archipelago.game_locations g
+                    WHERE g.game = s.game AND g.location = s.location
+                )""",
+                (is_check,),
             )
-        finally:
-            sqlcon.commit()
-        logger.debug(
-            f"locationsdb: classified {self.game}: {self.name} as checkable: {is_checkable}"
-        )
-        self.is_checkable = self.fetch_islocation_checkable()
+            added = cursor.rowcount
+            cursor.execute(
+                """SELECT DISTINCT g.game, g.location, g.is_checkable
+                FROM archipelago.game_locations g
+                JOIN spoiler_locations s ON g.game = s.game AND g.location = s.location"""
+            )
+            checkable = {
+                ((game or "").rstrip(), (location or "").rstrip()): value
+                for game, location, value in cursor.fetchall()
+            }
+        sqlcon.commit()
+    except psql.Error as e:
+        logger.error(f"Error registering locations in the database: {e}")
+        sqlcon.rollback()
+        return
+
+    logger.info(f"locationsdb: registered {len(rows)} locations ({added} new)")
+    for (game, name), value in checkable.items():
+        location_table.set(game, name, is_checkable=value)
+    for location in locations:
+        fixed = location.fixed_checkability()
+        if fixed is not None:
+            location.is_checkable = fixed
+        else:
+            # bpchar ignores trailing spaces, so compare without them
+            key = ((location.game or "").rstrip(), (location.name or "").rstrip())
+            location.is_checkable = checkable.get(key, False)
 
 
-class Item(dict):
+class Item:
     """An Archipelago item in the multiworld"""
 
-    receiver = None
-    name = None
-    game = None
-    id: int = None
-    location: Location = None
-    classification = None
-    count = 1
-    found = False
-    hinted = False
-    spoiled = False
-    received_timestamp: datetime.datetime = None
+    __slots__ = (
+        "receiver", "name", "game", "id", "location", "classification", "count",
+        "found", "hinted", "spoiled", "received_timestamp",
+    )
+
+    receiver: Player
+    name: str
+    game: str
+    id: int
+    location: Location
+    classification: str
+    count: int
+    found: bool
+    hinted: bool
+    spoiled: bool
+    received_timestamp: float  # Epoch seconds
 
     def __init__(
         self,
@@ -1138,9 +1376,8 @@ class Item(dict):
         entrance: str = None,
         received_timestamp: float = None,
     ):
-        super().__init__()
         self.receiver = receiver
-        self.name = item
+        self.name = intern_name(item)
         self.game = receiver.game
         self.id = self.fetch_id()
         self.location = Location(
@@ -1151,22 +1388,17 @@ class Item(dict):
             entrance,
         )
         self.classification = self.set_item_classification(self)
-        self.count: int = 1
+        self.count = 1
         self.found = False
         self.hinted = False
         self.spoiled = False
-        self.received_timestamp = received_timestamp
+        self.received_timestamp = epoch_seconds(received_timestamp)
 
         if self.game is None:
             logger.warning(
                 f"Item object for {self.name} has no game associated with it?"
             )
 
-        if self.game not in item_table:
-            item_table[self.game] = {}
-        if self.name not in item_table[self.game]:
-            item_table[self.game][self.name] = self
-
     def __str__(self):
         return self.name
 
@@ -1183,9 +1415,7 @@ class Item(dict):
             "found": self.found,
             "hinted": self.hinted,
             "spoiled": self.spoiled,
-            "received_timestamp": self.received_timestamp.timestamp()
-            if self.received_timestamp
-            else None,
+            "received_timestamp": self.received_timestamp,
         }
     
     def to_hint_text(self) -> str:
@@ -1208,8 +1438,28 @@ class Item(dict):
     def collect(self):
         """Mark this item as collected and add it to the receiver's inventory."""
         self.found = True
+        newly_checked = not self.location.is_checked
         self.location.is_checked = True
         self.receiver.inventory.append(self)
+        self.receiver.touch()
+
+        # Keep the location and sphere counters up to date, so completion checks don't rescan
+        owner = self.location.player
+        if isinstance(owner, Player):
+            if newly_checked:
+                owner.location_checked()
+            owner.touch()
+            owner.spheres.mark_checked(self.location)
+            sphere = owner._super.spheres.mark_checked(self.location)
+            if sphere is not None:
+                owner._super.changed_spheres.add(sphere)
+
+    def touch(self):
+        """Note that the players showing this item changed: its receiver, and the owner of its location."""
+        self.receiver.touch()
+        owner = self.location.player
+        if isinstance(owner, Player):
+            owner.touch()
 
     def hint(self):
         self.hinted = True
@@ -1224,18 +1474,8 @@ class Item(dict):
             #     "No database connection available, cannot fetch item ID."
             # )
             return None
-        cursor = sqlcon.cursor()
-
-        try:
-            cursor.execute(
-                "SELECT item_id FROM archipelago.item_classifications WHERE game = %s AND item = %s;",
-                (self.game, self.name),
-            )
-            response = cursor.fetchone()
-            return response[0] if response else None
-        except TypeError:
-            logger.debug("Nothing found for this item, likely")
-            return None
+        row = item_metadata.lookup(sqlcon.cursor, self.game, self.name)
+        return row.item_id if row else None
 
     def set_item_classification(self, player: Player = None):
         """Refer to the itemdb and see whether the provided Item has a classification.
@@ -1260,6 +1500,7 @@ class Item(dict):
         if self.game is None:
             return None
 
+        max_age = None  # How stale the game's item_classifications rows can be
         if (
             self.game in classification_cache
             and self.name in classification_cache[self.game]
@@ -1271,6 +1512,8 @@ class Item(dict):
                 if classification_cache[self.game][self.name][0] is None:
                     logger.warning(f"Invalidating cache for {self.game}: {self.name}")
                     del classification_cache[self.game][self.name]
+                    # It might have been classified since, so don't trust rows older than the cache
+                    max_age = cache_timeout
             else:
                 classification = classification_cache[self.game][self.name][0]
                 if classification != "conditional progression":
@@ -1293,62 +1536,17 @@ class Item(dict):
                     response = None
                     return
                 else:
-                    cursor = sqlcon.cursor()
-
-                    response = None
-
-                    cursor.execute(
-                        "CREATE TABLE IF NOT EXISTS archipelago.item_classifications (game bpchar, item bpchar, classification varchar(32), datapackage_checksum varchar(64))"
+                    row = item_metadata.lookup(
+                        sqlcon.cursor, self.game, self.name, max_age=max_age
                     )
-                    # Add column if it doesn't exist
-                    try:
-                        cursor.execute(
-                            "ALTER TABLE archipelago.item_classifications ADD COLUMN IF NOT EXISTS datapackage_checksum varchar(64)"
-                        )
-                    except psql.Error:
-                        pass  # Column might already exist
-                    finally:
-                        sqlcon.commit()
-
-                    try:
-                        cursor.execute(
-                            "SELECT classification, datapackage_checksum FROM archipelago.item_classifications WHERE game = %s AND item = %s;",
-                            (self.game, self.name),
-                        )
-                        result = cursor.fetchone()
-                        if result and result[1]:  # Only use if datapackage_checksum exists
-                            response = result[0]
-                        else:
-                            response = None
-                    except TypeError:
+                    # Only use the classification if the item came from a datapackage
+                    if row and row.datapackage_checksum:
+                        response = row.classification
+                    else:
                         response = None
-                    if response is None:
                         logger.debug(
                             "Nothing found for this item, or no datapackage_checksum"
                         )
-                        # Only add to db if we have a datapackage_checksum for this game/item
-                        cursor.execute(
-                            "SELECT datapackage_checksum FROM archipelago.item_classifications WHERE game = %s AND item = %s;",
-                            (self.game, self.name),
-                        )
-                        checksum_result = cursor.fetchone()
-                        if (
-                            checksum_result
-                            and checksum_result[0]
-                            and (bool(response) and response != checksum_result[0])
-                        ):
-                            logger.info(
-                                f"itemsdb: adding {self.game}: {self.name} to the db"
-                            )
-                            cursor.execute(
-                                "INSERT INTO archipelago.item_classifications VALUES (%s, %s, %s, %s) ON CONFLICT (game, item) DO UPDATE SET classification = COALESCE(EXCLUDED.classification, archipelago.item_classifications.classification), datapackage_checksum = COALESCE(EXCLUDED.datapackage_checksum, archipelago.item_classifications.datapackage_checksum);",
-                                (self.game, self.name, None, None),
-                            )
-                        else:
-                            logger.debug(
-                                f"itemsdb: skipping {self.game}: {self.name} as it has no datapackage_checksum"
-                            )
-                        sqlcon.commit()
 
         logger.debug(f"itemsdb: classified {self.game}: {self.name} as {response}")
         if self.game not in classification_cache:
@@ -1383,42 +1581,36 @@ class Item(dict):
         )
         cursor = sqlcon.cursor()
 
-        cursor.execute(
-            "CREATE TABLE IF NOT EXISTS archipelago.item_classifications (game bpchar, item bpchar, classification varchar(32), datapackage_checksum varchar(64))"
-        )
-        # Add column if it doesn't exist
-        try:
-            cursor.execute(
-                "ALTER TABLE archipelago.item_classifications ADD COLUMN IF NOT EXISTS datapackage_checksum varchar(64)"
-            )
-        except psql.Error:
-            pass  # Column might already exist
-        finally:
-            sqlcon.commit()
-
         # Check if item has datapackage_checksum before allowing update
         try:
-            cursor.execute(
-                "SELECT datapackage_checksum FROM archipelago.item_classifications WHERE game = %s AND item = %s;",
-                (self.game, self.name),
-            )
-            checksum_result = cursor.fetchone()
-            if not checksum_result or not checksum_result[0]:
-                logger.error(
-                    f"Cannot update classification for {self.game}: {self.name} - no datapackage_checksum"
+            with metrics.db_seconds.time(operation="classify"):
+                cursor.execute(
+                    "SELECT datapackage_checksum FROM archipelago.item_classifications WHERE game = %s AND item = %s;",
+                    (self.game, self.name),
                 )
-                return False
+                checksum_result = cursor.fetchone()
+                if not checksum_result or not checksum_result[0]:
+                    logger.error(
+                        f"Cannot update classification for {self.game}: {self.name} - no datapackage_checksum"
+                    )
+                    return False
 
-            cursor.execute(
-                "UPDATE archipelago.item_classifications set classification = %s where game = %s and item = %s;",
-                (classification, self.game, self.name),
+                cursor.execute(
+                    "UPDATE archipelago.item_classifications set classification = %s where game = %s and item = %s;",
+                    (classification, self.game, self.name),
+                )
+            item_metadata.set(
+                self.game, self.name,
+                classification=classification, datapackage_checksum=checksum_result[0],
             )
+            classification_cache.get(self.game, {}).pop(self.name, None)
         except psql.errors.InFailedSqlTransaction as sqlerr:
             logger.error(
                 f"Couldn't update {classification}, SQL transaction failed along the way"
             )
         finally:
-            sqlcon.commit()
+            with metrics.db_seconds.time(operation="commit"):
+                sqlcon.commit()
             self.set_item_classification(self.receiver)
         return True
 
@@ -1440,8 +1632,6 @@ class PlayerSettings(dict):
 
 def handle_item_tracking(game: Game, player: Player, item: Item):
     """If an item is an important collectable of some kind, we should put some extra info in the item name for the logs."""
-    global item_table
-
     ItemObject = item
     item = item.name
 
@@ -1833,7 +2023,7 @@ def handle_item_tracking(game: Game, player: Player, item: Item):
                         map_keys = sorted(
                             [
                                 i
-                                for i in item_table["gzDoom"].keys()
+                                for i in itemlog.item_instance_cache.names("gzDoom")
                                 if (
                                     i.endswith(f"({map})")
                                     and any([key in i for key in keys])
@@ -2717,7 +2907,7 @@ def handle_item_tracking(game: Game, player: Player, item: Item):
                             map_keys = sorted(
                                 [
                                     i
-                                    for i in item_table[game].keys()
+                                    for i in itemlog.item_instance_cache.names(game)
                                     if (
                                         i.endswith(f"({map})")
                                         and any([key in i for key in keys])
@@ -3619,6 +3809,52 @@ def handle_state_tracking(player: Player, game: Game):
         logger.error(f"Couldn't update state for player {player.name}: {err}")
 
 
+def fetch_datapackage(hostname: str, checksum: str) -> dict | None:
+    """Get the datapackage for a checksum, from the on-disk cache if we've fetched it before."""
+    path = DATAPACKAGE_CACHE / f"{checksum}.json"
+    if path.exists():
+        try:
+            with open(path, "r", encoding="UTF-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Couldn't read cached datapackage {checksum}, fetching it again: {e}")
+
+    datapackage_url = f"http://{hostname}/api/datapackage/{checksum}"
+    try:
+        response = http_client.get(datapackage_url, timeout=10)
+        response.raise_for_status()
+        datapackage = response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Failed to fetch datapackage from {datapackage_url}: {e}")
+        return None
+
+    try:
+        DATAPACKAGE_CACHE.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="UTF-8") as file:
+            json.dump(datapackage, file)
+        temp_path.replace(path)
+    except OSError as e:
+        logger.warning(f"Couldn't cache datapackage {checksum}: {e}")
+    return datapackage
+
+
+def datapackage_id_maps(hostname: str, checksum: str) -> dict | None:
+    """ID to name maps for a datapackage's items and locations, as
+    {"items": {id: name}, "locations": {id: name}}."""
+    if checksum not in datapackage_id_cache:
+        datapackage = fetch_datapackage(hostname, checksum)
+        if datapackage is None:
+            return None
+        datapackage_id_cache[checksum] = {
+            "items": {id: intern_name(name) for name, id in datapackage["item_name_to_id"].items()},
+            "locations": {
+                id: intern_name(name) for name, id in datapackage["location_name_to_id"].items()
+            },
+        }
+    return datapackage_id_cache[checksum]
+
+
 def import_datapackage_from_checksum(
     hostname: str, game: str, checksum: str
 ) -> list[str]:
@@ -3628,73 +3864,29 @@ def import_datapackage_from_checksum(
         logger.error("No database connection available for datapackage import.")
         return []
 
-    cursor = sqlcon.cursor()
-
-    # Check if this checksum is already imported
-    cursor.execute(
-        "SELECT COUNT(*) FROM archipelago.item_classifications WHERE datapackage_checksum = %s AND group_name IS NOT NULL AND item_id IS NOT NULL;",
-        (checksum,),
-    )
-    items_imported = cursor.fetchone()[0]
-    
-    cursor.execute(
-        "SELECT COUNT(*) FROM archipelago.game_locations WHERE datapackage_checksum = %s AND location_id IS NOT NULL;",
-        (checksum,),
-    )
-    locations_imported = cursor.fetchone()[0]
-
-    if items_imported > 0 and locations_imported > 0:
+    # Check before fetching, so an imported datapackage isn't downloaded again
+    with sqlcon.cursor() as cursor:
+        datapackage_import.ensure_schema(cursor)
+        already_imported = datapackage_import.imported(cursor, {game: checksum})
+    sqlcon.commit()
+    if already_imported:
         logger.info(f"Datapackage with checksum {checksum} already imported.")
         return []
 
-    # Fetch the datapackage
-    datapackage_url = f"http://{hostname}/api/datapackage/{checksum}"
-    try:
-        response = requests.get(datapackage_url, timeout=10)
-        response.raise_for_status()
-        datapackage = response.json()
-    except requests.RequestException as e:
-        logger.error(f"Failed to fetch datapackage from {datapackage_url}: {e}")
+    datapackage = fetch_datapackage(hostname, checksum)
+    if datapackage is None:
         return []
 
     logger.info(f"Importing datapackage for {game} with checksum {checksum}")
+    imported = datapackage_import.import_datapackage(
+        sqlcon, {game: {**datapackage, "checksum": checksum}}
+    )
 
-    for item in datapackage["item_name_groups"]["Everything"]:
-        cursor.execute(
-            "INSERT INTO archipelago.item_classifications (game, item, classification, datapackage_checksum) VALUES (%s, %s, %s, %s) ON CONFLICT (game, item) DO UPDATE SET classification = COALESCE(EXCLUDED.classification, archipelago.item_classifications.classification), datapackage_checksum = COALESCE(EXCLUDED.datapackage_checksum, archipelago.item_classifications.datapackage_checksum);",
-            (game, item, None, checksum),
-        )
-    for group in datapackage["item_name_groups"]:
-        if group == "Everything":
-            continue
-        classification = group
-        for item in datapackage["item_name_groups"][group]:
-            cursor.execute(
-                "UPDATE archipelago.item_classifications SET group_name = CASE " \
-                "WHEN group_name IS NULL THEN ARRAY[%s] ELSE group_name || ARRAY[%s] END, " \
-                "datapackage_checksum = %s WHERE game = %s AND item = %s;",
-                ([classification], [classification], checksum, game, item)
-            )
-    for item, id in datapackage["item_name_to_id"].items():
-        cursor.execute(
-            "UPDATE archipelago.item_classifications SET item_id = %s WHERE game = %s AND item = %s;",
-            (id, game, item)
-        )
-
-    for location in datapackage["location_name_groups"]["Everywhere"]:
-        cursor.execute(
-            "INSERT INTO archipelago.game_locations (game, location, is_checkable, datapackage_checksum) VALUES (%s, %s, %s, %s) ON CONFLICT (game, location) DO UPDATE SET is_checkable = EXCLUDED.is_checkable;",
-            (game, location, True, checksum),
-        )
-
-    for location, id in datapackage["location_name_to_id"].items():
-        cursor.execute(
-            "UPDATE archipelago.game_locations SET location_id = %s WHERE game = %s AND location = %s;",
-            (id, game, location)
+    # Every item and location of the game just changed, so load them again on the next lookup
+    location_table.forget(game)
+    item_metadata.forget(game)
+    if imported:
+        logger.info(
+            f"Successfully imported datapackage with checksum {checksum} for game: {game}"
         )
-
-    sqlcon.commit()
-    logger.info(
-        f"Successfully imported datapackage with checksum {checksum} for game: {game}"
-    )
-    return [game]
+    return imported
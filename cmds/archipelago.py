@@ -9,6 +9,7 @@ import sys
 import time
 import traceback
 import typing
+import urllib.parse
 import zipfile
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
@@ -28,7 +29,11 @@ from psycopg2.extras import Json as psql_json
 from tabulate import tabulate
 
 # from cmds.ap_scripts.archilogger import ItemLog
+from cmds import db as database
+from cmds.ap_scripts import datapackage_import, http_client
 from cmds.ap_scripts.emitter import event_emitter
+from cmds.ap_scripts.item_metadata import notify_classified
+from cmds.ap_scripts.supervisor import itemlog_env
 
 cfg = None
 MAX_MSG_LENGTH = 2000
@@ -38,16 +43,8 @@ logger = logging.getLogger("discord.ap")
 with open("config.yaml", "r", encoding="UTF-8") as file:
     cfg = yaml.safe_load(file)
 
-sqlcfg = cfg["bot"]["psql"]
 try:
-    sqlcon = psql.connect(
-        dbname=sqlcfg["database"],
-        user=sqlcfg["user"],
-        password=sqlcfg["password"] if "password" in sqlcfg else None,
-        host=sqlcfg["host"],
-        port=sqlcfg["port"],
-    )
-    sqlcon.set_session(autocommit=True)
+    sqlcon = database.connect(autocommit=True)
 except psql.OperationalError:
     # TODO Disable commands that need SQL connectivity
     sqlcon = False
@@ -287,7 +284,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
 
         api_url = f"https://{hostname}/api/room_status/{room_id}"
 
-        room = requests.get(api_url, timeout=5)
+        room = await asyncio.to_thread(http_client.get, api_url, timeout=5)
         room_json = room.json()
 
         players = [p[0] for p in room_json["players"]]
@@ -565,49 +562,12 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 f"Classified **{join_words(matched_items)}** in group **{group}** in **{game}** to **{classification.title()}**.",
             )
 
-             # Send immediate acknowledgement so user knows we're working on notifying itemlogs
-            ack_msg = await interaction.followup.send(
-                f"Classification updated for {game}'s group '{group}'. Contacting running itemlogs to refresh classifications...",
+            # Running itemlogs pick this up and reclassify just these items
+            notify_classified(cursor, game, matched_items)
+            await interaction.followup.send(
+                f"Classification for {game}'s group '{group}' was successful. Running itemlogs will pick it up shortly.",
                 ephemeral=True,
             )
-
-            # Notify running itemlogs to refresh this game's classifications (wildcard -> refresh whole game)
-            refreshed = 0
-            attempted = 0
-            try:
-                cursor.execute(
-                    "SELECT flask_port FROM pepper.ap_all_rooms WHERE active = 'true' AND flask_port IS NOT NULL;"
-                )
-                ports = [r[0] for r in cursor.fetchall()]
-            except Exception:
-                ports = []
-
-            for port in ports:
-                attempted += 1
-                try:
-                    resp = requests.get(
-                        f"http://localhost:{port}/refreshclassifications",
-                        params={"game": game},
-                        timeout=3,
-                    )
-                    if resp.status_code == 200:
-                        refreshed += 1
-                except requests.RequestException:
-                    logger.warning(
-                        f"Failed to contact itemlog at port {port} to refresh classifications for game {game}."
-                    )
-
-            final_reply = f"Classification for {game}'s group '{group}' was successful."
-            if attempted > 0:
-                final_reply += f" Notified {refreshed}/{attempted} running itemlog(s) to refresh classifications for the game '{game}'."
-            else:
-                final_reply += " No running itemlogs were found to notify."
-
-            try:
-                await ack_msg.edit(content=final_reply)
-            except Exception:
-                # If editing fails, send a followup instead
-                await interaction.followup.send(final_reply, ephemeral=True)
             return
 
         if "%" in item or "?" in item:
@@ -628,49 +588,12 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 f"Classified **{join_words(matched_items)}** in **{game}** to **{classification.title()}**.",
             )
 
-            # Send immediate acknowledgement so user knows we're working on notifying itemlogs
-            ack_msg = await interaction.followup.send(
-                f"Classification updated for {game} (matched {count} items). Contacting running itemlogs to refresh classifications...",
+            # Running itemlogs pick this up and reclassify just these items
+            notify_classified(cursor, game, matched_items)
+            await interaction.followup.send(
+                f"Classification for {game}'s {str(count)} items matching '{item}' was successful. Running itemlogs will pick it up shortly.",
                 ephemeral=True,
             )
-
-            # Notify running itemlogs to refresh this game's classifications (wildcard -> refresh whole game)
-            refreshed = 0
-            attempted = 0
-            try:
-                cursor.execute(
-                    "SELECT flask_port FROM pepper.ap_all_rooms WHERE active = 'true' AND flask_port IS NOT NULL;"
-                )
-                ports = [r[0] for r in cursor.fetchall()]
-            except Exception:
-                ports = []
-
-            for port in ports:
-                attempted += 1
-                try:
-                    resp = requests.get(
-                        f"http://localhost:{port}/refreshclassifications",
-                        params={"game": game},
-                        timeout=3,
-                    )
-                    if resp.status_code == 200:
-                        refreshed += 1
-                except requests.RequestException:
-                    logger.warning(
-                        f"Failed to contact itemlog at port {port} to refresh classifications for game {game}."
-                    )
-
-            final_reply = f"Classification for {game}'s {str(count)} items matching '{item}' was successful."
-            if attempted > 0:
-                final_reply += f" Notified {refreshed}/{attempted} running itemlog(s) to refresh classifications for the game '{game}'."
-            else:
-                final_reply += " No running itemlogs were found to notify."
-
-            try:
-                await ack_msg.edit(content=final_reply)
-            except Exception:
-                # If editing fails, send a followup instead
-                await interaction.followup.send(final_reply, ephemeral=True)
             return
         else:
             try:
@@ -681,37 +604,8 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 sqlcon.commit()
                 logger.info(f"Classified '{item}' in {game} to {classification}")
 
-                # Send immediate acknowledgement so user knows we're working on notifying itemlogs
-                ack_msg = await interaction.followup.send(
-                    f"Classification updated for {game}: '{item}'. Contacting running itemlogs to refresh classifications...",
-                    ephemeral=True,
-                )
-
-                # Notify running itemlog instances to refresh their in-memory classifications for this specific item
-                refreshed = 0
-                attempted = 0
-                try:
-                    cursor.execute(
-                        "SELECT flask_port FROM pepper.ap_all_rooms WHERE active = 'true' AND flask_port IS NOT NULL;"
-                    )
-                    ports = [r[0] for r in cursor.fetchall()]
-                except Exception:
-                    ports = []
-
-                for port in ports:
-                    attempted += 1
-                    try:
-                        resp = requests.get(
-                            f"http://localhost:{port}/refreshclassifications",
-                            params={"game": game, "item": item},
-                            timeout=3,
-                        )
-                        if resp.status_code == 200:
-                            refreshed += 1
-                    except requests.RequestException:
-                        logger.warning(
-                            f"Failed to contact itemlog at port {port} to refresh classifications for {game}:{item}."
-                        )
+                # Running itemlogs pick this up and reclassify just this item
+                notify_classified(cursor, game, [item])
 
                 await self.archivist_log(
                     interaction,
@@ -719,17 +613,10 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                     f"Classified **{item}** in **{game}** to **{classification.title()}**.",
                 )
 
-                # Inform the user of success and how many itemlogs were notified
-                final_reply = f"Classification for {game}'s '{item}' was successful."
-                if attempted > 0:
-                    final_reply += f" Notified {refreshed}/{attempted} running itemlog(s) to refresh classifications for '{game}:{item}'."
-                else:
-                    final_reply += " No running itemlogs were found to notify."
-
-                try:
-                    await ack_msg.edit(content=final_reply)
-                except Exception:
-                    await interaction.followup.send(final_reply, ephemeral=True)
+                await interaction.followup.send(
+                    f"Classification for {game}'s '{item}' was successful. Running itemlogs will pick it up shortly.",
+                    ephemeral=True,
+                )
                 return
             finally:
                 pass
@@ -847,124 +734,76 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
     ):
         """Import items and locations from an Archipelago datapackage into the database."""
 
-        with sqlcon.cursor() as cursor:
-            deferpost = await interaction.response.defer(
-                ephemeral=True,
-                thinking=True,
-            )
-            newpost = await interaction.original_response()
+        deferpost = await interaction.response.defer(
+            ephemeral=True,
+            thinking=True,
+        )
+        newpost = await interaction.original_response()
 
-            if export_json:
-                try:  # Make sure it's actually json
-                    if export_json.content_type != "application/json; charset=utf-8":
-                        logger.error(
-                            f"Import datapackage: provided file has invalid content type {export_json.content_type}"
-                        )
-                        return await newpost.edit(
-                            content="**Error**: the provided file is not valid JSON.",
-                            delete_after=15.0,
-                        )
-                    data = await export_json.read()
-                    datapackage = json.loads(data)
-                except Exception as e:
+        if export_json:
+            try:  # Make sure it's actually json
+                if export_json.content_type != "application/json; charset=utf-8":
+                    logger.error(
+                        f"Import datapackage: provided file has invalid content type {export_json.content_type}"
+                    )
                     return await newpost.edit(
-                        content=f"**Error**: {e}", delete_after=15.0
+                        content="**Error**: the provided file is not valid JSON.",
+                        delete_after=15.0,
                     )
-            else:
-                data = requests.get(url, timeout=5)
-                datapackage = data.json()
-
-            games = list(datapackage["games"].keys())
-            if "Archipelago" in games:
-                del datapackage["games"]["Archipelago"]  # Skip the Archipelago data
-                games.remove("Archipelago")
-
-            msg = f"The datapackage provided has data for:\n\n{', '.join(games)}\n\nImport in progress..."
-            if len(msg) > 2000:
-                msg = f"The datapackage provided has data for {len(games)} games. Import in progress..."
-            await newpost.edit(content=msg)
-
-            for game, data in datapackage["games"].items():
-                games_list = list(datapackage["games"].keys())
-                if "Archipelago" in games_list:
-                    games_list.remove("Archipelago")
-                current_index = games_list.index(game)
-                next_game = (
-                    games_list[current_index + 1]
-                    if current_index + 1 < len(games_list)
-                    else None
+                data = await export_json.read()
+                datapackage = json.loads(data)
+            except Exception as e:
+                return await newpost.edit(
+                    content=f"**Error**: {e}", delete_after=15.0
                 )
+        else:
+            datapackage = None  # Fetched from the url along with the import
 
-                # Retrieve community progression data if it exists
-                comm_classification_table = {}
-                classification = None
-                checksum = data.get("checksum", None)
+        # The fetch and the import run off the event loop, and report back here as they go
+        loop = asyncio.get_running_loop()
+        last_update = 0.0
+        last_edit = None  # So the final message can't be overwritten by a late progress update
 
-                if game == "Archipelago":
-                    continue
+        def edit(content: str):
+            return asyncio.run_coroutine_threadsafe(newpost.edit(content=content), loop)
 
-                # Check if this checksum already exists in the database
-                cursor.execute(
-                    "SELECT 1 FROM archipelago.item_classifications WHERE game = %s AND datapackage_checksum = %s AND group_name IS NOT NULL AND item_id IS NOT NULL LIMIT 1;",
-                    (game, checksum),
-                )
-                if cursor.fetchone():
-                    logger.info(
-                        f"Datapackage for {game} with checksum {checksum} is already imported; skipping."
-                    )
-                    if next_game:
-                        await newpost.edit(
-                            content=f"Skipped {game} (already imported), working on {next_game}..."
-                        )
-                    else:
-                        pass
-                    continue
+        def progress(game: str, index: int, total: int, status: str):
+            nonlocal last_update, last_edit
+            if index < total and time.monotonic() - last_update < 2:
+                return
+            last_update = time.monotonic()
+            last_edit = edit(f"{status.title()} {game} ({index}/{total})...")
 
-                for item in data["item_name_groups"]["Everything"]:
-                        cursor.execute(
-                            "INSERT INTO archipelago.item_classifications (game, item, classification, datapackage_checksum) VALUES (%s, %s, %s, %s) ON CONFLICT (game, item) DO UPDATE SET classification = COALESCE(EXCLUDED.classification, archipelago.item_classifications.classification), datapackage_checksum = COALESCE(EXCLUDED.datapackage_checksum, archipelago.item_classifications.datapackage_checksum);",
-                            (game, item, None, checksum),
-                        )
-                for group in data["item_name_groups"]:
-                    if group == "Everything":
-                        continue
-                    classification = group
-                    for item in data["item_name_groups"][group]:
-                        cursor.execute(
-                            "UPDATE archipelago.item_classifications SET group_name = CASE " \
-                            "WHEN group_name IS NULL THEN ARRAY[%s] ELSE group_name || ARRAY[%s] END, " \
-                            "datapackage_checksum = %s WHERE game = %s AND item = %s;",
-                            ([classification], [classification], checksum, game, item)
-                        )
-                for item, id in data["item_name_to_id"].items():
-                    cursor.execute(
-                        "UPDATE archipelago.item_classifications SET item_id = %s WHERE game = %s AND item = %s;",
-                        (id, game, item)
-                    )
+        def run_import(datapackage: dict | None) -> tuple[list[str], list[str]]:
+            if datapackage is None:
+                datapackage = http_client.get(url, timeout=5).json()
+            games = [game for game in datapackage["games"] if game != "Archipelago"]
 
-                for location in data["location_name_groups"]["Everywhere"]:
-                    cursor.execute(
-                        "INSERT INTO archipelago.game_locations (game, location, is_checkable, datapackage_checksum) VALUES (%s, %s, %s, %s) ON CONFLICT (game, location) DO UPDATE SET is_checkable = EXCLUDED.is_checkable;",
-                        (game, location, True, checksum),
-                    )
+            msg = f"The datapackage provided has data for:\n\n{', '.join(games)}\n\nImport in progress..."
+            if len(msg) > 2000:
+                msg = f"The datapackage provided has data for {len(games)} games. Import in progress..."
+            edit(msg).result()
 
-                for location, id in data["location_name_to_id"].items():
-                    cursor.execute(
-                        "UPDATE archipelago.game_locations SET location_id = %s WHERE game = %s AND location = %s;",
-                        (id, game, location)
-                    )
-                # Find the next game to import, if any
+            # Its own connection, rather than tying up the cog's shared handle for the whole import
+            con = database.Connection()
+            try:
+                imported = datapackage_import.import_datapackage(con, datapackage["games"], progress)
+            finally:
+                con.release()
+            return imported, games
 
-                if next_game:
-                    await newpost.edit(
-                        content=f"Imported {game}, working on {next_game}..."
-                    )
-                else:
-                    pass
+        imported, games = await asyncio.to_thread(run_import, datapackage)
+        if last_edit is not None:
+            try:
+                await asyncio.wrap_future(last_edit)
+            except discord.HTTPException:
+                pass
 
-            # archivist log?
+        # archivist log?
 
-        return await newpost.edit(content="Import *should* be complete!")
+        return await newpost.edit(
+            content=f"Import complete! Imported {len(imported)} of {len(games)} games (the rest were already up to date or failed, see the logs)."
+        )
 
     @is_aphost()
     @db.command()
@@ -1014,7 +853,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
 
         def fetch_classifications(game: str):
             nonlocal comm_classification_table
-            community_progression = requests.get(
+            community_progression = http_client.get(
                 f"https://raw.githubusercontent.com/silasary/world_data/refs/heads/main/worlds/{game}/progression.txt"
             )
             if community_progression.status_code == 200:
@@ -1039,9 +878,9 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 db_games = [row[0] for row in cursor.fetchall()]
 
             for game in db_games:
-                fetch_classifications(game)
+                await asyncio.to_thread(fetch_classifications, game)
         else:
-            fetch_classifications(game)
+            await asyncio.to_thread(fetch_classifications, game)
 
         # Update the item_classifications table with the community classifications
         skipped = 0
@@ -1054,6 +893,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
         filler: int = 0
         trap: int = 0
 
+        classified: dict[str, list[str]] = {}  # game -> items, for the running itemlogs
         with sqlcon.cursor() as cursor:
             for game, classifications in comm_classification_table.items():
                 for item, classification in classifications.items():
@@ -1080,6 +920,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                         )
                         if cursor.rowcount > 0:
                             updated += 1
+                            classified.setdefault(game, []).append(item)
                             # Update counts for archivist log
                             match classification:
                                 case "progression":
@@ -1100,6 +941,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                         )
                         if cursor.rowcount > 0:
                             updated += 1
+                            classified.setdefault(game, []).append(item)
                             # Update counts for archivist log
                             match classification:
                                 case "progression":
@@ -1116,6 +958,10 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                     logger.info(
                         f"Updated {game}: {item} to {classification} in item_classifications table."
                     )
+
+            # Running itemlogs pick this up and reclassify just these items
+            for game, items in classified.items():
+                notify_classified(cursor, game, items)
         await self.archivist_log(
             interaction,
             "classify_import",
@@ -1306,7 +1152,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
 
         logger.info(f"Fetching room data from {api_url}...")
         try:
-            room = requests.get(api_url, timeout=5)
+            room = await asyncio.to_thread(http_client.get, api_url, timeout=5)
         except requests.exceptions.Timeout:
             return await newpost.edit(
                 content="**Error**: the provided URL is not responding. Please check the URL and try again.",
@@ -1319,7 +1165,7 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 delete_after=15.0,
             )
 
-        api_data = requests.get(api_url, timeout=5).json()
+        api_data = (await asyncio.to_thread(http_client.get, api_url, timeout=5)).json()
         logger.info("Fetched room data from API...")
 
         room_port = api_data["last_port"]
@@ -1411,8 +1257,10 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 )
 
         try:
-            game_table = requests.get(
-                f"http://localhost:{api_port}/inspectgame", timeout=10
+            game_table = (
+                await asyncio.to_thread(
+                    http_client.get, f"http://localhost:{api_port}/inspectgame", timeout=10
+                )
             ).json()
         except ConnectionError:
             return await newpost.edit(
@@ -1581,8 +1429,10 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
             )
 
         try:
-            game_table = requests.get(
-                f"http://localhost:{api_port}/inspectgame", timeout=10
+            game_table = (
+                await asyncio.to_thread(
+                    http_client.get, f"http://localhost:{api_port}/inspectgame", timeout=10
+                )
             ).json()
         except (
             ConnectionError
@@ -1846,8 +1696,12 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 content="No Archipelago room is currently set for this server."
             )
 
-        room_slots = requests.get(
-            f"https://{room['host']}/api/room_status/{room['room_id']}", timeout=10
+        room_slots = (
+            await asyncio.to_thread(
+                http_client.get,
+                f"https://{room['host']}/api/room_status/{room['room_id']}",
+                timeout=10,
+            )
         ).json()["players"]
 
         linked_slots = []
@@ -1860,67 +1714,35 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
         if len(linked_slots) == 0:
             return await newpost.edit(content=self.messages["no_slots_linked"])
 
-        # Get the game table
-        try:
-            game_table = requests.get(
-                f"http://localhost:{api_port}/inspectgame", timeout=10
-            ).json()
-        except (
-            ConnectionError
-            | urllib3.exceptions.MaxRetryError
-            | requests.exceptions.ConnectionError
-        ):
-            return await newpost.edit(
-                content="Couldn't connect to the running Archipelago game. It might be restarting.\nTry again in a minute or two."
-            )
-
-        # Build the hint table
+        # Build the hint table from each linked slot's unfound hints
         hint_table = {}
         for slot in linked_slots:
-            if slot in game_table["players"]:
-                if (
-                    game_table["players"][slot]["goaled"]
-                    or game_table["players"][slot]["released"]
-                ):
-                    continue
-                hint_table[slot] = {}
-                for item in game_table["players"][slot]["hints"]["sending"]:
-                    if item["found"] is True:
-                        continue
-                    if item["classification"] in ["trap", "filler", "currency"]:
-                        continue
-                    if any(
-                        [
-                            game_table["players"][item["receiver"]]["released"],
-                            game_table["players"][item["receiver"]]["goaled"],
-                        ]
-                    ):
-                        continue
-                    hint_table[slot].update(
-                        {
-                            item["location"]["name"]: {
-                                "item": item["name"],
-                                "sender": item["location"]["player"],
-                                "receiver": item["receiver"],
-                                "classification": item["classification"],
-                                "entrance": item["location"]["entrance"],
-                                "costs": item["location"]["requirements"],
-                            }
-                        }
-                    )
-                for item in game_table["players"][slot]["hints"]["receiving"]:
-                    if item["found"] is True:
-                        continue
+            try:
+                response = await asyncio.to_thread(
+                    http_client.get,
+                    f"http://localhost:{api_port}/hints/{urllib.parse.quote(slot)}",
+                    timeout=10,
+                )
+            except (
+                ConnectionError,
+                urllib3.exceptions.MaxRetryError,
+                requests.exceptions.ConnectionError,
+            ):
+                return await newpost.edit(
+                    content="Couldn't connect to the running Archipelago game. It might be restarting.\nTry again in a minute or two."
+                )
+            if response.status_code == 404:
+                continue  # Not a slot in this room
+            slot_hints = response.json()
+            if slot_hints["goaled"] or slot_hints["released"]:
+                continue
+
+            hint_table[slot] = {}
+            for hint_type in "sending", "receiving":
+                for item in slot_hints[hint_type]:
                     if item["classification"] in ["trap", "filler", "currency"]:
                         continue
-                    if item["location"]["player"] in linked_slots:
-                        continue
-                    if any(
-                        [
-                            game_table["players"][item["receiver"]]["released"],
-                            game_table["players"][item["receiver"]]["goaled"],
-                        ]
-                    ):
+                    if hint_type == "receiving" and item["location"]["player"] in linked_slots:
                         continue
                     hint_table[slot].update(
                         {
@@ -1959,13 +1781,9 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
 
         hints_list = "## To Find:"
         for hint in hint_table_list:
+            # Hints for receivers who have goaled or released are already left out by /hints
             if hint["Sender"] not in linked_slots:
                 continue
-            if (
-                game_table["players"][hint["Receiver"]]["goaled"] is True
-                or game_table["players"][hint["Receiver"]]["released"] is True
-            ):
-                continue
 
             if hint["Sender"] == hint["Receiver"]:
                 hints_list += f"\n**Your {hint['Item']}** is on {hint['Location']}{f' at {hint['Entrance']}' if hint['Entrance'] else ''}."
@@ -2023,8 +1841,10 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
                 content="No Archipelago room is currently set for this server."
             )
 
-        game_table = requests.get(
-            f"http://localhost:{api_port}/inspectgame", timeout=10
+        game_table = (
+            await asyncio.to_thread(
+                http_client.get, f"http://localhost:{api_port}/inspectgame", timeout=10
+            )
         ).json()
 
         if not game_table:
@@ -2057,7 +1877,8 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
             match game_table["players"][slot]["game"]:
                 case "Trackmania":
                     upload_json = json.loads(upload_data)
-                    up_request = requests.post(
+                    up_request = await asyncio.to_thread(
+                        http_client.post,
                         f"http://localhost:{api_port}/upload_data/{slot}",
                         json=upload_json,
                         headers={"Content-Type": "application/json"},
@@ -2154,24 +1975,24 @@ class Archipelago(commands.GroupCog, group_name="archipelago"):
 
         # Run itemlogs if any are configured
         if len(cfg["bot"]["archipelago"]["itemlogs"]) > 0:
+            if cfg["bot"]["archipelago"].get("supervisor"):
+                # One supervisor process looks after every room
+                logger.info("Starting the itemlog supervisor.")
+                script_path = os.path.join(
+                    os.path.dirname(__file__), "..", "ap_supervisor.py"
+                )
+                try:
+                    process = subprocess.Popen([sys.executable, script_path])
+                    self.ctx.procs["archipelago"]["supervisor"] = process
+                except:
+                    logger.error("Error starting itemlog supervisor:", exc_info=True)
+                return
+
             logger.info("Starting saved itemlog processes.")
             for log in cfg["bot"]["archipelago"]["itemlogs"]:
                 logger.info(f"Starting itemlog for guild ID {log['guild']}")
                 # logger.info(f"Info: {json.dumps(log)}")
-                env = os.environ.copy()
-
-                env["LOG_URL"] = log["log_url"]
-                env["WEBHOOK_URL"] = (
-                    log["webhooks"][0] if len(log["webhooks"]) > 0 else None
-                )
-                env["SESSION_COOKIE"] = log["session_cookie"]
-                env["SPOILER_URL"] = log["spoiler_url"] if log["spoiler_url"] else None
-                env["MSGHOOK_URL"] = (
-                    log["msghooks"][0] if len(log["msghooks"]) > 0 else None
-                )
-                env["METAHOOK_URL"] = (
-                    log["meta_webhook"] if "meta_webhook" in log and log["meta_webhook"] is not None else None
-                )
+                env = itemlog_env(log)
 
                 try:
                     script_path = os.path.join(
@@ -0,0 +1,288 @@
+import itertools
+import logging
+import re
+import select
+import threading
+import time
+import weakref
+
+import psycopg2.pool
+import yaml
+
+logger = logging.getLogger("discord.db")
+
+# One connection pool per process, shared by the cogs and the itemlog.
+# A thread checks out a connection when it opens a cursor and hands it back
+# once its work is done: when the cursor is closed (or dropped) and nothing it
+# wrote is still waiting on a commit. Cursors are never shared between threads,
+# and threads that only query now and then (executor threads, request handlers)
+# don't each hold on to a connection while they sit idle.
+
+POOL_SIZE = 10  # Default for bot.psql.pool_size
+# Connections are handed back after every cursor, so the pool keeps them open
+# (up to bot.psql.pool_min, default the pool size) instead of reconnecting each time
+CHECKOUT_TIMEOUT = 30  # seconds to wait for a free connection before giving up
+LISTEN_RECONNECT_MAX = 60  # seconds between attempts to get a lost LISTEN connection back
+
+_pool: psycopg2.pool.ThreadedConnectionPool = None
+_pool_slots: threading.BoundedSemaphore = None
+_pool_lock = threading.Lock()
+_handles: dict[bool, "Connection"] = {}
+_keys = itertools.count()
+_listeners: dict[str, list] = {}  # channel -> callbacks
+_listen_threads: dict[str, threading.Thread] = {}
+
+# Statements that leave nothing to commit, so their transaction can just be rolled back
+READ_ONLY = re.compile(
+    r"\s*(SELECT|SHOW)\b(?!.*\b(pg_notify|nextval|setval|INTO|FOR\s+(UPDATE|SHARE|NO\s+KEY|KEY)))",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _config() -> dict:
+    with open("config.yaml", "r", encoding="UTF-8") as file:
+        return yaml.safe_load(file)["bot"]["psql"]
+
+
+def _connect_args(sqlcfg: dict) -> dict:
+    return dict(
+        dbname=sqlcfg["database"],
+        user=sqlcfg["user"],
+        password=sqlcfg["password"] if "password" in sqlcfg else None,
+        host=sqlcfg["host"],
+        port=sqlcfg["port"],
+    )
+
+
+def get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """Get the shared pool, creating it on first use.
+    Raises psycopg2.OperationalError if the database can't be reached."""
+    global _pool, _pool_slots
+
+    with _pool_lock:
+        if _pool is None:
+            sqlcfg = _config()
+            size = int(sqlcfg.get("pool_size", POOL_SIZE))
+            keep = max(1, min(size, int(sqlcfg.get("pool_min", size))))
+            _pool = psycopg2.pool.ThreadedConnectionPool(keep, size, **_connect_args(sqlcfg))
+            _pool_slots = threading.BoundedSemaphore(size)
+            logger.info(f"Opened a pool of up to {size} database connections, keeping {keep} open.")
+        return _pool
+
+
+def _checkout(autocommit: bool):
+    pool = get_pool()
+    if not _pool_slots.acquire(timeout=CHECKOUT_TIMEOUT):
+        raise psycopg2.pool.PoolError(
+            f"No database connection free after {CHECKOUT_TIMEOUT}s, is bot.psql.pool_size too small?"
+        )
+    key = next(_keys)
+    try:
+        conn = pool.getconn(key)
+        conn.autocommit = autocommit
+    except Exception:
+        _pool_slots.release()
+        raise
+    return key, conn
+
+
+def _checkin(key, conn):
+    # A connection the server dropped can't be reused, so close it and let the pool open a new one
+    try:
+        _pool.putconn(conn, key, close=bool(conn.closed))
+    except psycopg2.pool.PoolError:
+        pass
+    finally:
+        _pool_slots.release()
+
+
+class _Lease:
+    """A connection checked out by one thread. It goes back to the pool once
+    the thread has no cursors open on it and no uncommitted writes, or when
+    it's garbage collected."""
+
+    def __init__(self, autocommit: bool):
+        self.key, self.conn = _checkout(autocommit)
+        self.autocommit = autocommit
+        self.cursors = 0
+        self.dirty = False  # Wrote something that hasn't been committed or rolled back yet
+        self.returned = weakref.finalize(self, _checkin, self.key, self.conn)
+
+    def done(self):
+        """Hand the connection back if nothing is using it anymore. A read-only
+        transaction left open is rolled back by the pool on the way in."""
+        if self.cursors == 0 and (self.autocommit or not self.dirty):
+            self.returned()
+
+
+def _close_cursor(lease: _Lease, cursor):
+    try:
+        cursor.close()
+    except psycopg2.Error:
+        pass  # Its connection was lost
+    lease.cursors -= 1
+    lease.done()
+
+
+class _Cursor:
+    """A psycopg2 cursor that gives its connection back to the pool when
+    it's closed, either explicitly, by leaving its `with` block, or by
+    being garbage collected."""
+
+    def __init__(self, lease: _Lease, cursor):
+        self._lease = lease
+        self._cursor = cursor
+        lease.cursors += 1
+        self._closed = weakref.finalize(self, _close_cursor, lease, cursor)
+
+    def execute(self, query, vars=None):
+        if not (isinstance(query, str) and READ_ONLY.match(query)):
+            self._lease.dirty = True
+        return self._cursor.execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self._lease.dirty = True
+        return self._cursor.executemany(query, vars_list)
+
+    def close(self):
+        self._closed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class Connection:
+    """Stands in for a psycopg2 connection, lending every thread a connection
+    from the shared pool for as long as it's working with it.
+
+    Supports what the modules use a connection for: `cursor`, `commit` and
+    `rollback`. With autocommit on, the connection is returned as soon as
+    the thread's cursors are closed. With it off, a transaction that wrote
+    something keeps it until `commit` or `rollback`, even across cursors.
+    A connection that's been dropped is replaced the next time the thread
+    asks for a cursor."""
+
+    def __init__(self, autocommit: bool = False):
+        self.autocommit = autocommit
+        self._local = threading.local()
+
+    def _lease(self) -> _Lease | None:
+        lease = getattr(self._local, "lease", None)
+        if lease is not None and not lease.returned.alive:
+            lease = self._local.lease = None
+        return lease
+
+    def cursor(self, *args, **kwargs):
+        lease = self._lease()
+        if lease is not None and lease.conn.closed:
+            logger.warning("Database connection was lost, reconnecting.")
+            self.release()
+            lease = None
+        if lease is None:
+            lease = self._local.lease = _Lease(self.autocommit)
+        return _Cursor(lease, lease.conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        lease = self._lease()
+        if lease is not None:
+            lease.conn.commit()
+            lease.dirty = False
+            lease.done()
+
+    def rollback(self):
+        lease = self._lease()
+        if lease is not None:
+            if not lease.conn.closed:
+                lease.conn.rollback()
+            lease.dirty = False
+            lease.done()
+
+    def release(self):
+        """Give this thread's connection back to the pool now, even with cursors
+        still open on it. Anything uncommitted is rolled back."""
+        lease = self._lease()
+        if lease is not None:
+            self._local.lease = None
+            lease.returned()
+
+
+def connect(autocommit: bool = False) -> Connection:
+    """The process's shared connection handle for this autocommit mode.
+    Raises psycopg2.OperationalError if the database can't be reached."""
+    get_pool()
+    with _pool_lock:
+        if autocommit not in _handles:
+            _handles[autocommit] = Connection(autocommit)
+        return _handles[autocommit]
+
+
+
+def notify(cursor, channel: str, payload: str):
+    """Send a NOTIFY on the channel. It's delivered when the cursor's transaction commits."""
+    cursor.execute("SELECT pg_notify(%s, %s);", (channel, payload))
+
+
+def listen(channel: str, callback) -> threading.Thread:
+    """Call `callback(payload)` for every NOTIFY on the channel, from a background thread.
+
+    LISTEN needs a connection that stays open, so this one isn't from the
+    pool. Every callback on a channel in this process shares one connection
+    and thread. If it's lost, it's reopened with backoff, and `callback(None)`
+    is called once it's back, since anything sent in between was missed."""
+    with _pool_lock:
+        _listeners.setdefault(channel, []).append(callback)
+        if channel not in _listen_threads:
+            _listen_threads[channel] = thread = threading.Thread(
+                target=_listen, args=(channel,), daemon=True, name=f"db-listen-{channel}"
+            )
+            thread.start()
+        return _listen_threads[channel]
+
+
+def _dispatch(channel: str, payload: str | None):
+    with _pool_lock:
+        callbacks = list(_listeners.get(channel, ()))
+    for callback in callbacks:
+        try:
+            callback(payload)
+        except Exception:
+            logger.exception(f"Error handling notification on {channel}: {payload}")
+
+
+def _listen(channel: str):
+    delay = 1
+    reconnected = False
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**_connect_args(_config()))
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {channel};")
+            logger.info(f"Listening for notifications on {channel}.")
+            delay = 1
+            if reconnected:
+                _dispatch(channel, None)
+
+            while True:
+                if select.select([conn], [], [], 60)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        _dispatch(channel, conn.notifies.pop(0).payload)
+        except (psycopg2.Error, OSError) as e:
+            logger.warning(f"Lost the LISTEN connection for {channel} ({e}), retrying in {delay}s.")
+            reconnected = True
+            time.sleep(delay)
+            delay = min(delay * 2, LISTEN_RECONNECT_MAX)
+        finally:
+            if conn is not None:
+                conn.close()
@@ -1,11 +1,12 @@
 from datetime import datetime
-import psycopg2
 import discord
 import yaml
 import re
 import asyncio
 import logging
 
+from cmds import db
+
 with open('config.yaml', 'r') as file:
     cfg = yaml.safe_load(file)
 
@@ -13,7 +14,6 @@ with open('config.yaml', 'r') as file:
 logger = logging.getLogger('discord.quotes.helpers')
 
 qcfg = cfg['bot']['quoting']
-sqlcfg = cfg['bot']['psql']
 
 def format_quote(content,timestamp,authorID=None,authorName=None,bot=None,source=None,format: str='plain'):
     quote_string_id = '''"{0}"
@@ -71,13 +71,7 @@ def format_quote(content,timestamp,authorID=None,authorName=None,bot=None,source
 ### SQL FUNCTIONS
 
 def random_quote(gid: int = None,uid: int = None,sort_order: str = "random()"):
-    con = psycopg2.connect(
-        database=sqlcfg['database'],
-        user=sqlcfg['user'],
-        password=sqlcfg['password'] if 'password' in sqlcfg else None,
-        host=sqlcfg['host'],
-        port=sqlcfg['port'],
-)
+    con = db.connect(autocommit=True)
     cur = con.cursor()
     
     where_filter = []
@@ -95,17 +89,10 @@ def random_quote(gid: int = None,uid: int = None,sort_order: str = "random()"):
         if bool(uid) and "NoneType object" in str(error):
             raise LookupError("Sorry, that user doesn't have any quotes saved in this server yet!")
     cur.close()
-    con.close()
     return (id, content, aID, aName, timestamp, karma, source)
 
 def insert_quote(quote_data: tuple):
-    con = psycopg2.connect(
-        database=sqlcfg['database'],
-        user=sqlcfg['user'],
-        password=sqlcfg['password'] if 'password' in sqlcfg else None,
-        host=sqlcfg['host'],
-        port=sqlcfg['port']
-    )
+    con = db.connect(autocommit=True)
     cur = con.cursor()
     
     # Validate quote tuple first
@@ -117,22 +104,14 @@ def insert_quote(quote_data: tuple):
     returning = cur.fetchone()
     con.commit()
     cur.close()
-    con.close()
     return returning
 
 def update_karma(qid,karma):
-    con = psycopg2.connect(
-        database=sqlcfg['database'],
-        user=sqlcfg['user'],
-        password=sqlcfg['password'] if 'password' in sqlcfg else None,
-        host=sqlcfg['host'],
-        port=sqlcfg['port']
-    )
+    con = db.connect(autocommit=True)
     cur = con.cursor()
     cur.execute("UPDATE sanford.quotes SET karma= %s WHERE id= %s", (karma, qid))
     con.commit()
     cur.close()
-    con.close()
 
 
     
@@ -26,6 +26,7 @@ from discord.ext import commands
 from discord.ext.commands import Context
 from discord.ext.commands._types import BotT
 
+from cmds import db
 from cmds.quote_helpers.quoting import *
 
 from datetime import date, timezone, timedelta as td
@@ -37,16 +38,8 @@ logger = logging.getLogger('discord.quotes')
 with open('config.yaml', 'r', encoding='UTF-8') as file:
     cfg = yaml.safe_load(file)
 
-sqlcfg = cfg['bot']['psql']
 try:
-    sqlcon = psql.connect(
-        dbname=sqlcfg['database'],
-        user=sqlcfg['user'],
-        password=sqlcfg['password'] if 'password' in sqlcfg else None,
-        host=sqlcfg['host'],
-        port=sqlcfg['port']
-    )
-    sqlcon.set_session(autocommit=True)
+    sqlcon = db.connect(autocommit=True)
 except psql.OperationalError:
     # TODO Disable commands that need SQL connectivity
     sqlcon = False
@@ -236,7 +229,7 @@ class Quotes(commands.GroupCog, group_name="quote"):
                     logger.error(f"Error updating karma for quote {qid} in guild {interaction.guild_id}: {error}")
                     await qmsg.edit(embed=quote)
         
-        except psycopg2.DatabaseError as error:
+        except psql.DatabaseError as error:
             await interaction.response.send_message(f'Error: SQL Failed due to:\n```{str(error.with_traceback)}```',ephemeral=True)
             logger.error("QUOTE SQL ERROR:\n" + str(error.with_traceback))
         # except dateutil.parser._parser.ParserError as error:
@@ -249,14 +242,7 @@ async def quote_save(interaction: discord.Interaction, message: discord.Message)
     newpost = await interaction.original_response()
 
     try:
-        con = psycopg2.connect(
-        database=sqlcfg['database'],
-        user=sqlcfg['user'],
-        password=sqlcfg['password'] if 'password' in sqlcfg else None,
-        host=sqlcfg['host'],
-        port=sqlcfg['port']
-    )
-        cur = con.cursor()
+        cur = db.connect(autocommit=True).cursor()
 
         # Strip any mention from the beginning of the message
         strippedcontent = None
@@ -267,7 +253,7 @@ async def quote_save(interaction: discord.Interaction, message: discord.Message)
         cur.execute("SELECT 1 from sanford.quotes WHERE msgID='" + str(message.id) + "'")
         if cur.fetchone() is not None:
             raise LookupError('This quote is already in the database.')
-        con.close()
+        cur.close()
 
         sql_values = (
             strippedcontent if bool(strippedcontent) else message.content,
@@ -321,8 +307,7 @@ async def quote_save(interaction: discord.Interaction, message: discord.Message)
                 logger.error(f"Error updating karma for quote {qid} in guild {interaction.guild_id}: {error}")
                 await qmsg.edit(embed=quote)
         
-        con.close()
-    except psycopg2.DatabaseError as error:
+    except psql.DatabaseError as error:
         await interaction.response.send_message(f'Error: SQL Failed due to:\n```{str(error.with_traceback)}```',ephemeral=True)
         logger.error("QUOTE SQL ERROR:\n" + str(error.with_traceback))
     except dateutil.parser._parser.ParserError as error:
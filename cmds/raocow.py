@@ -26,6 +26,8 @@ from discord.ext.commands._types import BotT
 
 from datetime import date, timezone, timedelta as td
 
+from cmds import db
+
 cfg = None
 
 logger = logging.getLogger('discord.raocow')
@@ -35,16 +37,8 @@ executor = ThreadPoolExecutor(max_workers=5)
 with open('config.yaml', 'r', encoding='UTF-8') as file:
     cfg = yaml.safe_load(file)
 
-sqlcfg = cfg['bot']['psql']
 try:
-    sqlcon = psql.connect(
-        dbname=sqlcfg['database'],
-        user=sqlcfg['user'],
-        password=sqlcfg['password'] if 'password' in sqlcfg else None,
-        host=sqlcfg['host'],
-        port=sqlcfg['port']
-    )
-    sqlcon.set_session(autocommit=True)
+    sqlcon = db.connect(autocommit=True)
 except psql.OperationalError:
     # TODO Disable commands that need SQL connectivity
     sqlcon = False
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run from an empty directory with a config.yaml whose database can't be reached."""
+    config = {
+        "bot": {
+            "psql": {"database": "test", "user": "test", "host": "127.0.0.1", "port": 1},
+        }
+    }
+    (tmp_path / "config.yaml").write_text(yaml.safe_dump(config), encoding="UTF-8")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,34 @@
+from cmds.ap_scripts.item_index import ItemIndex
+
+
+class Item:
+    def __init__(self, name: str, classification: str | None = None):
+        self.receiver = "Receiver"
+        self.game = "Game"
+        self.name = name
+        self.classification = classification
+
+
+def test_reclassify_moves_item_between_buckets():
+    index = ItemIndex()
+    item = Item("Sword")
+    index.add(("Sender", "Chest", "Sword"), item)
+
+    index.reclassify(item, "progression")
+
+    assert item not in index.by_classification[None]
+    assert index.find(classification="progression") == [item]
+
+
+def test_reclassify_indexes_item_missing_from_its_old_bucket():
+    index = ItemIndex()
+    item = Item("Shield")
+    index.add(("Sender", "Chest", "Shield"), item)
+    # Classified without going through the index, so it's filed under the wrong bucket
+    item.classification = "filler"
+
+    index.reclassify(item, "useful")
+
+    assert item.classification == "useful"
+    assert index.by_classification["useful"] == {item}
+    assert index.find(classification="useful") == [item]
@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cmds.ap_scripts import http_client
+from cmds.ap_scripts.logtail import LogTail
+
+
+class LogHandler(BaseHTTPRequestHandler):
+    """Serves the server's `log` bytes, honouring simple `bytes=start-` ranges."""
+
+    def do_GET(self):
+        body = self.server.log
+        start = 0
+        if header := self.headers.get("Range"):
+            start = int(header.removeprefix("bytes=").split("-")[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def log_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LogHandler)
+    server.log = b""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_reset_log_resyncs_with_every_host_slot_in_use(log_server):
+    """A tail holding a streamed response mustn't need a second slot on the same host."""
+    url = f"http://127.0.0.1:{log_server.server_port}/log/room"
+    log_server.log = b"".join(f"old line {n}\n".encode() for n in range(10))
+    tails = [LogTail(url) for _ in range(http_client.HOST_CONCURRENCY)]
+    for tail in tails:
+        assert len(tail.fetch_new_lines()) == 10
+
+    log_server.log = b"".join(f"new line {n}\n".encode() for n in range(12))
+    results = [None] * len(tails)
+
+    def poll(index):
+        results[index] = tails[index].fetch_new_lines()
+
+    threads = [threading.Thread(target=poll, args=(index,), daemon=True) for index in range(len(tails))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert results == [["new line 10", "new line 11"]] * len(tails)
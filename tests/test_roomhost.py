@@ -0,0 +1,32 @@
+import sys
+
+import ap_roomhost
+
+
+def room_env(room_id: str) -> dict:
+    return {
+        "LOG_URL": f"https://archipelago.gg/room/{room_id}",
+        "WEBHOOK_URL": "",
+        "SESSION_COOKIE": "cookie",
+        "SPOILER_URL": "",
+        "MSGHOOK_URL": "",
+        "METAHOOK_URL": "",
+        "FLASK_PORT": "0",
+    }
+
+
+def test_milestones_stay_in_their_room(workdir):
+    rooms = {room_id: ap_roomhost.load_room(room_id, room_env(room_id)) for room_id in ("roomA", "roomB")}
+    try:
+        first, second = rooms["roomA"], rooms["roomB"]
+        assert first.event_emitter is not second.event_emitter
+
+        first.game.total_locations = 4
+        first.game.collected_locations = 1
+        first.game.update_locations()
+
+        assert first.message_buffer == ["**The game has reached 25% completion!**"]
+        assert second.message_buffer == []
+    finally:
+        for room_id in rooms:
+            sys.modules.pop(f"ap_itemlog_{room_id}", None)